@@ -2,7 +2,7 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 {
     'name': 'Fusion 360 Integration',
-    'version': '17.0.1.0.0',
+    'version': '17.0.1.3.0',
     'category': 'Manufacturing/Manufacturing',
     'summary': 'Integration with Autodesk Fusion 360',
     'author': 'jaco tech',
@@ -12,15 +12,24 @@
     'data': [
         'security/fusion_security.xml',
         'security/ir.model.access.csv',
+        'data/fusion_cron.xml',
         'views/res_config_settings_views.xml',
         'views/product_attribute_views.xml',
         'views/fusion_component_views.xml',
+        'views/fusion_sync_job_views.xml',
+        'views/fusion_sync_log_views.xml',
+        'views/fusion_gc_views.xml',
         'views/fusion_menu.xml',
     ],
     'demo': [],
     'test': [
         'tests/test_fusion_component.py',
         'tests/test_fusion_settings.py',
+        'tests/test_fusion_sync_job.py',
+        'tests/test_fusion_benchmark.py',
+        'tests/test_fusion_sync_log.py',
+        'tests/test_fusion_gc.py',
+        'tests/test_fusion_controller.py',
     ],
     'installable': True,
     'application': True,
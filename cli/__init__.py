@@ -0,0 +1,2 @@
+from . import fusion_import
+from . import fusion_loadtest
@@ -0,0 +1,346 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+"""Command line importer of Fusion 360 project exports.
+
+Usage::
+
+    odoo-bin fusion_import -c odoo.conf -d DATABASE --fusion-export PATH
+
+The export is a directory, zip or tar archive of JSON files, each holding
+one assembly tree as sent to /fusion_api/assembly, or a list of them. Files
+are read one at a time, so the export is never loaded in memory as a whole.
+The assemblies are imported in parallel by a pool of worker processes, each
+with its own cursor, and committed one by one. Assemblies sharing components
+are imported by the same worker. Imported assemblies are recorded in a
+checkpoint file so that an interrupted import can be resumed.
+"""
+
+from odoo import SUPERUSER_ID, api
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.sql_db import close_all
+from odoo.tools import config
+
+from ..models.fusion_component import retry_on_conflict
+
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import logging
+import multiprocessing
+import optparse
+import os
+import tarfile
+import time
+import zipfile
+
+_logger = logging.getLogger(__name__)
+
+
+def iter_export_files(path, names=None):
+    """Read the JSON files of a Fusion 360 export one at a time.
+
+    Args:
+        path (str): Export directory, zip or tar archive
+        names (set): Names of the files to read, all if None
+
+    Yields:
+        tuple: (name, content) of each file, the name relative to the export
+    """
+    def wanted(name):
+        return name.endswith('.json') and (names is None or name in names)
+
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                name = os.path.relpath(file_path, path)
+                if wanted(name):
+                    with open(file_path, 'rb') as export_file:
+                        yield name, export_file.read()
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in sorted(archive.namelist()):
+                if wanted(name):
+                    yield name, archive.read(name)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile() and wanted(member.name):
+                    yield member.name, archive.extractfile(member).read()
+    else:
+        raise ValueError(f'{path} is not a directory or an archive')
+
+
+def read_export(path, keys=None):
+    """Read the assembly trees of a Fusion 360 export lazily.
+
+    Args:
+        path (str): Export directory, zip or tar archive
+        keys (set): Keys of the assemblies to read, all if None
+
+    Yields:
+        tuple: (key, tree), the key identifying the assembly in the export
+            as 'file#index'
+    """
+    names = keys and {key.rsplit('#', 1)[0] for key in keys}
+    for name, content in iter_export_files(path, names):
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = [data.get('assembly', data)]
+        for index, tree in enumerate(data):
+            key = f'{name}#{index}'
+            if keys is None or key in keys:
+                yield key, tree
+
+
+class AssemblyGroups:
+    """Groups of assemblies sharing components, built as they are read.
+
+    Assemblies importing the same component would write it concurrently if
+    imported by different workers, they are kept in the same group.
+    """
+
+    def __init__(self, fusion_key):
+        """
+        Args:
+            fusion_key (callable): Key of a component from its values, see
+                fusion.component._fusion_key
+        """
+        self.fusion_key = fusion_key
+        self.parents = {}
+        self.owners = {}
+
+    def add(self, key, tree):
+        """Add an assembly, merging its group with the ones it shares
+        components with"""
+        self.parents[key] = key
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, dict) or not node.get('fusion_id'):
+                continue
+            stack.extend(node.get('children') or [])
+            owner = self.owners.setdefault(self.fusion_key(node), key)
+            if owner != key:
+                self.parents[self._find(owner)] = self._find(key)
+
+    def groups(self):
+        """Get the groups, as lists of assembly keys"""
+        groups = defaultdict(list)
+        for key in self.parents:
+            groups[self._find(key)].append(key)
+        return list(groups.values())
+
+    def _find(self, key):
+        """Get the representative key of the group of an assembly"""
+        while self.parents[key] != key:
+            self.parents[key] = self.parents[self.parents[key]]
+            key = self.parents[key]
+        return key
+
+
+def count_components(tree):
+    """Count the components of an assembly tree."""
+    return 1 + sum(count_components(child) for child in tree.get('children') or [])
+
+
+def import_batch(dbname, uid, company_id, path, batch):
+    """Import a batch of assemblies in a worker process.
+
+    The assemblies are read from the export by the worker. Each one is
+    committed on its own, so a failing one does not roll back the others.
+
+    Args:
+        dbname (str): Database name
+        uid (int): ID of the user importing
+        company_id (int): ID of the company to import in
+        path (str): Export directory, zip or tar archive
+        batch (list): Keys of the assemblies
+
+    Returns:
+        dict: Keys of the imported and failed assemblies, number of
+            components and time spent
+    """
+    start = time.perf_counter()
+    result = {'done': [], 'failed': [], 'components': 0}
+    with Registry(dbname).cursor() as cr:
+        env = api.Environment(cr, uid, {
+            'fusion_import': True,
+            'tracking_disable': True,
+            'allowed_company_ids': [company_id],
+        })
+        Component = env['fusion.component']
+        for key, tree in read_export(path, set(batch)):
+            try:
+                retry_on_conflict(
+                    env, lambda: Component.create_from_fusion_tree(tree))
+                cr.commit()
+                result['done'].append(key)
+                result['components'] += count_components(tree)
+            except Exception as e:
+                _logger.warning('Could not import assembly %s: %s', key, e)
+                cr.rollback()
+                env.registry.clear_cache()
+                result['failed'].append((key, str(e)))
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+class FusionImport(Command):
+    """Import a Fusion 360 project export in parallel"""
+    name = 'fusion_import'
+
+    def run(self, cmdargs):
+        parser = config.parser
+        group = optparse.OptionGroup(parser, 'Fusion 360 import')
+        group.add_option('--fusion-export', dest='fusion_export',
+                         help='Export directory, zip or tar archive')
+        group.add_option('--fusion-workers', dest='fusion_workers', type='int',
+                         default=max((os.cpu_count() or 2) // 2, 1),
+                         help='Number of worker processes')
+        group.add_option('--fusion-batch-size', dest='fusion_batch_size',
+                         type='int', default=2000,
+                         help='Number of components sent to a worker at once')
+        group.add_option('--fusion-checkpoint', dest='fusion_checkpoint',
+                         help='Checkpoint file, defaults to the export path '
+                              'followed by .checkpoint.json')
+        group.add_option('--fusion-report', dest='fusion_report',
+                         help='File the JSON throughput report is written to')
+        group.add_option('--fusion-login', dest='fusion_login', default='admin',
+                         help='Login of the user the import is done as')
+        group.add_option('--fusion-company', dest='fusion_company', type='int',
+                         help='ID of the company to import in, defaults to '
+                              'the company of the user')
+        parser.add_option_group(group)
+        opt = config.parse_config(cmdargs)
+        if not opt.fusion_export or not config['db_name']:
+            parser.error('--fusion-export and a database are required')
+
+        report = self._import(config['db_name'].split(',')[0], opt)
+        _logger.info('Fusion import report:\n%s', json.dumps(report, indent=2))
+        if opt.fusion_report:
+            with open(opt.fusion_report, 'w') as report_file:
+                json.dump(report, report_file, indent=2)
+        if report['failed']:
+            raise SystemExit(1)
+
+    def _import(self, dbname, opt):
+        """Run the import and return its throughput report"""
+        start = time.perf_counter()
+        checkpoint_path = opt.fusion_checkpoint or \
+            opt.fusion_export.rstrip('/') + '.checkpoint.json'
+        done = set(self._load_checkpoint(checkpoint_path))
+        sizes = {}
+        skipped = []
+
+        def scan(groups):
+            """Read the assemblies to import, recording their size and
+            the components they share"""
+            for key, tree in read_export(opt.fusion_export):
+                if key in done:
+                    skipped.append(key)
+                    continue
+                sizes[key] = count_components(tree)
+                groups.add(key, tree)
+                yield tree
+
+        # First pass: shared records, created once before fanning out
+        with Registry(dbname).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            user = env['res.users'].search(
+                [('login', '=', opt.fusion_login)], limit=1)
+            if not user:
+                raise SystemExit(f'Unknown user {opt.fusion_login}')
+            company_id = opt.fusion_company or user.company_id.id
+            env = api.Environment(cr, user.id, {
+                'tracking_disable': True,
+                'allowed_company_ids': [company_id],
+            })
+            Component = env['fusion.component']
+            groups = AssemblyGroups(Component._fusion_key)
+            shared = Component._prepare_bulk_import(scan(groups))
+        prepare_seconds = time.perf_counter() - start
+        total = len(sizes) + len(skipped)
+        _logger.info('%d assemblies to import, %d already imported',
+                     len(sizes), len(skipped))
+        _logger.info('Prepared %(attribute_values)d attribute values and '
+                     '%(shared_components)d shared components', shared)
+
+        # Forked workers must not share the connections of this process
+        close_all()
+        batches = self._split(groups.groups(), sizes, opt.fusion_batch_size)
+        components = failed = 0
+        failures = []
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(opt.fusion_workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(import_batch, dbname, user.id, company_id,
+                            opt.fusion_export, batch)
+                for batch in batches
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                done.update(result['done'])
+                self._save_checkpoint(checkpoint_path, done)
+                components += result['components']
+                failed += len(result['failed'])
+                failures.extend(result['failed'])
+                elapsed = time.perf_counter() - start
+                _logger.info(
+                    '%d/%d assemblies imported, %d failed, %.1f components/s',
+                    len(done), total, failed, components / elapsed)
+
+        seconds = time.perf_counter() - start
+        return {
+            'assemblies': total,
+            'skipped': len(skipped),
+            'imported': len(sizes) - failed,
+            'failed': failed,
+            'components': components,
+            'attribute_values': shared['attribute_values'],
+            'shared_components': shared['shared_components'],
+            'workers': opt.fusion_workers,
+            'batches': len(batches),
+            'prepare_seconds': round(prepare_seconds, 2),
+            'seconds': round(seconds, 2),
+            'components_per_second': round(components / seconds, 2),
+            'failures': failures,
+        }
+
+    def _split(self, groups, sizes, batch_size):
+        """Group assemblies in batches of about batch_size components.
+
+        Groups of assemblies sharing components are never split. They are
+        sorted largest first, so the longest ones start early and the
+        workers finish at about the same time.
+        """
+        batches = []
+        batch = []
+        size = 0
+        for group in sorted(
+                groups, key=lambda keys: sum(sizes[key] for key in keys),
+                reverse=True):
+            batch.extend(group)
+            size += sum(sizes[key] for key in group)
+            if size >= batch_size:
+                batches.append(batch)
+                batch = []
+                size = 0
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _load_checkpoint(self, path):
+        """Get the keys of the assemblies imported by a previous run"""
+        if not os.path.exists(path):
+            return []
+        with open(path) as checkpoint_file:
+            return json.load(checkpoint_file)['done']
+
+    def _save_checkpoint(self, path, done):
+        """Record the keys of the imported assemblies"""
+        with open(path + '.tmp', 'w') as checkpoint_file:
+            json.dump({'done': sorted(done)}, checkpoint_file)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,435 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+"""Load test of the Fusion 360 sync endpoints of a running Odoo server.
+
+Usage::
+
+    odoo-bin fusion_loadtest --url http://localhost:8069 -d DATABASE \\
+        --concurrency 8 --requests 2000 --report report.json
+
+Several simulated designers, each with its own session, send component,
+batch, assembly and BOM payloads at once, as the Fusion 360 add-in does.
+Payloads are either replayed from a file recorded with --save-payloads, or
+generated from a seed, so that two runs send the same requests. The JSON
+report holds throughput, latency percentiles, error and conflict rates per
+endpoint, and the query and retry totals the server logged for the run. Its
+keys are sorted so that the reports of two releases can be diffed, or
+compared with --baseline.
+
+Start the server with several workers, so that requests run in parallel.
+"""
+
+from odoo.cli import Command
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import argparse
+import gzip
+import json
+import logging
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+# Sync endpoints driven by the load test and their default share of requests
+DEFAULT_MIX = {'component': 4, 'components': 2, 'assembly': 1, 'bom': 3}
+
+# Latency percentiles reported per endpoint
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    """Get a percentile of sorted values, by the nearest-rank method."""
+    if not values:
+        return 0.0
+    index = max(math.ceil(rank / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def parse_mix(value):
+    """Parse an endpoint mix given as 'component=4,bom=1'."""
+    mix = {}
+    for item in value.split(','):
+        endpoint, dummy, weight = item.partition('=')
+        if endpoint not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'Unknown endpoint {endpoint}')
+        mix[endpoint] = int(weight or 1)
+    return mix
+
+
+class PayloadGenerator:
+    """Generate synthetic Fusion 360 payloads from a seed.
+
+    Parts and assemblies are drawn from fixed pools, so that requests
+    update the same records concurrently as designers of a shared project
+    do, and a share of them send a new version.
+    """
+
+    def __init__(self, seed, parts, assemblies, batch_size, update_ratio):
+        self.random = random.Random(seed)
+        self.parts = [f'LOADTEST_PART_{index}' for index in range(parts)]
+        self.assemblies = [
+            f'LOADTEST_ASSEMBLY_{index}' for index in range(assemblies)]
+        self.batch_size = batch_size
+        self.update_ratio = update_ratio
+        self.versions = {}
+
+    def setup(self):
+        """Payloads creating the pools before the measured requests."""
+        return [
+            ('components', {'components': [
+                self._component(fusion_id, new_version=False)
+                for fusion_id in self.parts[index:index + self.batch_size]
+            ]})
+            for index in range(0, len(self.parts), self.batch_size)
+        ] + [
+            ('assembly', {'assembly': self._assembly(fusion_id)})
+            for fusion_id in self.assemblies
+        ]
+
+    def generate(self, mix, count):
+        """Generate count (endpoint, payload) tuples in the given mix."""
+        endpoints = list(mix)
+        weights = [mix[endpoint] for endpoint in endpoints]
+        return [
+            (endpoint, getattr(self, f'_payload_{endpoint}')())
+            for endpoint in self.random.choices(endpoints, weights, k=count)
+        ]
+
+    def _payload_component(self):
+        return self._component(self.random.choice(self.parts))
+
+    def _payload_components(self):
+        return {'components': [
+            self._component(fusion_id) for fusion_id in
+            self.random.sample(self.parts, min(self.batch_size, len(self.parts)))
+        ]}
+
+    def _payload_assembly(self):
+        return {'assembly': self._assembly(self.random.choice(self.assemblies))}
+
+    def _payload_bom(self):
+        return {
+            'parent_id': self.random.choice(self.assemblies),
+            'components': [
+                {'fusion_id': fusion_id, 'quantity': self.random.randint(1, 8)}
+                for fusion_id in self.random.sample(
+                    self.parts, min(self.random.randint(1, 10), len(self.parts)))
+            ],
+        }
+
+    def _component(self, fusion_id, component_type='component', new_version=None):
+        """Values of a component, in a new version for a share of them."""
+        if new_version is None:
+            new_version = self.random.random() < self.update_ratio
+        version = self.versions.get(fusion_id, 0) + bool(new_version)
+        self.versions[fusion_id] = version
+        return {
+            'fusion_id': fusion_id,
+            'name': fusion_id.replace('_', ' ').title(),
+            'component_type': component_type,
+            'version_identifier': f'V{version}',
+            'last_modified': f'2024-01-01 00:00:{version % 60:02d}',
+            'mass': round(self.random.uniform(0.01, 5.0), 3),
+        }
+
+    def _assembly(self, fusion_id):
+        """Values of an assembly tree of parts from the pool."""
+        return dict(
+            self._component(fusion_id, 'assembly'),
+            children=[
+                dict(self._component(part), quantity=self.random.randint(1, 4))
+                for part in self.random.sample(
+                    self.parts, min(self.random.randint(2, 12), len(self.parts)))
+            ],
+        )
+
+
+class Designer:
+    """One simulated Fusion 360 user with its own session."""
+
+    def __init__(self, url, db, login, password, protocol):
+        self.url = url.rstrip('/')
+        self.protocol = protocol
+        self.session = requests.Session()
+        response = self.session.post(f'{self.url}/web/session/authenticate', json={
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {'db': db, 'login': login, 'password': password},
+        })
+        response.raise_for_status()
+        result = response.json()
+        if result.get('error') or not result['result'].get('uid'):
+            raise SystemExit(f'Could not log in as {login}')
+        self.uid = result['result']['uid']
+
+    def send(self, endpoint, payload, key):
+        """Send one payload.
+
+        Returns:
+            tuple: Latency in seconds, success, number of failed items and
+                of items failed on a conflict with a concurrent request
+        """
+        start = time.perf_counter()
+        try:
+            if self.protocol >= 2:
+                result = self._send_v2(endpoint, payload, key)
+            else:
+                response = self.session.post(
+                    f'{self.url}/fusion_api/{endpoint}',
+                    json={'jsonrpc': '2.0', 'method': 'call', 'params': payload},
+                    headers={'Idempotency-Key': key},
+                )
+                response.raise_for_status()
+                body = response.json()
+                result = body.get('result') or {'success': False, 'code': 500}
+        except (requests.RequestException, ValueError) as e:
+            _logger.debug('Request to %s failed: %s', endpoint, e)
+            result = {'success': False, 'code': 599}
+        latency = time.perf_counter() - start
+
+        items = result.get('results') or result.get('r') or []
+        codes = [item.get('code', item.get('s')) for item in items
+                 if not item.get('success', item.get('s', 500) < 400)]
+        success = bool(result.get('success', result.get('s', 500) < 400))
+        if not success:
+            codes.append(result.get('code', result.get('s')))
+        return latency, success, len(codes), codes.count(409)
+
+    def _send_v2(self, endpoint, payload, key):
+        """Send a gzip compressed payload to the compact protocol route."""
+        response = self.session.post(
+            f'{self.url}/fusion_api/v2/{endpoint}',
+            data=gzip.compress(json.dumps(payload).encode()),
+            headers={
+                'Content-Type': 'application/json',
+                'Content-Encoding': 'gzip',
+                'X-Fusion-Protocol': str(self.protocol),
+                'Idempotency-Key': key,
+            },
+        )
+        return response.json()
+
+    def call_kw(self, model, method, args, kwargs=None):
+        """Call a model method through JSON-RPC."""
+        response = self.session.post(f'{self.url}/web/dataset/call_kw', json={
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {
+                'model': model,
+                'method': method,
+                'args': args,
+                'kwargs': kwargs or {},
+            },
+        })
+        response.raise_for_status()
+        body = response.json()
+        if body.get('error'):
+            raise RuntimeError(body['error'].get('data', {}).get('message'))
+        return body['result']
+
+
+class FusionLoadTest(Command):
+    """Load test the Fusion 360 sync endpoints of a running server"""
+    name = 'fusion_loadtest'
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(
+            prog=f'{sys.argv[0].split("/")[-1]} {self.name}',
+            description=self.__doc__)
+        parser.add_argument('--url', default='http://localhost:8069',
+                            help='URL of the Odoo server')
+        parser.add_argument('-d', '--database', required=True)
+        parser.add_argument('--login', default='admin')
+        parser.add_argument('--password', default='admin')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Number of designers sending at once')
+        parser.add_argument('--requests', type=int, default=1000,
+                            help='Number of measured requests')
+        parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                            help='Share of each endpoint, as component=4,bom=3')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the synthetic payloads')
+        parser.add_argument('--parts', type=int, default=200,
+                            help='Number of distinct synthetic parts')
+        parser.add_argument('--assemblies', type=int, default=20,
+                            help='Number of distinct synthetic assemblies')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Number of components per batch request')
+        parser.add_argument('--update-ratio', type=float, default=0.3,
+                            help='Share of components sent in a new version')
+        parser.add_argument('--protocol', type=int, default=1, choices=(1, 2),
+                            help='1 for the JSON-RPC routes, 2 for the '
+                                 'compressed compact routes')
+        parser.add_argument('--payloads',
+                            help='Replay the payloads of this NDJSON file')
+        parser.add_argument('--save-payloads',
+                            help='Record the sent payloads to this NDJSON file')
+        parser.add_argument('--report', help='File the JSON report is written to')
+        parser.add_argument('--baseline',
+                            help='Report of a previous run to compare with')
+        args = parser.parse_args(cmdargs)
+        logging.basicConfig(level=logging.INFO)
+
+        setup, schedule = self._get_payloads(args)
+        report = self._run(args, setup, schedule)
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if args.report:
+            with open(args.report, 'w') as report_file:
+                report_file.write(output + '\n')
+        else:
+            print(output)
+        if args.baseline:
+            with open(args.baseline) as baseline_file:
+                self._compare(json.load(baseline_file), report)
+
+    def _get_payloads(self, args):
+        """Get the setup and measured (endpoint, payload) tuples"""
+        if args.payloads:
+            with open(args.payloads) as payload_file:
+                records = [json.loads(line) for line in payload_file if line.strip()]
+            setup = [(r['endpoint'], r['payload']) for r in records if r.get('setup')]
+            schedule = [
+                (r['endpoint'], r['payload']) for r in records if not r.get('setup')]
+        else:
+            generator = PayloadGenerator(
+                args.seed, args.parts, args.assemblies, args.batch_size,
+                args.update_ratio)
+            setup = generator.setup()
+            schedule = generator.generate(args.mix, args.requests)
+        if args.save_payloads:
+            with open(args.save_payloads, 'w') as payload_file:
+                for is_setup, items in ((True, setup), (False, schedule)):
+                    for endpoint, payload in items:
+                        payload_file.write(json.dumps({
+                            'endpoint': endpoint,
+                            'payload': payload,
+                            'setup': is_setup,
+                        }) + '\n')
+        return setup, schedule
+
+    def _run(self, args, setup, schedule):
+        """Send the payloads and build the report"""
+        run_id = uuid.uuid4().hex
+        designers = [
+            Designer(args.url, args.database, args.login, args.password,
+                     args.protocol)
+            for dummy in range(max(args.concurrency, 1))
+        ]
+        for index, (endpoint, payload) in enumerate(setup):
+            designers[0].send(endpoint, payload, f'{run_id}-setup-{index}')
+        _logger.info('Sent %d setup payloads, starting %d designers',
+                     len(setup), len(designers))
+
+        since = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        samples = []
+        lock = threading.Lock()
+        position = iter(enumerate(schedule))
+
+        def work(designer):
+            while True:
+                with lock:
+                    index, (endpoint, payload) = next(position, (None, (None, None)))
+                if index is None:
+                    return
+                # Unique keys, so that the server does not replay the results
+                # of a previous run
+                sample = designer.send(endpoint, payload, f'{run_id}-{index}')
+                with lock:
+                    samples.append((endpoint, *sample))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(designers)) as pool:
+            list(pool.map(work, designers))
+        seconds = time.perf_counter() - start
+
+        return {
+            'config': {
+                'concurrency': len(designers),
+                'mix': args.mix,
+                'payloads': args.payloads or 'synthetic',
+                'protocol': args.protocol,
+                'requests': len(schedule),
+                'seed': args.seed,
+                'url': args.url,
+            },
+            'endpoints': {
+                endpoint: self._summarize(
+                    [sample for sample in samples if sample[0] == endpoint])
+                for endpoint in sorted({sample[0] for sample in samples})
+            },
+            'server': self._get_server_stats(designers[0], since),
+            'totals': dict(
+                self._summarize(samples),
+                seconds=round(seconds, 3),
+                throughput=round(len(samples) / seconds, 2) if seconds else 0.0,
+            ),
+        }
+
+    def _summarize(self, samples):
+        """Aggregate (endpoint, latency, success, failed, conflicts) samples"""
+        latencies = sorted(sample[1] for sample in samples)
+        count = len(samples)
+        errors = sum(not sample[2] for sample in samples)
+        failed_items = sum(sample[3] for sample in samples)
+        conflicts = sum(sample[4] for sample in samples)
+        summary = {
+            'requests': count,
+            'errors': errors,
+            'error_rate': round(errors / count, 4) if count else 0.0,
+            'failed_items': failed_items,
+            'conflicts': conflicts,
+            'conflict_rate': round(conflicts / count, 4) if count else 0.0,
+            'mean_ms': round(sum(latencies) / count * 1000, 2) if count else 0.0,
+            'max_ms': round(latencies[-1] * 1000, 2) if count else 0.0,
+        }
+        for rank in PERCENTILES:
+            summary[f'p{rank}_ms'] = round(percentile(latencies, rank) * 1000, 2)
+        return summary
+
+    def _get_server_stats(self, designer, since):
+        """Get the query and retry totals logged by the server for the run"""
+        try:
+            groups = designer.call_kw(
+                'fusion.sync.log', 'read_group',
+                [[('create_date', '>=', since), ('user_id', '=', designer.uid)],
+                 ['query_count:sum', 'query_time:sum', 'retry_count:sum',
+                  'duration:sum'],
+                 ['endpoint']],
+                {'lazy': False})
+        except (requests.RequestException, RuntimeError) as e:
+            _logger.warning('Could not read the sync logs: %s', e)
+            return {}
+        stats = {}
+        for group in groups:
+            calls = group['__count']
+            stats[group['endpoint'] or 'unknown'] = {
+                'calls': calls,
+                'queries': group['query_count'],
+                'queries_per_call': round(group['query_count'] / calls, 2),
+                'query_seconds': round(group['query_time'], 3),
+                'retries': group['retry_count'],
+                'retry_rate': round(group['retry_count'] / calls, 4),
+                'server_seconds': round(group['duration'], 3),
+            }
+        return stats
+
+    def _compare(self, baseline, report):
+        """Log the relative change of the main metrics against a baseline"""
+        metrics = ['throughput', 'error_rate', 'conflict_rate'] + [
+            f'p{rank}_ms' for rank in PERCENTILES]
+        for metric in metrics:
+            old = baseline.get('totals', {}).get(metric)
+            new = report['totals'][metric]
+            if not old:
+                _logger.info('%-14s %10s -> %10s', metric, old, new)
+                continue
+            _logger.info('%-14s %10s -> %10s (%+.1f%%)',
+                         metric, old, new, (new - old) / old * 100)
@@ -1,50 +1,509 @@
-from odoo import http
+from odoo import api, http
 from odoo.http import request
+from werkzeug.exceptions import (
+    BadRequest,
+    HTTPException,
+    NotFound,
+    RequestEntityTooLarge,
+    UnsupportedMediaType,
+)
+
+from ..models.fusion_component import (
+    get_error_code,
+    import_savepoint,
+    is_concurrency_error,
+    retry_on_conflict,
+)
+from ..models.fusion_sync_log import sync_count
+
+import copy
+import functools
+import gzip
+import io
 import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Versions of the add-in protocol: 1 returns the results of the JSON-RPC
+# routes, 2 compact results with a status code per item
+PROTOCOL_VERSIONS = (1, 2)
+
+# Status code of each item outcome in compact results
+ITEM_STATUS = {'created': 201, 'updated': 200, 'unchanged': 304}
+
+# Maximum size of a decompressed request body
+MAX_PAYLOAD_SIZE = 512 * 1024 * 1024
+
+# Minimum size of a response body worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+# Errors raised when reading a corrupt compressed request body
+DECODE_ERRORS = (OSError, EOFError, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard else ())
+
+# Content types accepted by the routes reading raw request bodies. As they
+# are exempt from CSRF checks, types that HTML forms can send are rejected.
+BODY_CONTENT_TYPES = ('application/json', 'application/x-ndjson')
+
+
+def _sync_logged(endpoint):
+    """Log the cost and outcome of an API call in fusion.sync.log
+
+    Successful results are stored under the idempotency key of the call,
+    sent in the Idempotency-Key header or the idempotency_key parameter and
+    defaulting to the hash of the payload. A retried call gets the stored
+    result back without being processed again. Results stored under the
+    hash of the payload are only replayed within a short retry window and
+    until the user syncs something else, and are not stored for queued
+    calls, which are queued again.
+
+    Calls conflicting with a concurrent sync are rolled back and retried.
+    Other errors are returned to Fusion 360.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            Idempotency = request.env['fusion.idempotency.key']
+            key = kwargs.pop('idempotency_key', None) or \
+                request.httprequest.headers.get('Idempotency-Key')
+            payload_hash = Idempotency._hash_payload(endpoint, kwargs)
+            derived = not key
+            key = key or payload_hash
+
+            def process():
+                stored = Idempotency._get_result(endpoint, key, payload_hash)
+                if stored is not None:
+                    sync_count(replayed=1)
+                    return stored
+                result = method(self, *args, **copy.deepcopy(kwargs))
+                if result.get('success'):
+                    Idempotency._invalidate_derived_keys()
+                    if not (derived and kwargs.get('async')):
+                        Idempotency._store_result(
+                            endpoint, key, payload_hash, result,
+                            derived=derived)
+                return result
+
+            with request.env['fusion.sync.log']._profile(endpoint) as outcome:
+                try:
+                    result = retry_on_conflict(request.env, process)
+                except Exception as e:
+                    result = {
+                        'success': False,
+                        'error': str(e),
+                        'code': get_error_code(e),
+                    }
+                outcome.update(result)
+            return result
+        return wrapper
+    return decorator
+
 
 class FusionController(http.Controller):
+
+    def _queue_job(self, endpoint, post):
+        """Store the payload as a sync job and return its id"""
+        job = request.env['fusion.sync.job'].create_from_request(endpoint, post)
+        return {'success': True, 'job_id': job.id, 'state': job.state}
     
     @http.route('/fusion_api/component', type='json', auth='user')
+    @_sync_logged('component')
     def create_component(self, **post):
         """API endpoint to create/update components from Fusion 360"""
         try:
-            component = request.env['fusion.component'].create_from_fusion(post)
+            if post.pop('async', False):
+                return self._queue_job('component', post)
+            with import_savepoint(request.env):
+                component = request.env['fusion.component'].create_from_fusion(
+                    post)
             return {'success': True, 'id': component.id}
         except Exception as e:
-            return {'success': False, 'error': str(e)}
+            if is_concurrency_error(e):
+                raise
+            return {'success': False, 'error': str(e), 'code': get_error_code(e)}
+
+    @http.route('/fusion_api/components', type='json', auth='user')
+    @_sync_logged('components')
+    def create_components(self, **post):
+        """API endpoint to create/update several components from Fusion 360"""
+        try:
+            if post.pop('async', False):
+                return self._queue_job('components', post)
+            results = request.env['fusion.component'].with_context(
+                fusion_import=True).create_from_fusion_batch(post['components'])
+            return {'success': True, 'results': results}
+        except Exception as e:
+            if is_concurrency_error(e):
+                raise
+            return {'success': False, 'error': str(e), 'code': get_error_code(e)}
+
+    @http.route('/fusion_api/assembly', type='json', auth='user')
+    @_sync_logged('assembly')
+    def create_assembly(self, **post):
+        """API endpoint to create/update a whole assembly tree from Fusion 360"""
+        try:
+            if post.pop('async', False):
+                return self._queue_job('assembly', post)
+            with import_savepoint(request.env):
+                root = request.env['fusion.component'].with_context(
+                    fusion_import=True).create_from_fusion_tree(post['assembly'])
+            return {'success': True, 'id': root.id}
+        except Exception as e:
+            if is_concurrency_error(e):
+                raise
+            return {'success': False, 'error': str(e), 'code': get_error_code(e)}
 
     @http.route('/fusion_api/bom', type='json', auth='user')
+    @_sync_logged('bom')
     def create_bom(self, **post):
         """API endpoint to create/update BOMs from Fusion 360"""
         try:
-            # Get or create the parent component
-            parent = request.env['fusion.component'].search([
-                ('fusion_id', '=', post['parent_id'])
-            ])
-            
-            if not parent:
-                return {'success': False, 'error': 'Parent component not found'}
-                
-            # Create/Update BOM
-            bom_vals = {
-                'product_tmpl_id': parent.product_id.id,
-                'type': 'normal'
+            if post.pop('async', False):
+                return self._queue_job('bom', post)
+            bom, missing = request.env[
+                'fusion.component'].sync_bom_from_fusion_payload(post)
+            return {'success': True, 'id': bom.id, 'missing': missing}
+        except Exception as e:
+            if is_concurrency_error(e):
+                raise
+            return {'success': False, 'error': str(e), 'code': get_error_code(e)}
+
+    @http.route('/fusion_api/v2/<string:endpoint>', type='http', auth='user',
+                methods=['POST'], csrf=False)
+    def sync(self, endpoint, **kwargs):
+        """API endpoint to sync compressed payloads from Fusion 360
+
+        The body is the JSON object sent to the matching JSON-RPC route as
+        application/json, optionally gzip or zstd compressed as told by its
+        Content-Encoding.
+        The protocol version is negotiated with the X-Fusion-Protocol
+        header listing the versions the add-in supports: clients sending
+        none get the results of the JSON-RPC routes, clients supporting
+        version 2 compact results. Responses are gzip compressed when the
+        client accepts it.
+        """
+        handlers = {
+            'component': self.create_component,
+            'components': self.create_components,
+            'assembly': self.create_assembly,
+            'bom': self.create_bom,
+        }
+        try:
+            if endpoint not in handlers:
+                raise NotFound()
+            self._check_content_type()
+            version = self._negotiate_protocol()
+            payload = json.loads(self._read_body())
+            if not isinstance(payload, dict):
+                raise BadRequest('The payload must be a JSON object')
+        except HTTPException as e:
+            return self._json_response(
+                {'success': False, 'code': e.code, 'error': e.description},
+                status=e.code)
+        except ValueError as e:
+            return self._json_response(
+                {'success': False, 'code': 400, 'error': str(e)}, status=400)
+
+        result = handlers[endpoint](**payload)
+        if version >= 2:
+            result = self._compact(result)
+        return self._json_response(result, version=version)
+
+    def _negotiate_protocol(self):
+        """Get the highest protocol version supported by both sides"""
+        header = request.httprequest.headers.get('X-Fusion-Protocol')
+        if not header:
+            return PROTOCOL_VERSIONS[0]
+        try:
+            versions = {int(version) for version in header.split(',')}
+        except ValueError:
+            raise BadRequest(f'Invalid protocol versions: {header}')
+        common = versions.intersection(PROTOCOL_VERSIONS)
+        if not common:
+            raise BadRequest('Unsupported protocol versions, supported: '
+                             + ', '.join(map(str, PROTOCOL_VERSIONS)))
+        return max(common)
+
+    def _open_body(self):
+        """Open the request body, decompressed as told by its encoding
+
+        Returns:
+            tuple: (file object, content encoding)
+        """
+        stream = request.httprequest.stream
+        encoding = (request.httprequest.headers.get('Content-Encoding')
+                    or 'identity').strip().lower()
+        if encoding == 'gzip':
+            stream = gzip.GzipFile(fileobj=stream)
+        elif encoding == 'zstd' and zstandard:
+            stream = io.BufferedReader(
+                zstandard.ZstdDecompressor().stream_reader(stream))
+        elif encoding != 'identity':
+            raise UnsupportedMediaType(f'Unsupported content encoding {encoding}')
+        return stream, encoding
+
+    def _read_body(self):
+        """Read the request body, decompressed as told by its encoding"""
+        stream, encoding = self._open_body()
+        chunks = []
+        size = 0
+        try:
+            while chunk := stream.read(64 * 1024):
+                size += len(chunk)
+                if size > MAX_PAYLOAD_SIZE:
+                    raise RequestEntityTooLarge()
+                chunks.append(chunk)
+        except DECODE_ERRORS as e:
+            raise BadRequest(f'Invalid {encoding} body: {e}')
+        return b''.join(chunks) or b'{}'
+
+    def _compact(self, result):
+        """Reduce a sync result to status codes and the changed values"""
+        compact = {
+            's': 200 if result.get('success') else result.get('code', 500),
+        }
+        for key, short in (('id', 'id'), ('job_id', 'job'), ('missing', 'missing')):
+            if result.get(key):
+                compact[short] = result[key]
+        if 'results' in result:
+            compact['r'] = [self._compact_item(item) for item in result['results']]
+        return compact
+
+    def _compact_item(self, item):
+        """Reduce the result of one item to its status code, and its id when
+        it was created or updated"""
+        if not item.get('success'):
+            return {'s': item.get('code', 500)}
+        status = ITEM_STATUS.get(item.get('status'), 200)
+        if status == ITEM_STATUS['unchanged']:
+            return {'s': status}
+        compact = {'s': status, 'id': item['id']}
+        if item.get('missing'):
+            compact['missing'] = item['missing']
+        return compact
+
+    def _json_response(self, value, status=200, version=None):
+        """Encode a compact JSON response, gzip compressed if accepted"""
+        body = json.dumps(value, separators=(',', ':')).encode()
+        headers = [('Content-Type', 'application/json')]
+        if version:
+            headers.append(('X-Fusion-Protocol', str(version)))
+        if len(body) >= MIN_COMPRESS_SIZE and \
+                'gzip' in request.httprequest.accept_encodings:
+            body = gzip.compress(body)
+            headers.append(('Content-Encoding', 'gzip'))
+        headers.append(('Vary', 'Accept-Encoding'))
+        return request.make_response(body, headers=headers, status=status)
+
+    @http.route('/fusion_api/stream', type='http', auth='user',
+                methods=['POST'], csrf=False)
+    def stream_records(self, **kwargs):
+        """API endpoint to import newline-delimited JSON from Fusion 360
+
+        Records are parsed as they are received, optionally gzip or zstd
+        compressed, and processed and committed in chunks. Results are
+        streamed back as newline-delimited JSON, so memory use does not grow
+        with the upload. A corrupt compressed body ends the stream with an
+        error line.
+        """
+        self._check_content_type()
+        stream, encoding = self._open_body()
+        settings = request.env['res.config.settings']._get_fusion_settings()
+        return request.make_response(
+            self._stream_records(
+                request.env.registry,
+                request.env.uid,
+                dict(request.env.context, fusion_import=True),
+                stream,
+                max(settings.stream_chunk_size, 1),
+                encoding,
+            ),
+            headers=[('Content-Type', 'application/x-ndjson')],
+        )
+
+    def _check_content_type(self):
+        """Reject request bodies that are not JSON before reading them"""
+        mimetype = request.httprequest.mimetype
+        if mimetype not in BODY_CONTENT_TYPES:
+            raise UnsupportedMediaType(
+                f'Unsupported content type {mimetype or "(none)"}, expected '
+                + ' or '.join(BODY_CONTENT_TYPES))
+
+    def _stream_records(self, registry, uid, context, stream, chunk_size,
+                        encoding='identity'):
+        """Process the streamed records with a dedicated cursor"""
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            totals = {'records': 0, 'failed': 0, 'chunks': 0}
+            error = None
+            with env['fusion.sync.log']._profile('stream') as outcome:
+                chunk = []
+                lines = enumerate(stream, 1)
+                while True:
+                    # Records received before a corrupt part are processed
+                    try:
+                        number, line = next(lines)
+                    except StopIteration:
+                        break
+                    except DECODE_ERRORS as e:
+                        error = f'Invalid {encoding} body: {e}'
+                        break
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                        if not isinstance(record, dict):
+                            raise ValueError('Record must be a JSON object')
+                    except ValueError as e:
+                        totals['records'] += 1
+                        totals['failed'] += 1
+                        yield self._ndjson(
+                            {'line': number, 'success': False, 'error': str(e)})
+                        continue
+                    chunk.append((number, record))
+                    if len(chunk) >= chunk_size:
+                        yield from self._stream_chunk(env, chunk, totals)
+                        chunk = []
+                if chunk:
+                    yield from self._stream_chunk(env, chunk, totals)
+                outcome.update(success=not error, error=error)
+            if error:
+                yield self._ndjson(dict(
+                    totals, done=True, success=False, code=400, error=error))
+            else:
+                yield self._ndjson(dict(totals, done=True))
+
+    def _stream_chunk(self, env, chunk, totals):
+        """Process and commit one chunk of streamed records"""
+        try:
+            results = retry_on_conflict(
+                env, lambda: env['fusion.component'].create_from_fusion_records(
+                    [record for dummy, record in chunk]))
+            env.cr.commit()
+        except Exception as e:
+            env.cr.rollback()
+            env.registry.clear_cache()
+            results = [{
+                'success': False, 'error': str(e), 'code': get_error_code(e),
+            }] * len(chunk)
+
+        totals['chunks'] += 1
+        for (number, dummy), result in zip(chunk, results):
+            totals['records'] += 1
+            totals['failed'] += not result['success']
+            yield self._ndjson(dict(result, line=number))
+        yield self._ndjson({'progress': dict(totals)})
+
+    def _ndjson(self, value):
+        """Encode a value as one line of newline-delimited JSON"""
+        return json.dumps(value).encode() + b'\n'
+
+    @http.route('/fusion_api/resolve', type='http', auth='user',
+                methods=['POST'], csrf=False)
+    def resolve(self, **kwargs):
+        """API endpoint to resolve the Odoo products of Fusion components
+
+        The body is a JSON object with the list of component keys. The
+        response carries an ETag, so a client sending it back in
+        If-None-Match gets an empty 304 response while nothing changed,
+        without the keys being resolved.
+        """
+        Component = request.env['fusion.component']
+        try:
+            post = json.loads(request.httprequest.get_data() or '{}')
+            keys = post['components']
+            etag = Component._get_resolve_etag(keys)
+            headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'no-cache')]
+            if request.httprequest.if_none_match.contains(etag):
+                return request.make_response('', headers=headers, status=304)
+            results = Component.resolve_from_fusion(keys)
+        except Exception as e:
+            return request.make_json_response(
+                {'success': False, 'error': str(e)}, status=400)
+
+        body = json.dumps({'success': True, 'components': results},
+                          separators=(',', ':'))
+        return request.make_response(
+            body, headers=headers + [('Content-Type', 'application/json')])
+
+    @http.route('/fusion_api/search', type='json', auth='user')
+    def search_components(self, filters, limit=None, **post):
+        """API endpoint to search components on configuration parameters"""
+        try:
+            components = request.env['fusion.component'].search_by_parameters(
+                filters, limit)
+            return {
+                'success': True,
+                'components': [{
+                    'id': component.id,
+                    'fusion_id': component.fusion_id,
+                    'configuration_name': component.configuration_name or None,
+                    'product_id': component.product_id.id or None,
+                } for component in components],
+            }
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    @http.route('/fusion_api/changes', type='json', auth='user')
+    def changes(self, cursor=None, limit=None, **post):
+        """API endpoint to read components and BOMs changed since a cursor"""
+        try:
+            feed = request.env['fusion.component'].get_changes(cursor, limit)
+            return dict(feed, success=True)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    @http.route('/fusion_api/tree', type='json', auth='user')
+    def tree(self, component_id=False, offset=0, limit=None, **post):
+        """API endpoint to read one page of the sub-components of an assembly"""
+        try:
+            page = request.env['fusion.component'].get_tree_children(
+                component_id, offset, limit)
+            return dict(page, success=True)
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    @http.route('/fusion_api/explode', type='json', auth='user')
+    def explode(self, **post):
+        """API endpoint to list all sub-components of an assembly"""
+        try:
+            component = request.env['fusion.component']._find_existing_component(post)
+            if not component:
+                return {'success': False, 'error': 'Component not found'}
+            return {'success': True, 'components': component[:1].get_explosion()}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    @http.route('/fusion_api/where_used', type='json', auth='user')
+    def where_used(self, **post):
+        """API endpoint to list all assemblies using a component"""
+        try:
+            component = request.env['fusion.component']._find_existing_component(post)
+            if not component:
+                return {'success': False, 'error': 'Component not found'}
+            return {'success': True, 'assemblies': component[:1].get_where_used()}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+    @http.route('/fusion_api/stats', type='json', auth='user')
+    def stats(self, days=7, **post):
+        """API endpoint to get latency and outcome statistics per endpoint"""
+        try:
+            return {
+                'success': True,
+                'stats': request.env['fusion.sync.log'].get_stats(days),
             }
-            
-            bom = request.env['mrp.bom'].create(bom_vals)
-            
-            # Add BOM lines
-            for component in post['components']:
-                child = request.env['fusion.component'].search([
-                    ('fusion_id', '=', component['fusion_id'])
-                ])
-                if child:
-                    request.env['mrp.bom.line'].create({
-                        'bom_id': bom.id,
-                        'product_id': child.product_id.product_variant_id.id,
-                        'product_qty': component['quantity']
-                    })
-            
-            return {'success': True, 'id': bom.id}
         except Exception as e:
             return {'success': False, 'error': str(e)}
+
+    @http.route('/fusion_api/job/<int:job_id>', type='json', auth='user')
+    def job_status(self, job_id, **post):
+        """API endpoint to poll the status of a queued sync job"""
+        job = request.env['fusion.sync.job'].browse(job_id).exists()
+        if not job:
+            return {'success': False, 'error': 'Job not found'}
+        return dict(job.get_status(), success=True)
@@ -0,0 +1,23 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Backfill configuration hashes of components and their variants."""
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    components = env['fusion.component'].with_context(
+        active_test=False).search([('configuration_values', '!=', False)])
+    components._compute_configuration_hash()
+    env.flush_all()
+    cr.execute("""
+        UPDATE product_product pp
+           SET fusion_configuration_hash = fc.configuration_hash
+          FROM fusion_component fc
+         WHERE fc.product_id = pp.id
+           AND fc.configuration_hash IS NOT NULL
+           AND pp.fusion_configuration_hash IS NULL
+    """)
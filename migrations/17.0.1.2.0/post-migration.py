@@ -0,0 +1,14 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Store the configuration parameters of existing components."""
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    components = env['fusion.component'].with_context(
+        active_test=False).search([('configuration_values', '!=', False)])
+    components._sync_parameters()
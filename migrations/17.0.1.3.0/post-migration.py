@@ -0,0 +1,12 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Initialize the component and BOM line counters of assemblies."""
+    if not version:
+        return
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['fusion.component']._recompute_tree_counts()
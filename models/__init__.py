@@ -1,3 +1,11 @@
 from . import fusion_component
+from . import fusion_component_parameter
 from . import fusion_settings
 from . import product_attribute
+from . import mrp_bom
+from . import product_product
+from . import fusion_sync_job
+from . import fusion_sync_log
+from . import fusion_tombstone
+from . import fusion_idempotency_key
+from . import fusion_gc
@@ -1,14 +1,210 @@
 # Copyright 2024 jaco tech
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import _, api, fields, models
-from odoo.exceptions import ValidationError
+from odoo import _, api, fields, models, Command
+from odoo.exceptions import AccessError, MissingError, UserError, ValidationError
+from odoo.service.model import (
+    MAX_TRIES_ON_CONCURRENCY_FAILURE,
+    PG_CONCURRENCY_ERRORS_TO_RETRY,
+)
+from odoo.tools import float_compare
+from odoo.tools.sql import create_index, index_exists
 
+from markupsafe import Markup
+import psycopg2
+from psycopg2 import errorcodes
+
+from .fusion_sync_log import sync_count, sync_phase
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import base64
+import binascii
+import hashlib
 import json
 import logging
+import random
+import time
+import weakref
 
 _logger = logging.getLogger(__name__)
 
+# Unique constraints and indexes on the keys Fusion records are looked up
+# by. Violating one means another worker committed the same record after
+# the current transaction started.
+FUSION_UNIQUE_KEYS = {
+    'fusion_component_fusion_id_company_uniq',
+    'fusion_component_fusion_key_uniq',
+    'product_attribute_fusion_parameter_uniq',
+    'product_attribute_value_value_company_uniq',
+    'product_product_combination_unique',
+    'mrp_bom_fusion_component_uniq',
+    'fusion_idempotency_key_key_uniq',
+}
+
+
+# Operators supported by parameter filters
+PARAMETER_OPERATORS = {'=', '!=', '<', '<=', '>', '>=', 'in', 'not in', 'ilike'}
+
+# Change feed sources: kind of record, table and SQL condition of the rows
+CHANGE_FEED_SOURCES = [
+    ('components', 'fusion_component', 'TRUE'),
+    ('boms', 'mrp_bom', 'fusion_component_id IS NOT NULL'),
+    ('tombstones', 'fusion_tombstone', 'TRUE'),
+]
+
+# Values Fusion 360 must send for every component, all stored as NOT NULL
+REQUIRED_FUSION_VALUES = (
+    'fusion_id', 'name', 'component_type', 'last_modified', 'version_identifier',
+)
+
+# Number of sub-components returned per page of the assembly tree
+TREE_PAGE_SIZE = 80
+
+# Physical properties rolled up the assembly tree, by their total field
+PHYSICAL_PROPERTIES = {
+    'mass': 'total_mass',
+    'volume': 'total_volume',
+    'material_cost': 'total_material_cost',
+}
+
+
+def is_concurrency_error(error):
+    """Tell whether an error is caused by a concurrent transaction.
+
+    Args:
+        error (Exception): Raised error
+
+    Returns:
+        bool: True for serialization failures, deadlocks, lock timeouts and
+            unique violations on Fusion keys
+    """
+    while error is not None:
+        if isinstance(error, psycopg2.Error):
+            if error.pgcode in PG_CONCURRENCY_ERRORS_TO_RETRY:
+                return True
+            if error.pgcode == errorcodes.UNIQUE_VIOLATION:
+                return error.diag.constraint_name in FUSION_UNIQUE_KEYS
+        error = error.__cause__
+    return False
+
+
+def get_error_code(error):
+    """Get the HTTP-like status code reported for a failed sync item.
+
+    Args:
+        error (Exception): Raised error
+
+    Returns:
+        int: 409 for concurrency conflicts, 403 for access errors, 404 for
+            missing records, 422 for rejected data, 400 for malformed data
+            and 500 otherwise
+    """
+    if is_concurrency_error(error):
+        return 409
+    if isinstance(error, AccessError):
+        return 403
+    if isinstance(error, MissingError):
+        return 404
+    if isinstance(error, UserError):
+        return 422
+    if isinstance(error, (KeyError, TypeError, ValueError)):
+        return 400
+    return 500
+
+
+def retry_on_conflict(env, func):
+    """Run a function, retrying it in a new transaction on conflicts.
+
+    Records created by concurrent workers are not visible in the snapshot
+    of the current transaction, so a conflict rolls the whole transaction
+    back before running the function again, with a random backoff.
+
+    Args:
+        env (odoo.api.Environment): Environment of the transaction
+        func (callable): Function to run, without arguments
+
+    Returns:
+        object: Result of the function
+    """
+    for tries in range(1, MAX_TRIES_ON_CONCURRENCY_FAILURE + 1):
+        try:
+            result = func()
+            env.flush_all()
+            return result
+        except Exception as e:
+            if tries == MAX_TRIES_ON_CONCURRENCY_FAILURE or \
+                    not is_concurrency_error(e) or env.cr._closed:
+                raise
+            _logger.info('Fusion sync conflict, retrying (%d/%d): %s',
+                         tries, MAX_TRIES_ON_CONCURRENCY_FAILURE, e)
+            env.cr.rollback()
+            env.reset()
+            env.registry.clear_cache()
+            sync_count(retries=1)
+            time.sleep(random.uniform(0.0, 2 ** tries * 0.1))
+
+
+# Import changes of the open import savepoints, by cursor. They are not kept
+# in the transaction data: flushing savepoints run the precommit hooks, which
+# clears it.
+_import_savepoints = weakref.WeakKeyDictionary()
+
+
+@contextmanager
+def import_savepoint(env):
+    """Open a savepoint keeping the import changes recorded in it only if
+    it succeeds.
+
+    The changes reported by _post_fusion_import_summary are kept in the
+    transaction data, which rolling back a savepoint does not undo. They
+    are collected per savepoint instead, and merged into the enclosing one
+    on success.
+
+    Args:
+        env (odoo.api.Environment): Environment of the transaction
+    """
+    stack = _import_savepoints.setdefault(env.cr, [])
+    changes = {}
+    stack.append(changes)
+    try:
+        with env.cr.savepoint():
+            yield
+    finally:
+        stack.remove(changes)
+    if not changes:
+        return
+    target = stack[-1] if stack else \
+        env['fusion.component']._get_fusion_import_changes()
+    for component_id, change in changes.items():
+        target.setdefault(
+            component_id, {'status': change['status'], 'fields': set()}
+        )['fields'].update(change['fields'])
+
+
+def create_unique_index(cr, name, table, expressions, where='TRUE'):
+    """Create a partial unique index if it does not exist yet.
+
+    Like SQL constraints, the index is skipped with a warning when existing
+    rows violate it.
+
+    Args:
+        cr (odoo.sql_db.Cursor): Database cursor
+        name (str): Index name
+        table (str): Table name
+        expressions (list): Indexed SQL expressions
+        where (str): SQL condition of the rows to index
+    """
+    if index_exists(cr, name):
+        return
+    try:
+        with cr.savepoint(flush=False):
+            cr.execute(f'CREATE UNIQUE INDEX "{name}" ON "{table}" '
+                       f'({", ".join(expressions)}) WHERE {where}')
+    except psycopg2.Error as e:
+        _logger.warning('Unable to create unique index %s on %s: %s',
+                        name, table, e)
+
 
 class FusionComponent(models.Model):
     """
@@ -19,6 +215,7 @@ class FusionComponent(models.Model):
     _description = 'Fusion 360 Component'
     _inherit = ['mail.thread', 'mail.activity.mixin']
     _order = 'name, id'
+    _parent_store = True
 
     # region Fields
     name = fields.Char(
@@ -58,6 +255,10 @@ class FusionComponent(models.Model):
         tracking=True,
         help="Parent assembly component"
     )
+    parent_path = fields.Char(
+        index=True,
+        unaccent=False
+    )
     child_ids = fields.One2many(
         'fusion.component',
         'parent_id',
@@ -87,6 +288,21 @@ class FusionComponent(models.Model):
         tracking=True,
         help="JSON representation of configuration parameters"
     )
+    parameter_ids = fields.One2many(
+        'fusion.component.parameter',
+        'component_id',
+        string='Parameters',
+        readonly=True,
+        help="Configuration parameters, kept in sync with the configuration "
+             "values for searching"
+    )
+    configuration_hash = fields.Char(
+        string='Configuration Hash',
+        compute='_compute_configuration_hash',
+        store=True,
+        index='btree_not_null',
+        help="Hash of the normalized configuration values"
+    )
     last_modified = fields.Datetime(
         string='Last Modified',
         required=True,
@@ -109,6 +325,64 @@ class FusionComponent(models.Model):
         default=True,
         help="Set to false to hide the component without removing it"
     )
+    child_count = fields.Integer(
+        string='Direct Components',
+        readonly=True,
+        copy=False,
+        help="Number of active components directly in this assembly"
+    )
+    descendant_count = fields.Integer(
+        string='All Components',
+        readonly=True,
+        copy=False,
+        help="Number of active components at any level of this assembly"
+    )
+    bom_line_count = fields.Integer(
+        string='BOM Lines',
+        readonly=True,
+        copy=False,
+        help="Number of lines of the active BOM managed for this assembly"
+    )
+    mass = fields.Float(
+        digits='Stock Weight',
+        tracking=True,
+        help="Mass of the component itself, as sent by Fusion 360"
+    )
+    volume = fields.Float(
+        digits='Volume',
+        tracking=True,
+        help="Volume of the component itself, as sent by Fusion 360"
+    )
+    material_cost = fields.Float(
+        digits='Product Price',
+        tracking=True,
+        help="Material cost of the component itself, as sent by Fusion 360"
+    )
+    total_mass = fields.Float(
+        digits='Stock Weight',
+        readonly=True,
+        copy=False,
+        help="Mass of the component and its sub-components, by BOM quantity"
+    )
+    total_volume = fields.Float(
+        digits='Volume',
+        readonly=True,
+        copy=False,
+        help="Volume of the component and its sub-components, by BOM quantity"
+    )
+    total_material_cost = fields.Float(
+        digits='Product Price',
+        readonly=True,
+        copy=False,
+        help="Material cost of the component and its sub-components, by BOM "
+             "quantity"
+    )
+    rollup_dirty = fields.Boolean(
+        readonly=True,
+        copy=False,
+        help="Set when the totals must be recomputed before the transaction "
+             "is committed"
+    )
     # endregion
 
     # region Constraints and SQL Constraints
@@ -117,17 +391,90 @@ class FusionComponent(models.Model):
          'unique(fusion_id, configuration_name, company_id)',
          'Component with this Fusion ID and configuration already exists!')
     ]
+
+    @api.constrains('parent_id')
+    def _check_parent_id(self):
+        if self._has_cycle():
+            raise ValidationError(
+                _('A component cannot be part of its own assembly.'))
+
+    def init(self):
+        # The SQL constraint does not apply to components without
+        # configuration, as NULL configuration names are distinct
+        create_unique_index(
+            self.env.cr, 'fusion_component_fusion_key_uniq', self._table,
+            ['fusion_id', "COALESCE(configuration_name, '')", 'company_id'])
+        create_index(
+            self.env.cr, 'fusion_component_change_feed_index', self._table,
+            ['company_id', 'write_date', 'id'])
+        # Pages of sub-components are read in display order
+        create_index(
+            self.env.cr, 'fusion_component_tree_page_index', self._table,
+            ['parent_id', 'name', 'id'])
+        create_index(
+            self.env.cr, 'fusion_component_rollup_dirty_index', self._table,
+            ['id'], where='rollup_dirty')
+    # endregion
+
+    # region Compute Methods
+    @api.depends('configuration_values')
+    def _compute_configuration_hash(self):
+        for component in self:
+            config_values = component._parse_configuration_values(
+                component.configuration_values)
+            component.configuration_hash = (
+                config_values and self._hash_configuration(config_values))
     # endregion
 
     # region CRUD Methods
     @api.model_create_multi
     def create(self, vals_list):
-        """Override create to add additional logic."""
-        return super().create(vals_list)
+        """Override create to store the configuration parameters and count
+        the new components in their assemblies."""
+        components = super().create(vals_list)
+        components.filtered('configuration_values')._sync_parameters()
+        components._update_tree_counts(None, components._get_tree_counts())
+        components._mark_rollup_dirty()
+        return components
 
     def write(self, vals):
-        """Override write to add additional logic."""
-        return super().write(vals)
+        """Override write to keep the configuration parameters and the
+        component counts of assemblies in sync."""
+        moved = 'parent_id' in vals or 'active' in vals
+        before = moved and self._get_tree_counts()
+        old_parents = self.parent_id if moved else self.browse()
+        result = super().write(vals)
+        if 'configuration_values' in vals:
+            self._sync_parameters()
+        if moved:
+            self._update_tree_counts(before, self._get_tree_counts())
+            (old_parents | self.parent_id)._mark_rollup_dirty()
+        if vals.keys() & PHYSICAL_PROPERTIES.keys():
+            self._mark_rollup_dirty()
+        return result
+
+    def unlink(self):
+        """Override unlink to report deleted components and BOMs, and
+        uncount them from their assemblies."""
+        # Detach the remaining sub-components first so that their parent
+        # path stays consistent with their parent
+        self.with_context(active_test=False).search([
+            ('parent_id', 'in', self.ids),
+            ('id', 'not in', self.ids),
+        ]).write({'parent_id': False})
+        before = self._get_tree_counts()
+        (self.parent_id - self)._mark_rollup_dirty()
+
+        Tombstone = self.env['fusion.tombstone']
+        Tombstone._add_tombstones(self)
+        boms = self.env['mrp.bom'].with_context(active_test=False).search([
+            ('fusion_component_id', 'in', self.ids),
+        ])
+        if boms:
+            Tombstone._add_tombstones(boms)
+        result = super().unlink()
+        self._update_tree_counts(before, None)
+        return result
     # endregion
 
     # region Action Methods
@@ -141,37 +488,1522 @@ class FusionComponent(models.Model):
         Returns:
             fusion.component: Created or updated component record
         """
+        components, statuses = self._upsert_from_fusion([vals])
+        sync_count(items=1, **{statuses[0]: 1})
+        return components
+
+    @api.model
+    def create_from_fusion_batch(self, vals_list):
+        """Create or update several components from Fusion 360 data.
+
+        Valid items are upserted together; if that fails, they are retried
+        one by one in their own savepoint so a bad item does not roll back
+        the others. Conflicts with concurrent workers are raised instead, see
+        retry_on_conflict.
+
+        Args:
+            vals_list (list): List of component values
+
+        Returns:
+            list: One result dict per item, in input order, with the
+                component id and whether it was created, updated or unchanged
+        """
+        results = [None] * len(vals_list)
+        valid = []
+        for index, vals in enumerate(vals_list):
+            try:
+                self._check_fusion_vals(vals)
+                valid.append(index)
+            except ValidationError as e:
+                results[index] = {
+                    'success': False, 'error': str(e), 'code': get_error_code(e),
+                }
+
+        if valid:
+            try:
+                with import_savepoint(self.env):
+                    components, statuses = self._upsert_from_fusion(
+                        [vals_list[index] for index in valid])
+                for index, component, status in zip(valid, components, statuses):
+                    results[index] = {
+                        'success': True, 'id': component.id, 'status': status}
+            except Exception as e:
+                # Retrying in this transaction would hit the conflict again
+                if is_concurrency_error(e):
+                    raise
+                _logger.info(
+                    'Bulk Fusion upsert failed, retrying items one by one',
+                    exc_info=True)
+                # Cached attribute ids may point to rolled back records
+                self.env.registry.clear_cache()
+                for index in valid:
+                    try:
+                        with import_savepoint(self.env):
+                            component, statuses = self._upsert_from_fusion(
+                                [vals_list[index]])
+                        results[index] = {
+                            'success': True,
+                            'id': component.id,
+                            'status': statuses[0],
+                        }
+                    except Exception as e:
+                        if is_concurrency_error(e):
+                            raise
+                        self.env.registry.clear_cache()
+                        results[index] = {
+                            'success': False,
+                            'error': str(e),
+                            'code': get_error_code(e),
+                        }
+
+        sync_count(items=len(vals_list), **Counter(
+            result.get('status', 'failed') for result in results))
+        return results
+
+    @api.model
+    def create_from_fusion_records(self, records):
+        """Create or update components and BOMs from a list of records.
+
+        Components are upserted together, then BOM records are applied in
+        order, each in its own savepoint.
+
+        Args:
+            records (list): Component values, or BOM data as sent to the BOM
+                endpoint with 'type' set to 'bom'
+
+        Returns:
+            list: One result dict per record, in input order
+        """
+        results = [None] * len(records)
+        components = [
+            (index, record) for index, record in enumerate(records)
+            if record.get('type', 'component') == 'component'
+        ]
+        if components:
+            component_results = self.create_from_fusion_batch([
+                {key: value for key, value in record.items() if key != 'type'}
+                for dummy, record in components
+            ])
+            for (index, dummy), result in zip(components, component_results):
+                results[index] = result
+
+        for index, record in enumerate(records):
+            if results[index] is not None:
+                continue
+            try:
+                if record.get('type') != 'bom':
+                    raise ValidationError(
+                        _('Unknown record type %s', record.get('type')))
+                with import_savepoint(self.env):
+                    bom, missing = self.sync_bom_from_fusion_payload(record)
+                results[index] = {'success': True, 'id': bom.id, 'missing': missing}
+            except Exception as e:
+                if is_concurrency_error(e):
+                    raise
+                results[index] = {
+                    'success': False, 'error': str(e), 'code': get_error_code(e),
+                }
+        return results
+
+    @api.model
+    def create_from_fusion_tree(self, tree):
+        """Create or update a whole assembly tree from Fusion 360 data.
+
+        The tree is walked level by level: the components of each level are
+        upserted together and linked to their parent, then the BOMs of all
+        assemblies are synchronized at once.
+
+        Args:
+            tree (dict): Root component values, where assemblies hold their
+                sub-components in 'children' and each child its 'quantity'
+
+        Returns:
+            fusion.component: Root component
+        """
+        level = [(tree, self.browse())]
+        root = self.browse()
+        seen = self.browse()
+        lines_by_component = {}
+        while level:
+            components, statuses = self._upsert_from_fusion([
+                {
+                    key: value for key, value in node.items()
+                    if key not in ('children', 'quantity')
+                }
+                for node, parent in level
+            ])
+            root = root or components[:1]
+            seen |= components
+            sync_count(items=len(components), **Counter(statuses))
+
+            next_level = []
+            relink = defaultdict(list)
+            for (node, parent), component in zip(level, components):
+                if parent:
+                    lines_by_component[parent].append(
+                        (component.product_id, float(node.get('quantity', 1))))
+                    if component.parent_id != parent:
+                        relink[parent.id].append(component.id)
+                # Shared sub-assemblies are only expanded once. An assembly
+                # sent with an empty list of children is synced to empty.
+                children = node.get('children')
+                expand = children or (
+                    isinstance(children, list)
+                    and component.component_type == 'assembly')
+                if expand and component not in lines_by_component:
+                    lines_by_component[component] = []
+                    next_level.extend(
+                        (child, component) for child in children)
+            for parent_id, component_ids in relink.items():
+                self.browse(component_ids).write({'parent_id': parent_id})
+            level = next_level
+
+        if lines_by_component:
+            assemblies = self.browse([c.id for c in lines_by_component])
+            self.search([
+                ('parent_id', 'in', assemblies.ids),
+                ('id', 'not in', seen.ids),
+            ]).write({'parent_id': False})
+            with sync_phase('bom_lines'):
+                self._sync_fusion_boms(lines_by_component)
+        return root
+
+    @api.model
+    def sync_bom_from_fusion_payload(self, payload):
+        """Synchronize the BOM of an assembly identified in API data.
+
+        Args:
+            payload (dict): API data with the parent_id Fusion ID, optionally
+                its configuration_name, and the components BOM lines
+
+        Returns:
+            tuple: (mrp.bom, list of Fusion IDs without component)
+        """
+        parent = self._find_existing_component({
+            'fusion_id': payload['parent_id'],
+            'configuration_name': payload.get('configuration_name', False),
+        })
+        if not parent:
+            raise ValidationError(_('Parent component not found'))
+        return parent[:1].sync_bom_from_fusion(payload['components'])
+
+    def sync_bom_from_fusion(self, lines):
+        """Synchronize the Fusion-managed BOM of this assembly.
+
+        Args:
+            lines (list): BOM lines as dicts with fusion_id, quantity and
+                optionally configuration_name
+
+        Returns:
+            tuple: (mrp.bom, list of Fusion IDs without component)
+        """
+        self.ensure_one()
+        children = self._find_existing_components(lines)
+        by_fusion_id = {}
+        for (fusion_id, dummy), child in children.items():
+            by_fusion_id.setdefault(fusion_id, child)
+
+        bom_lines = []
+        missing = []
+        for line in lines:
+            child = children.get(self._fusion_key(line))
+            if not child and not line.get('configuration_name'):
+                child = by_fusion_id.get(line['fusion_id'])
+            if child and child.product_id:
+                bom_lines.append((child.product_id, float(line['quantity'])))
+            else:
+                missing.append(line['fusion_id'])
+
+        sync_count(items=len(lines), failed=len(missing))
+        with sync_phase('bom_lines'):
+            boms = self._sync_fusion_boms({self: bom_lines})
+        return boms, missing
+
+    @api.model
+    def resolve_from_fusion(self, keys):
+        """Resolve the Odoo products of many Fusion components at once.
+
+        All components are fetched with a single query on the Fusion ID
+        index.
+
+        Args:
+            keys (list): Dicts with fusion_id and configuration_name, or
+                [fusion_id, configuration_name] pairs
+
+        Returns:
+            list: One dict per key, in input order, with the component,
+                product template and variant ids, internal reference and
+                stored version identifier, or None if the component is unknown
+        """
+        keys = [self._parse_resolve_key(key) for key in keys]
+        components = self.search_fetch([
+            ('fusion_id', 'in', list({fusion_id for fusion_id, dummy in keys})),
+            ('company_id', '=', self.env.company.id),
+        ], [
+            'fusion_id',
+            'configuration_name',
+            'product_tmpl_id',
+            'product_id',
+            'internal_identifier',
+            'version_identifier',
+        ])
+        resolved = {
+            (component.fusion_id, component.configuration_name or False): {
+                'id': component.id,
+                'product_tmpl_id': component.product_tmpl_id.id,
+                'product_id': component.product_id.id or None,
+                'internal_identifier': component.internal_identifier or None,
+                'version_identifier': component.version_identifier,
+            }
+            for component in components
+        }
+        return [resolved.get(key) for key in keys]
+
+    @api.model
+    def search_by_parameters(self, filters, limit=None):
+        """Search components on their configuration parameters.
+
+        Each filter is run as an indexed subquery on the parameters.
+        Numbers are compared numerically, other values as text.
+
+        Args:
+            filters (list): [name, operator, value] conditions that must
+                all be met, e.g. [['Length', '>=', 90], ['Length', '<=', 110]]
+            limit (int): Maximum number of components
+
+        Returns:
+            fusion.component: Matching components
+        """
+        return self.search(self._get_parameter_domain(filters), limit=limit)
+
+    @api.model
+    def get_changes(self, cursor=None, limit=None):
+        """Get the components and BOMs changed since a feed cursor.
+
+        Components, BOMs and tombstones are each paginated on
+        (write_date, id) from their own position in the cursor. Changes
+        made after the start of the oldest open transaction are left for a
+        later call, so that a record committed late is never skipped.
+
+        Args:
+            cursor (str): Cursor returned by the previous call, None to
+                read all records
+            limit (int): Maximum number of records of each kind, defaults
+                to the Fusion settings
+
+        Returns:
+            dict: Changed components and BOMs, tombstones of the archived
+                and deleted ones, the cursor of the next call and whether
+                more changes are pending
+        """
+        self.check_access_rights('read')
+        settings = self.env['res.config.settings']._get_fusion_settings()
+        limit = int(limit or settings.feed_page_size)
+        positions = self._parse_change_cursor(cursor)
+        horizon = self._get_change_horizon()
+        self.env['fusion.tombstone'].flush_model()
+        self.env['mrp.bom'].flush_model()
+        self.flush_model()
+
+        feed = {'components': [], 'boms': [], 'tombstones': []}
+        has_more = False
+        for kind, table, where in CHANGE_FEED_SOURCES:
+            rows = self._get_changed_rows(
+                table, where, positions.get(kind), horizon, limit)
+            if rows:
+                positions[kind] = [str(rows[-1][1]), rows[-1][0]]
+            has_more = has_more or len(rows) == limit
+            getattr(self, f'_get_changed_{kind}')(
+                [row[0] for row in rows], feed)
+
+        feed['cursor'] = base64.urlsafe_b64encode(
+            json.dumps(positions).encode()).decode()
+        feed['has_more'] = has_more
+        return feed
+    # endregion
+
+    # region Hierarchy Methods
+    def get_explosion(self):
+        """Get all sub-components of this assembly.
+
+        Descendants are read with one query on the materialized parent path
+        and quantities are accumulated from the Fusion-managed BOM lines.
+
+        Returns:
+            list: One dict per sub-component, parents before their children,
+                with its depth and quantity per unit of this assembly
+        """
         self.ensure_one()
-        existing = self._find_existing_component(vals)
-        if existing:
-            return existing.write(vals)
+        descendants = self.search([
+            ('parent_path', '=like', f'{self.parent_path}%'),
+            ('id', '!=', self.id),
+        ])
+        descendants = descendants.sorted(lambda c: (c.parent_path.count('/'), c.id))
+        lines = self.env['mrp.bom.line'].search([
+            ('bom_id.fusion_component_id', 'in', (self | descendants).ids),
+        ])
+        line_quantities = defaultdict(float)
+        for line in lines:
+            key = (line.bom_id.fusion_component_id.id, line.product_id.id)
+            line_quantities[key] += line.product_qty
+
+        base_depth = self.parent_path.count('/')
+        quantities = {self.id: 1.0}
+        result = []
+        for component in descendants:
+            parent = component.parent_id
+            quantity = quantities.get(parent.id, 1.0) * line_quantities.get(
+                (parent.id, component.product_id.id), 1.0)
+            quantities[component.id] = quantity
+            result.append(dict(
+                component._get_hierarchy_vals(),
+                parent_id=parent.id,
+                depth=component.parent_path.count('/') - base_depth,
+                quantity=quantity,
+            ))
+        return result
+
+    def get_where_used(self):
+        """Get all assemblies using this component.
+
+        Usage is followed upwards through the Fusion-managed BOM lines with a
+        single recursive query, so parts shared by several assemblies are
+        reported for each of them.
+
+        Returns:
+            list: One dict per assembly with its smallest depth and the total
+                quantity of this component per unit of the assembly
+        """
+        self.ensure_one()
+        self.env['mrp.bom.line'].flush_model(['bom_id', 'product_id', 'product_qty'])
+        self.env['mrp.bom'].flush_model(['fusion_component_id', 'active'])
+        self.flush_model(['product_id'])
+        self.env.cr.execute("""
+            WITH RECURSIVE used(component_id, depth, quantity, path) AS (
+                SELECT bom.fusion_component_id, 1, line.product_qty,
+                       ARRAY[bom.fusion_component_id]
+                  FROM mrp_bom_line line
+                  JOIN mrp_bom bom ON bom.id = line.bom_id
+                 WHERE line.product_id = %(product_id)s
+                   AND bom.fusion_component_id IS NOT NULL
+                   AND bom.active
+                UNION ALL
+                SELECT bom.fusion_component_id, used.depth + 1,
+                       used.quantity * line.product_qty,
+                       used.path || bom.fusion_component_id
+                  FROM used
+                  JOIN fusion_component component
+                    ON component.id = used.component_id
+                  JOIN mrp_bom_line line
+                    ON line.product_id = component.product_id
+                  JOIN mrp_bom bom ON bom.id = line.bom_id
+                 WHERE bom.fusion_component_id IS NOT NULL
+                   AND bom.active
+                   AND NOT bom.fusion_component_id = ANY(used.path)
+            )
+            SELECT component_id, MIN(depth), SUM(quantity)
+              FROM used
+             GROUP BY component_id
+             ORDER BY MIN(depth), component_id
+        """, {'product_id': self.product_id.id})
+        rows = self.env.cr.fetchall()
+        assemblies = self.browse([row[0] for row in rows])
+        return [
+            dict(assembly._get_hierarchy_vals(), depth=depth, quantity=quantity)
+            for assembly, (dummy, depth, quantity) in zip(assemblies, rows)
+        ]
+
+    @api.model
+    def get_tree_children(self, parent_id=False, offset=0, limit=None):
+        """Get one page of the sub-components of an assembly.
 
-        product_tmpl = self._create_or_get_product_template(vals)
-        vals['product_tmpl_id'] = product_tmpl.id
+        Only the requested level is read, so that huge assemblies can be
+        browsed by expanding one node at a time. The stored counters tell
+        whether a node can be expanded without reading its children.
 
-        if vals.get('configuration_values'):
-            self._handle_configuration(vals, product_tmpl)
+        Args:
+            parent_id (int): ID of the assembly, False for the top-level
+                components
+            offset (int): Number of sub-components to skip
+            limit (int): Maximum number of sub-components to return
+
+        Returns:
+            dict: Total number of sub-components and the requested page
+        """
+        limit = min(limit or TREE_PAGE_SIZE, TREE_PAGE_SIZE * 10)
+        if parent_id:
+            parent = self.browse(parent_id)
+            parent.check_access_rule('read')
+            total = parent.child_count
         else:
-            vals['product_id'] = product_tmpl.product_variant_id.id
+            total = self.search_count([('parent_id', '=', False)])
+        children = self.search_fetch(
+            [('parent_id', '=', parent_id or False)],
+            ['fusion_id', 'name', 'configuration_name', 'component_type',
+             'product_id', 'child_count', 'descendant_count', 'bom_line_count',
+             *PHYSICAL_PROPERTIES.values()],
+            offset=offset, limit=limit, order='name, id')
+        return {
+            'parent_id': parent_id or False,
+            'total': total,
+            'offset': offset,
+            'limit': limit,
+            'children': [dict(
+                child._get_hierarchy_vals(),
+                child_count=child.child_count,
+                descendant_count=child.descendant_count,
+                bom_line_count=child.bom_line_count,
+                **{name: child[name] for name in PHYSICAL_PROPERTIES.values()},
+            ) for child in children],
+        }
+
+    def action_view_children(self):
+        """Open the direct sub-components of this assembly."""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': self.display_name,
+            'res_model': self._name,
+            'view_mode': 'tree,form',
+            'domain': [('parent_id', '=', self.id)],
+            'context': {'default_parent_id': self.id},
+        }
+
+    def _get_hierarchy_vals(self):
+        """Get the values describing a component in hierarchy queries.
 
-        vals['company_id'] = self.env.company.id
-        return self.create(vals)
+        Returns:
+            dict: Component identification values
+        """
+        self.ensure_one()
+        return {
+            'id': self.id,
+            'fusion_id': self.fusion_id,
+            'name': self.name,
+            'configuration_name': self.configuration_name or False,
+            'component_type': self.component_type,
+            'product_id': self.product_id.id,
+        }
     # endregion
 
     # region Helper Methods
+    def _get_tree_counts(self):
+        """Count the active components of the subtrees of these components
+        in each of their assemblies.
+
+        Returns:
+            tuple: (Counter of direct components, Counter of components at
+                any level) by assembly id
+        """
+        children = Counter()
+        descendants = Counter()
+        paths = [f'{path}%' for path in self.mapped('parent_path') if path]
+        if not paths:
+            return children, descendants
+        self.flush_model(['parent_id', 'parent_path', 'active'])
+        self.env.cr.execute("""
+            SELECT parent_id, parent_path FROM fusion_component
+             WHERE active AND parent_id IS NOT NULL
+               AND parent_path LIKE ANY(%s)
+        """, [paths])
+        for parent_id, path in self.env.cr.fetchall():
+            children[parent_id] += 1
+            # The path ends with the component itself and a slash
+            descendants.update(int(ancestor) for ancestor in path.split('/')[:-2])
+        return children, descendants
+
+    @api.model
+    def _update_tree_counts(self, before, after):
+        """Apply the difference between two subtree counts to the stored
+        counters of the assemblies, without recounting their components.
+
+        Args:
+            before (tuple): Counts before the change, see _get_tree_counts,
+                None if the components did not exist
+            after (tuple): Counts after the change, None if the components
+                were deleted
+        """
+        before = before or (Counter(), Counter())
+        after = after or (Counter(), Counter())
+        deltas = {}
+        for index in (0, 1):
+            for assembly_id in before[index].keys() | after[index].keys():
+                delta = after[index][assembly_id] - before[index][assembly_id]
+                if delta:
+                    deltas.setdefault(assembly_id, [0, 0])[index] = delta
+        if not deltas:
+            return
+        ids = sorted(deltas)
+        # Lock the assemblies in a fixed order, as concurrent syncs update
+        # the counters of the same top-level assemblies
+        self.env.cr.execute("""
+            SELECT id FROM fusion_component WHERE id = ANY(%s)
+             ORDER BY id FOR NO KEY UPDATE
+        """, [ids])
+        self.env.cr.execute("""
+            UPDATE fusion_component component
+               SET child_count = COALESCE(component.child_count, 0) + delta.children,
+                   descendant_count = COALESCE(component.descendant_count, 0)
+                       + delta.descendants
+              FROM unnest(%s::int[], %s::int[], %s::int[])
+                   AS delta(id, children, descendants)
+             WHERE component.id = delta.id
+        """, [ids, [deltas[i][0] for i in ids], [deltas[i][1] for i in ids]])
+        self.browse(ids).invalidate_recordset(['child_count', 'descendant_count'])
+
+    def _update_bom_line_counts(self):
+        """Recount the lines of the Fusion-managed BOMs of these assemblies."""
+        if not self:
+            return
+        self.env['mrp.bom.line'].flush_model(['bom_id'])
+        self.env['mrp.bom'].flush_model(['fusion_component_id', 'active'])
+        self.env.cr.execute("""
+            UPDATE fusion_component component
+               SET bom_line_count = (
+                   SELECT count(*) FROM mrp_bom_line line
+                     JOIN mrp_bom bom ON bom.id = line.bom_id
+                    WHERE bom.fusion_component_id = component.id
+                      AND bom.active)
+             WHERE component.id = ANY(%s)
+        """, [self.ids])
+        self.invalidate_recordset(['bom_line_count'])
+
+    def _mark_rollup_dirty(self):
+        """Flag these components for the roll-up of their totals.
+
+        The flagged components are rolled up once, right before the
+        transaction is committed, see _rollup_physical_properties.
+        """
+        if not self:
+            return
+        self.env.cr.execute("""
+            UPDATE fusion_component SET rollup_dirty = TRUE
+             WHERE id = ANY(%s) AND rollup_dirty IS NOT TRUE
+        """, [self.ids])
+        self.invalidate_recordset(['rollup_dirty'])
+        data = self.env.cr.precommit.data
+        if 'fusion.rollup' not in data:
+            data['fusion.rollup'] = True
+            self.env.cr.precommit.add(self._rollup_physical_properties)
+
+    @api.model
+    def _rollup_physical_properties(self):
+        """Recompute the totals of the flagged components up the tree.
+
+        Flagged components are processed deepest first. The totals of a
+        component are its own values plus the totals of its direct
+        sub-components times their quantity in its BOM, 1 if they have no
+        BOM line. The parent of a component is only flagged when its totals
+        changed, so a change costs one step per level above it.
+        """
+        self.env.cr.precommit.data.pop('fusion.rollup', None)
+        self.flush_model()
+        self.env['mrp.bom.line'].flush_model(['bom_id', 'product_id', 'product_qty'])
+        self.env['mrp.bom'].flush_model(['fusion_component_id', 'active'])
+        cr = self.env.cr
+        cr.execute("""
+            SELECT id, parent_id, parent_path FROM fusion_component
+             WHERE rollup_dirty
+        """)
+        levels = defaultdict(dict)
+        for component_id, parent_id, path in cr.fetchall():
+            levels[(path or '').count('/')][component_id] = parent_id
+
+        updated = []
+        while levels:
+            depth = max(levels)
+            level = levels.pop(depth)
+            cr.execute("""
+                SELECT node.id,
+                       node.total_mass, node.total_volume,
+                       node.total_material_cost,
+                       COALESCE(node.mass, 0) + COALESCE(SUM(
+                           child.total_mass * COALESCE(qty.quantity, 1)), 0),
+                       COALESCE(node.volume, 0) + COALESCE(SUM(
+                           child.total_volume * COALESCE(qty.quantity, 1)), 0),
+                       COALESCE(node.material_cost, 0) + COALESCE(SUM(
+                           child.total_material_cost
+                           * COALESCE(qty.quantity, 1)), 0)
+                  FROM fusion_component node
+                  LEFT JOIN fusion_component child
+                    ON child.parent_id = node.id AND child.active
+                  LEFT JOIN LATERAL (
+                       SELECT SUM(line.product_qty) AS quantity
+                         FROM mrp_bom_line line
+                         JOIN mrp_bom bom ON bom.id = line.bom_id
+                        WHERE bom.fusion_component_id = node.id
+                          AND bom.active
+                          AND line.product_id = child.product_id
+                  ) qty ON child.id IS NOT NULL
+                 WHERE node.id = ANY(%s)
+                 GROUP BY node.id
+            """, [list(level)])
+            totals = []
+            for component_id, *values in cr.fetchall():
+                old, new = values[:3], values[3:]
+                totals.append((component_id, *new))
+                parent_id = level[component_id]
+                if parent_id and any(
+                        float_compare(o or 0.0, n, precision_digits=6)
+                        for o, n in zip(old, new)):
+                    levels[depth - 1].setdefault(parent_id, None)
+            cr.execute("""
+                UPDATE fusion_component component
+                   SET total_mass = total.mass,
+                       total_volume = total.volume,
+                       total_material_cost = total.material_cost,
+                       rollup_dirty = FALSE
+                  FROM unnest(%s::int[], %s::float8[], %s::float8[], %s::float8[])
+                       AS total(id, mass, volume, material_cost)
+                 WHERE component.id = total.id
+            """, [list(column) for column in zip(*totals)] or [[], [], [], []])
+            updated.extend(level)
+            # Parents flagged here were not read yet: get their own parent
+            missing = [
+                component_id for component_id, parent_id
+                in levels.get(depth - 1, {}).items() if parent_id is None
+            ]
+            if missing:
+                cr.execute("""
+                    SELECT id, parent_id FROM fusion_component
+                     WHERE id = ANY(%s)
+                """, [missing])
+                levels[depth - 1].update(cr.fetchall())
+        self.browse(updated).invalidate_recordset(
+            [*PHYSICAL_PROPERTIES.values(), 'rollup_dirty'])
+
+    @api.model
+    def _recompute_tree_counts(self):
+        """Recount the components and BOM lines of all assemblies."""
+        self.flush_model(['parent_id', 'parent_path', 'active'])
+        self.env.cr.execute("""
+            UPDATE fusion_component component
+               SET child_count = COALESCE(counts.children, 0),
+                   descendant_count = COALESCE(counts.descendants, 0)
+              FROM fusion_component target
+              LEFT JOIN (
+                   SELECT ancestor.id,
+                          count(*) FILTER (
+                              WHERE node.parent_id = ancestor.id) AS children,
+                          count(*) AS descendants
+                     FROM fusion_component ancestor
+                     JOIN fusion_component node
+                       ON node.parent_path LIKE ancestor.parent_path || '_%'
+                    WHERE node.active
+                    GROUP BY ancestor.id
+              ) counts ON counts.id = target.id
+             WHERE component.id = target.id
+        """)
+        self.invalidate_model(['child_count', 'descendant_count'])
+        self.with_context(active_test=False).search([])._update_bom_line_counts()
+
+    @api.model
+    def _prepare_bulk_import(self, trees):
+        """Create the records shared by the assemblies of a bulk import.
+
+        The attributes and values of all configurations, and the components
+        used by several assemblies, are created up front so that workers
+        importing the assemblies in parallel do not contend on them.
+
+        Trees are only walked once and not kept, so they can be read
+        lazily from an export.
+
+        Args:
+            trees (iterable): Root component values of the assemblies
+
+        Returns:
+            dict: Number of attribute values and shared components
+        """
+        parameters = defaultdict(set)
+        nodes = {}
+        trees_by_key = defaultdict(set)
+        for index, tree in enumerate(trees):
+            stack = [tree]
+            while stack:
+                node = stack.pop()
+                if not isinstance(node, dict) or not node.get('fusion_id'):
+                    continue
+                stack.extend(node.get('children') or [])
+                config_values = self._parse_configuration_values(
+                    node.get('configuration_values'))
+                for name, value in config_values.items():
+                    parameters[name].add(str(value))
+                key = self._fusion_key(node)
+                nodes.setdefault(key, {
+                    name: value for name, value in node.items()
+                    if name not in ('children', 'quantity')
+                })
+                trees_by_key[key].add(index)
+
+        attr_values = self.env['product.attribute.value']
+        for name, values in sorted(parameters.items()):
+            attribute = self._get_or_create_attribute(name)
+            for value in sorted(values):
+                attr_values |= self._get_or_create_attribute_value(
+                    attribute, value)
+
+        shared_vals = [
+            nodes[fusion_key]
+            for fusion_key, indexes in trees_by_key.items() if len(indexes) > 1
+        ]
+        if shared_vals:
+            self.create_from_fusion_batch(shared_vals)
+        return {
+            'attribute_values': len(attr_values),
+            'shared_components': len(shared_vals),
+        }
+
+    def _fusion_key(self, vals):
+        """Return the key identifying a component within a company.
+
+        Args:
+            vals (dict): Component values
+
+        Returns:
+            tuple: (fusion_id, configuration_name)
+        """
+        return vals['fusion_id'], vals.get('configuration_name') or False
+
+    def _get_existing_component(self, existing, vals):
+        """Return the existing component matching component values.
+
+        Like _find_existing_component, components sent without
+        configuration name are matched on the hash of their configuration
+        values first, then on their key.
+
+        Args:
+            existing (dict): Components as returned by
+                _find_existing_components
+            vals (dict): Component values
+
+        Returns:
+            fusion.component: Matching component, None if none
+        """
+        if not vals.get('configuration_name'):
+            config_values = self._parse_configuration_values(
+                vals.get('configuration_values'))
+            if config_values:
+                component = existing.get((
+                    vals['fusion_id'],
+                    ('configuration_hash', self._hash_configuration(config_values)),
+                ))
+                if component:
+                    return component
+        return existing.get(self._fusion_key(vals))
+
+    def _sync_parameters(self):
+        """Replace the stored parameters by the configuration values."""
+        Parameter = self.env['fusion.component.parameter']
+        self.parameter_ids.unlink()
+        Parameter.create([
+            Parameter._prepare_parameter_vals(component, name, value)
+            for component in self
+            for name, value in self._parse_configuration_values(
+                component.configuration_values).items()
+        ])
+
+    def _get_parameter_domain(self, filters):
+        """Convert parameter filters to a domain on components.
+
+        Args:
+            filters (list): [name, operator, value] conditions
+
+        Returns:
+            list: Domain on fusion.component
+
+        Raises:
+            ValidationError: If a filter is invalid
+        """
+        Parameter = self.env['fusion.component.parameter']
+        domain = []
+        for parameter_filter in filters:
+            try:
+                name, operator, value = parameter_filter
+            except (TypeError, ValueError):
+                raise ValidationError(
+                    _('Invalid parameter filter: %s', parameter_filter))
+            if operator not in PARAMETER_OPERATORS:
+                raise ValidationError(
+                    _('Invalid parameter filter operator: %s', operator))
+
+            values = value if operator in ('in', 'not in') else [value]
+            if not isinstance(values, (list, tuple)):
+                raise ValidationError(
+                    _('Invalid parameter filter: %s', parameter_filter))
+            numbers = [Parameter._to_float(value) for value in values]
+            if operator != 'ilike' and None not in numbers:
+                value_domain = [
+                    ('is_numeric', '=', True),
+                    ('value_float', operator,
+                     numbers if operator in ('in', 'not in') else numbers[0]),
+                ]
+            else:
+                strings = [str(value) for value in values]
+                value_domain = [
+                    ('value', operator,
+                     strings if operator in ('in', 'not in') else strings[0]),
+                ]
+            domain.append(('parameter_ids', 'any',
+                           [('name', '=', str(name))] + value_domain))
+        return domain
+
+    def _parse_change_cursor(self, cursor):
+        """Decode a change feed cursor.
+
+        Args:
+            cursor (str): Cursor returned by get_changes
+
+        Returns:
+            dict: [write_date, id] positions by kind of record
+
+        Raises:
+            ValidationError: If the cursor is invalid
+        """
+        if not cursor:
+            return {}
+        try:
+            positions = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(positions, dict) or not all(
+                    isinstance(position, list) and len(position) == 2
+                    for position in positions.values()):
+                raise ValueError
+        except (ValueError, binascii.Error, AttributeError):
+            raise ValidationError(_('Invalid change feed cursor.'))
+        return positions
+
+    def _get_change_horizon(self):
+        """Get the start of the oldest other open writing transaction.
+
+        Only client sessions holding a transaction id are considered, idle
+        sessions, read-only transactions and background workers such as
+        autovacuum do not hold the feed back.
+
+        Returns:
+            datetime: UTC start of the transaction, None if there is none
+        """
+        self.env.cr.execute("""
+            SELECT min(xact_start) AT TIME ZONE 'UTC'
+              FROM pg_stat_activity
+             WHERE datname = current_database()
+               AND pid <> pg_backend_pid()
+               AND backend_type = 'client backend'
+               AND backend_xid IS NOT NULL
+        """)
+        return self.env.cr.fetchone()[0]
+
+    def _get_changed_rows(self, table, where, position, horizon, limit):
+        """Get the next page of changed rows of a change feed source.
+
+        Args:
+            table (str): Table name
+            where (str): SQL condition of the rows in the feed
+            position (list): [write_date, id] of the last row read, if any
+            horizon (datetime): Rows changed since are skipped, if any
+            limit (int): Maximum number of rows
+
+        Returns:
+            list: (id, write_date) tuples ordered by write_date and id
+        """
+        conditions = [where, 'company_id = %(company_id)s']
+        if position:
+            conditions.append('(write_date, id) > (%(date)s, %(id)s)')
+        if horizon:
+            conditions.append('write_date < %(horizon)s')
+        self.env.cr.execute(f"""
+            SELECT id, write_date FROM {table}
+             WHERE {' AND '.join(conditions)}
+             ORDER BY write_date, id
+             LIMIT %(limit)s
+        """, {
+            'company_id': self.env.company.id,
+            'date': position and position[0],
+            'id': position and position[1],
+            'horizon': horizon,
+            'limit': limit,
+        })
+        return self.env.cr.fetchall()
+
+    def _get_changed_components(self, ids, feed):
+        """Add changed components to a change feed page.
+
+        Args:
+            ids (list): Component IDs
+            feed (dict): Change feed page
+        """
+        components = self.with_context(active_test=False).browse(ids)
+        for component in components:
+            if not component.active:
+                feed['tombstones'].append(component._get_tombstone_vals(
+                    self._name, component.id, 'archived'))
+                continue
+            feed['components'].append({
+                'id': component.id,
+                'fusion_id': component.fusion_id,
+                'configuration_name': component.configuration_name or None,
+                'name': component.name,
+                'component_type': component.component_type,
+                'parent_id': component.parent_id.id or None,
+                'product_tmpl_id': component.product_tmpl_id.id,
+                'product_id': component.product_id.id or None,
+                'internal_identifier': component.internal_identifier or None,
+                'version_identifier': component.version_identifier,
+                'write_date': str(component.write_date),
+            })
+
+    def _get_changed_boms(self, ids, feed):
+        """Add changed Fusion BOMs to a change feed page.
+
+        Args:
+            ids (list): BOM IDs
+            feed (dict): Change feed page
+        """
+        boms = self.env['mrp.bom'].with_context(active_test=False).browse(ids)
+        for bom in boms:
+            component = bom.fusion_component_id
+            if not bom.active:
+                feed['tombstones'].append(component._get_tombstone_vals(
+                    'mrp.bom', bom.id, 'archived'))
+                continue
+            feed['boms'].append({
+                'id': bom.id,
+                'fusion_component_id': component.id,
+                'fusion_id': component.fusion_id,
+                'configuration_name': component.configuration_name or None,
+                'product_tmpl_id': bom.product_tmpl_id.id,
+                'product_id': bom.product_id.id or None,
+                'lines': [{
+                    'product_id': line.product_id.id,
+                    'internal_identifier': line.product_id.default_code or None,
+                    'quantity': line.product_qty,
+                } for line in bom.bom_line_ids],
+                'write_date': str(bom.write_date),
+            })
+
+    def _get_changed_tombstones(self, ids, feed):
+        """Add deleted components and BOMs to a change feed page.
+
+        Args:
+            ids (list): Tombstone IDs
+            feed (dict): Change feed page
+        """
+        for tombstone in self.env['fusion.tombstone'].browse(ids):
+            feed['tombstones'].append(dict(
+                self._get_tombstone_vals(
+                    tombstone.res_model, tombstone.res_id, 'deleted'),
+                fusion_id=tombstone.fusion_id,
+                configuration_name=tombstone.configuration_name or None,
+            ))
+
+    def _get_tombstone_vals(self, res_model, res_id, reason):
+        """Get the change feed values of a removed record.
+
+        Args:
+            res_model (str): Model of the record
+            res_id (int): ID of the record
+            reason (str): 'archived' or 'deleted'
+
+        Returns:
+            dict: Tombstone values, with the Fusion key of this component
+        """
+        return {
+            'model': res_model,
+            'id': res_id,
+            'fusion_id': self.fusion_id or None,
+            'configuration_name': self.configuration_name or None,
+            'reason': reason,
+        }
+
+    @api.model
+    def _get_resolve_etag(self, keys):
+        """Compute the entity tag of the resolution of component keys.
+
+        It only aggregates the components of the requested Fusion IDs and
+        their variants, so that clients can be told nothing changed without
+        resolving the keys.
+
+        Args:
+            keys (list): Component keys, see resolve_from_fusion
+
+        Returns:
+            str: Hexadecimal SHA-1 digest
+        """
+        keys = [self._parse_resolve_key(key) for key in keys]
+        self.flush_model()
+        self.env['product.product'].flush_model(['write_date'])
+        self.env.cr.execute("""
+            SELECT count(*), max(fc.write_date), max(pp.write_date)
+              FROM fusion_component fc
+              LEFT JOIN product_product pp ON pp.id = fc.product_id
+             WHERE fc.fusion_id = ANY(%s)
+               AND fc.company_id = %s
+               AND fc.active
+        """, [list({fusion_id for fusion_id, dummy in keys}), self.env.company.id])
+        state = json.dumps(
+            [self.env.uid, self.env.company.id, keys, self.env.cr.fetchone()],
+            default=str,
+        )
+        return hashlib.sha1(state.encode()).hexdigest()
+
+    def _parse_resolve_key(self, key):
+        """Parse a component key sent to the resolve API.
+
+        Args:
+            key (dict|list): Dict with fusion_id and configuration_name, or
+                [fusion_id, configuration_name] pair
+
+        Returns:
+            tuple: (fusion_id, configuration_name)
+
+        Raises:
+            ValidationError: If the key has no Fusion ID
+        """
+        if isinstance(key, dict):
+            fusion_id = key.get('fusion_id')
+            configuration_name = key.get('configuration_name')
+        elif isinstance(key, (list, tuple)) and 1 <= len(key) <= 2:
+            fusion_id, configuration_name = (tuple(key) + (False,))[:2]
+        else:
+            fusion_id = configuration_name = None
+        if not fusion_id or not isinstance(fusion_id, str):
+            raise ValidationError(_('Invalid component key: %s', key))
+        return fusion_id, configuration_name or False
+
+    def _check_fusion_vals(self, vals):
+        """Check that Fusion data contains the mandatory values.
+
+        Args:
+            vals (dict): Component values
+
+        Raises:
+            ValidationError: If a mandatory value is missing
+        """
+        if not isinstance(vals, dict):
+            raise ValidationError(_('Component data must be an object.'))
+        missing = [
+            key for key in REQUIRED_FUSION_VALUES if not vals.get(key)
+        ]
+        if missing:
+            raise ValidationError(
+                _('Missing required values: %s', ', '.join(missing)))
+        if vals['component_type'] not in \
+                self._fields['component_type'].get_values(self.env):
+            raise ValidationError(
+                _('Invalid component type: %s', vals['component_type']))
+        try:
+            fields.Datetime.to_datetime(vals['last_modified'])
+        except (TypeError, ValueError):
+            raise ValidationError(
+                _('Invalid modification date: %s', vals['last_modified']))
+
+    def _upsert_from_fusion(self, vals_list):
+        """Create or update components from Fusion 360 data in bulk.
+
+        Components whose version identifier and modification date did not
+        change are left untouched, others only get their changed values
+        written to avoid needless tracking.
+
+        With the ``fusion_import`` context key, field tracking is disabled
+        and a summary of the changes is posted once the transaction is
+        about to be committed, see _post_fusion_import_summary.
+
+        Args:
+            vals_list (list): List of component values
+
+        Returns:
+            tuple: (fusion.component, list) components in input order
+                (duplicates included) and their status: 'created',
+                'updated' or 'unchanged'
+        """
+        import_mode = self.env.context.get('fusion_import')
+        if import_mode and not self.env.context.get('tracking_disable'):
+            return self.with_context(
+                tracking_disable=True)._upsert_from_fusion(vals_list)
+
+        vals_list = [dict(vals) for vals in vals_list]
+        for vals in vals_list:
+            self._check_fusion_vals(vals)
+
+        with sync_phase('lookup'):
+            existing = self._find_existing_components(vals_list)
+        templates = {
+            component.fusion_id: component.product_tmpl_id
+            for component in existing.values()
+        }
+
+        new_vals = {}
+        statuses = []
+        for vals in vals_list:
+            key = self._fusion_key(vals)
+            component = self._get_existing_component(existing, vals)
+            if component:
+                changed_vals = (
+                    not component._is_fusion_version(vals)
+                    and component._get_changed_vals(vals)
+                )
+                if changed_vals:
+                    with sync_phase('component_write'):
+                        component.write(changed_vals)
+                    if import_mode:
+                        component._add_fusion_import_change(
+                            'updated', changed_vals)
+                statuses.append('updated' if changed_vals else 'unchanged')
+            elif key in new_vals:
+                new_vals[key].update(vals)
+                statuses.append('created')
+            else:
+                new_vals[key] = vals
+                statuses.append('created')
+
+        if new_vals:
+            self._prepare_new_components(list(new_vals.values()), templates)
+            with sync_phase('component_create'):
+                created = self.create(list(new_vals.values()))
+            existing.update(zip(new_vals, created))
+            if import_mode:
+                created._add_fusion_import_change('created')
+
+        components = self.browse([
+            self._get_existing_component(existing, vals).id
+            for vals in vals_list
+        ])
+        return components, statuses
+
+    def _add_fusion_import_change(self, status, field_names=()):
+        """Record changes made in import mode for the sync summary.
+
+        Args:
+            status (str): 'created' or 'updated'
+            field_names (iterable): Names of the updated fields
+        """
+        # Changes made in a savepoint are only kept if it succeeds
+        savepoints = _import_savepoints.get(self.env.cr)
+        changes = savepoints[-1] if savepoints else \
+            self._get_fusion_import_changes()
+        for component in self:
+            change = changes.setdefault(
+                component.id, {'status': status, 'fields': set()})
+            change['fields'].update(field_names)
+
+    @api.model
+    def _get_fusion_import_changes(self):
+        """Get the import changes to report before the next commit.
+
+        The summary is posted by a precommit hook, registered along with the
+        changes as it consumes them when run, see
+        _post_fusion_import_summary.
+
+        Returns:
+            dict: Changes by component id, with their status and the names
+                of the updated fields
+        """
+        data = self.env.cr.precommit.data
+        if 'fusion.import.changes' not in data:
+            self.env.cr.precommit.add(self._post_fusion_import_summary)
+        return data.setdefault('fusion.import.changes', {})
+
+    @api.model
+    def _post_fusion_import_summary(self):
+        """Post one summary of the recorded import changes per assembly.
+
+        Changed components are reported on their parent assembly, top-level
+        components on themselves.
+        """
+        changes = self.env.cr.precommit.data.pop('fusion.import.changes', {})
+        components = self.browse(list(changes)).exists()
+        by_assembly = defaultdict(list)
+        for component in components:
+            by_assembly[component.parent_id or component].append(component)
+
+        for assembly, assembly_components in by_assembly.items():
+            items = []
+            for component in assembly_components:
+                change = changes[component.id]
+                if change['status'] == 'created':
+                    items.append(_('%s: created', component.display_name))
+                else:
+                    labels = sorted(
+                        self._fields[name].string
+                        for name in change['fields'] if name in self._fields
+                    )
+                    items.append(_(
+                        '%(component)s: updated (%(fields)s)',
+                        component=component.display_name,
+                        fields=', '.join(labels),
+                    ))
+            body = Markup('<p>%s</p><ul>%s</ul>') % (
+                _('Fusion 360 synchronization'),
+                Markup().join(Markup('<li>%s</li>') % item for item in items),
+            )
+            assembly.message_post(body=body, subtype_xmlid='mail.mt_note')
+
+    def _is_fusion_version(self, vals):
+        """Check whether Fusion data matches the stored version.
+
+        Args:
+            vals (dict): Component values
+
+        Returns:
+            bool: True if version identifier and modification date match
+        """
+        self.ensure_one()
+        if not vals.get('version_identifier') or not vals.get('last_modified'):
+            return False
+        return (
+            self.version_identifier == vals['version_identifier']
+            and self.last_modified == fields.Datetime.to_datetime(
+                vals['last_modified'])
+        )
+
+    def _get_changed_vals(self, vals):
+        """Keep only the values that differ from the component.
+
+        Keys that are not fields of the model are dropped. x2many values
+        are compared on the records they result in, commands creating or
+        updating records are always kept.
+
+        Args:
+            vals (dict): Component values
+
+        Returns:
+            dict: Values to write
+        """
+        self.ensure_one()
+        changed_vals = {}
+        for name, value in vals.items():
+            field = self._fields.get(name)
+            if not field:
+                continue
+            if field.type in ('one2many', 'many2many'):
+                if any(
+                    isinstance(command, (list, tuple))
+                    and command[0] in (Command.CREATE, Command.UPDATE)
+                    for command in value or ()
+                ) or set(field.convert_to_cache(value, self)) != set(self[name].ids):
+                    changed_vals[name] = value
+                continue
+            new_value = field.convert_to_record(
+                field.convert_to_cache(value, self), self)
+            if new_value != self[name]:
+                changed_vals[name] = value
+        return changed_vals
+
+    def _prepare_new_components(self, vals_list, templates):
+        """Complete values of components about to be created.
+
+        Product templates are shared by every configuration of a Fusion ID
+        and created in a single call for the ones that have none yet.
+
+        Args:
+            vals_list (list): Values of the components to create
+            templates (dict): Known product templates by Fusion ID
+        """
+        missing = {}
+        for vals in vals_list:
+            if vals.get('product_tmpl_id') or vals['fusion_id'] in templates:
+                continue
+            missing.setdefault(vals['fusion_id'], vals)
+        if missing:
+            with sync_phase('template_create'):
+                created = self._create_product_templates(list(missing.values()))
+            templates.update(zip(missing, created))
+
+        configured = []
+        for vals in vals_list:
+            if vals.get('product_tmpl_id'):
+                product_tmpl = self._create_or_get_product_template(vals)
+            else:
+                product_tmpl = templates[vals['fusion_id']]
+            vals['product_tmpl_id'] = product_tmpl.id
+
+            if vals.get('configuration_values'):
+                configured.append(vals)
+            else:
+                vals['product_id'] = product_tmpl.product_variant_id.id
+
+            vals['company_id'] = self.env.company.id
+
+        if configured:
+            self._handle_configurations(configured)
+
+    def _prepare_fusion_bom_vals(self):
+        """Prepare values of the BOM managed for this assembly.
+
+        Returns:
+            dict: Values for mrp.bom creation
+        """
+        self.ensure_one()
+        return {
+            'product_tmpl_id': self.product_tmpl_id.id,
+            'product_id': self.configuration_name and self.product_id.id,
+            'type': 'normal',
+            'fusion_component_id': self.id,
+            'company_id': self.company_id.id,
+        }
+
+    @api.model
+    def _sync_fusion_boms(self, lines_by_component):
+        """Synchronize the Fusion-managed BOMs of several assemblies.
+
+        Incoming lines are compared by product with the current ones and
+        only the inserts, quantity updates and deletes are applied, each in
+        a single ORM call.
+
+        Args:
+            lines_by_component (dict): Lists of (product.product, quantity)
+                by assembly component
+
+        Returns:
+            mrp.bom: Synchronized BOMs
+        """
+        Bom = self.env['mrp.bom']
+        BomLine = self.env['mrp.bom.line']
+        components = self.browse([c.id for c in lines_by_component])
+
+        boms = {}
+        for bom in Bom.search([('fusion_component_id', 'in', components.ids)]):
+            boms.setdefault(bom.fusion_component_id, bom)
+        new_components = components.filtered(lambda c: c not in boms)
+        if new_components:
+            created = Bom.create([
+                component._prepare_fusion_bom_vals()
+                for component in new_components
+            ])
+            boms.update(zip(new_components, created))
+
+        precision = self.env['decimal.precision'].precision_get(
+            'Product Unit of Measure')
+        to_create = []
+        to_update = defaultdict(list)
+        to_unlink = BomLine
+        changed = set()
+        for component in components:
+            bom = boms[component]
+            quantities = defaultdict(float)
+            for product, quantity in lines_by_component[component]:
+                quantities[product.id] += quantity
+
+            current = {}
+            for line in bom.bom_line_ids:
+                product_id = line.product_id.id
+                if product_id in quantities and product_id not in current:
+                    current[product_id] = line
+                else:
+                    to_unlink |= line
+                    changed.add(bom.id)
+
+            for product_id, quantity in quantities.items():
+                line = current.get(product_id)
+                if not line:
+                    to_create.append({
+                        'bom_id': bom.id,
+                        'product_id': product_id,
+                        'product_qty': quantity,
+                    })
+                    changed.add(bom.id)
+                elif float_compare(line.product_qty, quantity,
+                                   precision_digits=precision):
+                    to_update[quantity].append(line.id)
+                    changed.add(bom.id)
+
+        if to_unlink:
+            to_unlink.unlink()
+        for quantity, line_ids in to_update.items():
+            BomLine.browse(line_ids).write({'product_qty': quantity})
+        if to_create:
+            BomLine.create(to_create)
+        if changed:
+            # Line changes leave the BOM untouched, update its write date
+            # for the change feed
+            Bom.browse(list(changed)).write({})
+            changed_components = self.browse([
+                component.id for component in components
+                if boms[component].id in changed
+            ])
+            changed_components._update_bom_line_counts()
+            changed_components._mark_rollup_dirty()
+
+        return Bom.union(*(boms[component] for component in components))
+
     def _find_existing_component(self, vals):
         """Find existing component based on Fusion ID and configuration.
 
+        Components sent without configuration name are matched on the hash
+        of their configuration values.
+
         Args:
             vals (dict): Component values
 
         Returns:
             fusion.component: Existing component record if found
         """
+        config_values = self._parse_configuration_values(
+            vals.get('configuration_values'))
+        if config_values and not vals.get('configuration_name'):
+            config_domain = [
+                ('configuration_hash', '=', self._hash_configuration(config_values)),
+            ]
+        else:
+            config_domain = [
+                ('configuration_name', '=', vals.get('configuration_name', False)),
+            ]
         return self.search([
             ('fusion_id', '=', vals['fusion_id']),
-            ('configuration_name', '=', vals.get('configuration_name', False)),
             ('company_id', '=', self.env.company.id),
+        ] + config_domain)
+
+    def _find_existing_components(self, vals_list):
+        """Find existing components for several items with one query.
+
+        Archived components are included so that re-syncing them does not
+        break the unique constraint.
+
+        Args:
+            vals_list (list): List of component values
+
+        Returns:
+            dict: Components by (fusion_id, configuration_name), and
+                configured ones also by (fusion_id, ('configuration_hash',
+                hash)), including the other configurations of the requested
+                Fusion IDs, see _get_existing_component
+        """
+        fusion_ids = list({vals['fusion_id'] for vals in vals_list})
+        components = self.with_context(active_test=False).search([
+            ('fusion_id', 'in', fusion_ids),
+            ('company_id', '=', self.env.company.id),
+        ])
+        existing = {}
+        for component in components.with_env(self.env):
+            existing[
+                component.fusion_id, component.configuration_name or False
+            ] = component
+            if component.configuration_hash:
+                existing.setdefault((
+                    component.fusion_id,
+                    ('configuration_hash', component.configuration_hash),
+                ), component)
+        return existing
+
+    def _create_product_templates(self, vals_list):
+        """Create the product templates of several components at once.
+
+        Args:
+            vals_list (list): Component values, one per template
+
+        Returns:
+            product.template: Created templates in input order
+        """
+        settings = self.env['res.config.settings']._get_fusion_settings()
+        template_vals = {
+            'type': 'product',
+            'detailed_type': 'product',
+            'property_stock_inventory': settings.default_location_id or False,
+            'company_id': self.env.company.id,
+        }
+        if settings.default_category_id:
+            template_vals['categ_id'] = settings.default_category_id
+
+        return self.env['product.template'].create([
+            dict(template_vals, name=vals['name']) for vals in vals_list
         ])
 
     def _create_or_get_product_template(self, vals):
@@ -186,20 +2018,47 @@ class FusionComponent(models.Model):
         if vals.get('product_tmpl_id'):
             return self.env['product.template'].browse(vals['product_tmpl_id'])
 
-        default_folder_id = int(
-            self.env['ir.config_parameter'].sudo().get_param(
-                'fusion_integration.default_folder_id',
-                False
-            )
-        )
+        return self._create_product_templates([vals])
 
-        return self.env['product.template'].create({
-            'name': vals['name'],
-            'type': 'product',
-            'detailed_type': 'product',
-            'property_stock_inventory': default_folder_id or False,
-            'company_id': self.env.company.id,
-        })
+    @api.model
+    def _parse_configuration_values(self, configuration_values):
+        """Parse configuration values sent by Fusion 360.
+
+        Args:
+            configuration_values (str|dict): JSON configuration parameters
+
+        Returns:
+            dict: Configuration parameters, empty if none or invalid
+        """
+        if not configuration_values:
+            return {}
+        if isinstance(configuration_values, dict):
+            return configuration_values
+        try:
+            config_values = json.loads(configuration_values)
+        except ValueError:
+            return {}
+        return config_values if isinstance(config_values, dict) else {}
+
+    @api.model
+    def _hash_configuration(self, config_values):
+        """Compute the canonical hash of configuration values.
+
+        Parameter names and values are compared as strings, independently
+        of their order, so equal configurations always get the same hash.
+
+        Args:
+            config_values (dict): Configuration parameters
+
+        Returns:
+            str: Hexadecimal SHA-1 digest
+        """
+        normalized = json.dumps(
+            {str(name): str(value) for name, value in config_values.items()},
+            sort_keys=True,
+            separators=(',', ':'),
+        )
+        return hashlib.sha1(normalized.encode()).hexdigest()
 
     def _handle_configuration(self, vals, product_tmpl):
         """Handle component configuration and create product variant.
@@ -208,17 +2067,62 @@ class FusionComponent(models.Model):
             vals (dict): Component values
             product_tmpl (product.template): Product template record
         """
-        config_values = json.loads(vals['configuration_values'])
-        
+        config_vals = dict(vals, product_tmpl_id=product_tmpl.id)
+        self._handle_configurations([config_vals])
+        vals['product_id'] = config_vals['product_id']
+
+    def _handle_configurations(self, vals_list):
+        """Handle the configurations of several components at once.
+
+        Attribute line changes are collected per product template and
+        applied with a single write, then only the combinations sent by
+        Fusion are materialized as variants.
+
+        Args:
+            vals_list (list): Component values with product_tmpl_id and
+                configuration_values, updated with their product_id
+        """
+        ProductTemplate = self.env['product.template']
+        configurations = []
+        values_by_template = defaultdict(
+            lambda: self.env['product.attribute.value'])
+
+        with sync_phase('attribute_resolution'):
+            for vals in vals_list:
+                config_values = self._parse_configuration_values(
+                    vals['configuration_values'])
+                product_tmpl = ProductTemplate.browse(vals['product_tmpl_id'])
+                attr_values = self._get_or_create_attribute_values(
+                    config_values)
+                values_by_template[product_tmpl] |= attr_values
+                configurations.append((
+                    product_tmpl,
+                    attr_values,
+                    self._hash_configuration(config_values),
+                ))
+            for product_tmpl, attr_values in values_by_template.items():
+                self._update_attribute_lines(product_tmpl, attr_values)
+
+        with sync_phase('variant_resolution'):
+            variants = self._get_or_create_variants(configurations)
+        for vals, variant in zip(vals_list, variants):
+            vals['product_id'] = variant.id
+
+    def _get_or_create_attribute_values(self, config_values):
+        """Get or create the attribute values of a configuration.
+
+        Args:
+            config_values (dict): Configuration parameters
+
+        Returns:
+            product.attribute.value: Attribute values in parameter order
+        """
+        attr_values = self.env['product.attribute.value']
         for attr_name, attr_value in config_values.items():
             attribute = self._get_or_create_attribute(attr_name)
-            attr_value_obj = self._get_or_create_attribute_value(
+            attr_values |= self._get_or_create_attribute_value(
                 attribute, str(attr_value))
-            self._update_attribute_line(product_tmpl, attribute, attr_value_obj)
-
-        product_variant = self._get_or_create_variant(
-            product_tmpl, config_values)
-        vals['product_id'] = product_variant.id
+        return attr_values
 
     def _get_or_create_attribute(self, attr_name):
         """Get or create product attribute.
@@ -229,23 +2133,30 @@ class FusionComponent(models.Model):
         Returns:
             product.attribute: Attribute record
         """
-        attribute = self.env['product.attribute'].search([
-            ('fusion_parameter_name', '=', attr_name),
+        Attribute = self.env['product.attribute']
+        attribute_id = Attribute._get_fusion_attribute_ids(
+            self.env.company.id).get(attr_name)
+        if attribute_id:
+            return Attribute.browse(attribute_id)
+
+        # The cache is only cleared once creations are committed: look for
+        # an attribute created since it was filled before creating one
+        attribute = Attribute.sudo().search([
             ('is_fusion_attribute', '=', True),
+            ('fusion_parameter_name', '=', attr_name),
             '|',
             ('company_id', '=', False),
-            ('company_id', '=', self.env.company.id)
+            ('company_id', '=', self.env.company.id),
         ], limit=1)
-
-        if not attribute:
-            attribute = self.env['product.attribute'].create({
-                'name': f'Fusion: {attr_name}',
-                'fusion_parameter_name': attr_name,
-                'is_fusion_attribute': True,
-                'company_id': self.env.company.id,
-            })
-
-        return attribute
+        if attribute:
+            return Attribute.browse(attribute.id)
+        return Attribute.create({
+            'name': f'Fusion: {attr_name}',
+            'fusion_parameter_name': attr_name,
+            'is_fusion_attribute': True,
+            'create_variant': 'dynamic',
+            'company_id': self.env.company.id,
+        })
 
     def _get_or_create_attribute_value(self, attribute, value):
         """Get or create attribute value.
@@ -257,76 +2168,143 @@ class FusionComponent(models.Model):
         Returns:
             product.attribute.value: Attribute value record
         """
-        attr_value = self.env['product.attribute.value'].search([
+        AttributeValue = self.env['product.attribute.value']
+        value_id = self.env['product.attribute']._get_fusion_attribute_value_ids(
+            attribute.id, self.env.company.id).get(value)
+        if value_id:
+            return AttributeValue.browse(value_id)
+
+        # The cache is only cleared once creations are committed: look for
+        # a value created since it was filled before creating one
+        attr_value = AttributeValue.sudo().search([
             ('attribute_id', '=', attribute.id),
             ('name', '=', value),
             '|',
             ('company_id', '=', False),
-            ('company_id', '=', self.env.company.id)
+            ('company_id', '=', self.env.company.id),
         ], limit=1)
+        if attr_value:
+            return AttributeValue.browse(attr_value.id)
+        return AttributeValue.create({
+            'attribute_id': attribute.id,
+            'name': value,
+            'company_id': self.env.company.id,
+        })
 
-        if not attr_value:
-            attr_value = self.env['product.attribute.value'].create({
-                'attribute_id': attribute.id,
-                'name': value,
-                'company_id': self.env.company.id,
-            })
-
-        return attr_value
+    def _update_attribute_lines(self, product_tmpl, attr_values):
+        """Add attribute values to the attribute lines of a template.
 
-    def _update_attribute_line(self, product_tmpl, attribute, attr_value):
-        """Update product template attribute line.
+        All changes are applied with one write, without regenerating the
+        variants for each of them. Variants are then synchronized once; this
+        is cheap for Fusion attributes, which create variants dynamically.
 
         Args:
             product_tmpl (product.template): Product template record
-            attribute (product.attribute): Attribute record
-            attr_value (product.attribute.value): Attribute value record
+            attr_values (product.attribute.value): Values to add
         """
-        attr_line = product_tmpl.attribute_line_ids.filtered(
-            lambda l: l.attribute_id.id == attribute.id
-        )
+        lines = {line.attribute_id: line for line in product_tmpl.attribute_line_ids}
+        commands = []
+        for attribute in attr_values.attribute_id:
+            values = attr_values.filtered(lambda v: v.attribute_id == attribute)
+            line = lines.get(attribute)
+            if not line:
+                commands.append(Command.create({
+                    'attribute_id': attribute.id,
+                    'value_ids': [Command.set(values.ids)],
+                }))
+            elif values - line.value_ids:
+                commands.append(Command.update(line.id, {
+                    'value_ids': [
+                        Command.link(value.id)
+                        for value in values - line.value_ids
+                    ],
+                }))
 
-        if not attr_line:
-            self.env['product.template.attribute.line'].create({
-                'product_tmpl_id': product_tmpl.id,
-                'attribute_id': attribute.id,
-                'value_ids': [(4, attr_value.id)]
+        if commands:
+            product_tmpl.with_context(create_product_product=False).write({
+                'attribute_line_ids': commands,
             })
-        elif attr_value not in attr_line.value_ids:
-            attr_line.write({'value_ids': [(4, attr_value.id)]})
+            product_tmpl._create_variant_ids()
 
-    def _get_or_create_variant(self, product_tmpl, config_values):
+    def _get_or_create_variant(self, product_tmpl, attr_values, config_hash):
         """Get or create product variant based on configuration.
 
         Args:
             product_tmpl (product.template): Product template record
-            config_values (dict): Configuration values
+            attr_values (product.attribute.value): Values of the
+                configuration, as resolved by _handle_configuration
+            config_hash (str): Hash of the configuration values
 
         Returns:
             product.product: Product variant record
         """
-        domain = [
-            ('product_tmpl_id', '=', product_tmpl.id),
-            '|',
-            ('company_id', '=', False),
-            ('company_id', '=', self.env.company.id)
-        ]
+        return self._get_or_create_variants(
+            [(product_tmpl, attr_values, config_hash)])[0]
 
-        for attr_name, attr_value in config_values.items():
-            attribute = self._get_or_create_attribute(attr_name)
-            attr_value_obj = self._get_or_create_attribute_value(
-                attribute, str(attr_value))
-            domain.append((
-                'product_template_attribute_value_ids.product_attribute_value_id',
-                '=',
-                attr_value_obj.id
-            ))
+    def _get_or_create_variants(self, configurations):
+        """Get or create the product variants of several configurations.
 
-        product_variant = self.env['product.product'].search(domain, limit=1)
-        if not product_variant:
-            product_variant = product_tmpl._create_product_variant(
-                product_tmpl._get_first_possible_combination()
-            )
+        Variants are looked up on their configuration hash with one query,
+        archived ones included. Others are resolved on their exact attribute
+        combination, created if needed, and get the hash assigned. Archived
+        variants found are restored.
+
+        Args:
+            configurations (list): Tuples of product template, attribute
+                values and configuration hash
+
+        Returns:
+            list: Product variants in input order
+
+        Raises:
+            ValidationError: If a configuration is not a valid combination
+                of its product template
+        """
+        Product = self.env['product.product']
+        found = {}
+        for variant in Product.with_context(active_test=False).search([
+            ('product_tmpl_id', 'in', list({
+                product_tmpl.id for product_tmpl, dummy, dummy in configurations
+            })),
+            ('fusion_configuration_hash', 'in', list({
+                config_hash for dummy, dummy, config_hash in configurations
+            })),
+        ], order='active DESC, id'):
+            found.setdefault(
+                (variant.product_tmpl_id.id, variant.fusion_configuration_hash),
+                variant.with_env(self.env))
+
+        variants = []
+        for product_tmpl, attr_values, config_hash in configurations:
+            key = (product_tmpl.id, config_hash)
+            if key not in found:
+                combination = product_tmpl.attribute_line_ids.product_template_value_ids.filtered(
+                    lambda ptav: ptav.product_attribute_value_id in attr_values)
+                variant = (
+                    product_tmpl._get_variant_for_combination(combination)
+                    or product_tmpl._create_product_variant(combination)
+                )
+                if variant:
+                    variant.fusion_configuration_hash = config_hash
+                else:
+                    if not product_tmpl._is_combination_possible_by_config(
+                            combination, ignore_no_variant=True):
+                        raise ValidationError(_(
+                            'Invalid configuration of %(product)s: %(values)s',
+                            product=product_tmpl.display_name,
+                            values=', '.join(attr_values.mapped('name')),
+                        ))
+                    variant = Product.create({
+                        'product_tmpl_id': product_tmpl.id,
+                        'product_template_attribute_value_ids': [
+                            Command.set(combination.ids)],
+                        'fusion_configuration_hash': config_hash,
+                    })
+                found[key] = variant
+            variants.append(found[key])
 
-        return product_variant
+        archived = Product.union(*variants).filtered(lambda v: not v.active)
+        if archived:
+            archived.active = True
+        return variants
     # endregion
@@ -0,0 +1,88 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import fields, models
+from odoo.tools.sql import create_index
+
+import math
+
+
+class FusionComponentParameter(models.Model):
+    """
+    Model storing one configuration parameter of a Fusion 360 component.
+    Kept in sync with the JSON configuration values so that components can
+    be searched on their parameters with indexed SQL.
+    """
+    _name = 'fusion.component.parameter'
+    _description = 'Fusion 360 Component Parameter'
+    _order = 'component_id, name'
+
+    # region Fields
+    component_id = fields.Many2one(
+        'fusion.component',
+        string='Component',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    name = fields.Char(
+        required=True,
+        help="Parameter name in Fusion 360"
+    )
+    value = fields.Char(
+        help="Parameter value as sent by Fusion 360"
+    )
+    value_float = fields.Float(
+        string='Numeric Value',
+        help="Parameter value as a number, when it is numeric"
+    )
+    is_numeric = fields.Boolean(
+        string='Numeric',
+        help="Whether the value is a number"
+    )
+    # endregion
+
+    def init(self):
+        create_index(self.env.cr, 'fusion_component_parameter_name_value_index',
+                     self._table, ['name', 'value'])
+        create_index(self.env.cr, 'fusion_component_parameter_name_float_index',
+                     self._table, ['name', 'value_float'], where='is_numeric')
+
+    # region Helper Methods
+    def _prepare_parameter_vals(self, component, name, value):
+        """Prepare the values of a parameter.
+
+        Args:
+            component (fusion.component): Component of the parameter
+            name (str): Parameter name
+            value: Parameter value
+
+        Returns:
+            dict: Values for fusion.component.parameter creation
+        """
+        value_float = self._to_float(value)
+        return {
+            'component_id': component.id,
+            'name': str(name),
+            'value': str(value),
+            'value_float': value_float or 0.0,
+            'is_numeric': value_float is not None,
+        }
+
+    def _to_float(self, value):
+        """Convert a parameter value to a number.
+
+        Args:
+            value: Parameter value
+
+        Returns:
+            float: Numeric value, None if the value is not a finite number
+        """
+        if isinstance(value, bool):
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+        return value if math.isfinite(value) else None
+    # endregion
@@ -0,0 +1,194 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models
+from odoo.tools import split_every
+
+from datetime import timedelta
+import json
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# Orphaned data, in cleanup order: name, model, SQL query of the ids and
+# whether the records are unlinked or archived when they cannot be
+GC_STEPS = [
+    # BOMs created by the former BOM endpoint, which added a new unlinked
+    # BOM on every sync, once the assembly has a BOM managed by the sync:
+    # Fusion parts only, on the template of the assembly. BOMs that endpoint
+    # put on a template with the id of the assembly variant cannot be told
+    # apart from live BOMs and are left alone
+    ('legacy_boms', 'mrp.bom', """
+        SELECT bom.id FROM mrp_bom bom
+         WHERE bom.fusion_component_id IS NULL
+           AND bom.product_id IS NULL
+           AND bom.type = 'normal'
+           AND bom.active
+           AND bom.write_date < %(limit)s
+           AND EXISTS (
+               SELECT 1 FROM fusion_component fc
+                 JOIN mrp_bom managed
+                   ON managed.fusion_component_id = fc.id AND managed.active
+                WHERE fc.product_tmpl_id = bom.product_tmpl_id)
+           AND EXISTS (
+               SELECT 1 FROM mrp_bom_line line WHERE line.bom_id = bom.id)
+           AND NOT EXISTS (
+               SELECT 1 FROM mrp_bom_line line
+                WHERE line.bom_id = bom.id
+                  AND NOT EXISTS (
+                      SELECT 1 FROM fusion_component fc
+                       WHERE fc.product_id = line.product_id))
+         ORDER BY bom.id
+    """, True),
+    ('boms', 'mrp.bom', """
+        SELECT bom.id FROM mrp_bom bom
+         WHERE bom.fusion_component_id IS NOT NULL
+           AND NOT bom.active
+           AND bom.write_date < %(limit)s
+           AND NOT EXISTS (
+               SELECT 1 FROM mrp_production mo WHERE mo.bom_id = bom.id)
+         ORDER BY bom.id
+    """, False),
+    ('components', 'fusion.component', """
+        SELECT fc.id FROM fusion_component fc
+         WHERE NOT fc.active
+           AND fc.write_date < %(limit)s
+           AND NOT EXISTS (
+               SELECT 1 FROM fusion_component child
+                WHERE child.parent_id = fc.id AND child.active)
+           AND NOT EXISTS (
+               SELECT 1 FROM mrp_bom bom
+                WHERE bom.fusion_component_id = fc.id AND bom.active)
+         ORDER BY fc.id
+    """, False),
+    ('variants', 'product.product', """
+        SELECT pp.id FROM product_product pp
+         WHERE pp.active
+           AND pp.fusion_configuration_hash IS NOT NULL
+           AND NOT EXISTS (
+               SELECT 1 FROM fusion_component fc WHERE fc.product_id = pp.id)
+           AND NOT EXISTS (
+               SELECT 1 FROM mrp_bom bom
+                WHERE bom.product_id = pp.id AND bom.active)
+           AND NOT EXISTS (
+               SELECT 1 FROM mrp_bom_line line
+                 JOIN mrp_bom bom ON bom.id = line.bom_id
+                WHERE line.product_id = pp.id AND bom.active)
+         ORDER BY pp.id
+    """, True),
+    ('attribute_values', 'product.attribute.value', """
+        SELECT pav.id FROM product_attribute_value pav
+          JOIN product_attribute pa ON pa.id = pav.attribute_id
+         WHERE pa.is_fusion_attribute
+           AND NOT EXISTS (
+               SELECT 1 FROM product_template_attribute_value ptav
+                WHERE ptav.product_attribute_value_id = pav.id)
+           AND NOT EXISTS (
+               SELECT 1 FROM product_attribute_value_product_template_attribute_line_rel rel
+                WHERE rel.product_attribute_value_id = pav.id)
+         ORDER BY pav.id
+    """, False),
+    ('attributes', 'product.attribute', """
+        SELECT pa.id FROM product_attribute pa
+         WHERE pa.is_fusion_attribute
+           AND NOT EXISTS (
+               SELECT 1 FROM product_template_attribute_line ptal
+                WHERE ptal.attribute_id = pa.id)
+         ORDER BY pa.id
+    """, False),
+]
+
+
+class FusionGc(models.TransientModel):
+    """
+    Wizard cleaning up the data Fusion 360 syncs leave behind: archived
+    components and BOMs, BOMs superseded by the ones managed by the sync,
+    unused variants, attributes and attribute values.
+    Also run by a scheduled action.
+    """
+    _name = 'fusion.gc'
+    _description = 'Fusion 360 Data Cleanup'
+
+    # region Fields
+    dry_run = fields.Boolean(
+        default=True,
+        help="Only report the records that would be removed"
+    )
+    report = fields.Text(
+        readonly=True,
+        help="Number of orphaned records found per kind"
+    )
+    # endregion
+
+    # region Action Methods
+    def action_run(self):
+        """Run the cleanup and show its report."""
+        self.ensure_one()
+        report = self._collect_garbage(dry_run=self.dry_run)
+        self.report = '\n'.join(
+            f'{name}: {count}' for name, count in report.items())
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+    # endregion
+
+    # region Cron Methods
+    @api.model
+    def _cron_collect_garbage(self, batch_size=None):
+        """Remove orphaned Fusion data.
+
+        Args:
+            batch_size (int): Number of records removed per transaction,
+                defaults to the Fusion settings
+        """
+        self._collect_garbage(batch_size=batch_size)
+    # endregion
+
+    # region Helper Methods
+    @api.model
+    def _collect_garbage(self, dry_run=False, batch_size=None):
+        """Find orphaned Fusion data and remove it in batches.
+
+        Orphans are found with one query per kind of record. They are then
+        unlinked, or archived when they are still referenced, in batches
+        committed one by one so that locks are held briefly.
+
+        Args:
+            dry_run (bool): Only count the orphans
+            batch_size (int): Number of records removed per transaction,
+                defaults to the Fusion settings
+
+        Returns:
+            dict: Number of orphans per kind of record
+        """
+        settings = self.env['res.config.settings']._get_fusion_settings()
+        batch_size = batch_size or settings.gc_batch_size
+        limit = fields.Datetime.now() - timedelta(days=settings.gc_grace_days)
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        report = {}
+        for name, model, query, archive in GC_STEPS:
+            self.env.flush_all()
+            self.env.cr.execute(query, {'limit': limit})
+            ids = [row[0] for row in self.env.cr.fetchall()]
+            report[name] = len(ids)
+            if dry_run:
+                continue
+            for batch in split_every(batch_size, ids):
+                records = self.env[model].sudo().with_context(
+                    active_test=False).browse(batch)
+                if archive:
+                    records._unlink_or_archive()
+                else:
+                    records.unlink()
+                if auto_commit:
+                    self.env.cr.commit()
+        _logger.info('Fusion data cleanup%s: %s',
+                     ' (dry run)' if dry_run else '', json.dumps(report))
+        return report
+    # endregion
@@ -0,0 +1,190 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+from odoo.tools.sql import create_index
+
+from datetime import timedelta
+import hashlib
+import json
+
+
+class FusionIdempotencyKey(models.Model):
+    """
+    Model storing the result of a sync request under its idempotency key.
+    Retried requests get the stored result back without being processed
+    again.
+
+    Keys derived from the payload hash only deduplicate immediate retries:
+    they expire after a short retry window and are dropped by the next
+    sync of the user, so that a payload sent again after another one is
+    processed again.
+    """
+    _name = 'fusion.idempotency.key'
+    _description = 'Fusion 360 Idempotency Key'
+    _order = 'id desc'
+
+    # region Fields
+    key = fields.Char(
+        required=True,
+        readonly=True,
+        help="Idempotency key sent by the client, or hash of the payload"
+    )
+    endpoint = fields.Char(
+        required=True,
+        readonly=True
+    )
+    payload_hash = fields.Char(
+        required=True,
+        readonly=True,
+        help="SHA-256 digest of the request payload"
+    )
+    result = fields.Text(
+        readonly=True,
+        help="JSON result returned for the request"
+    )
+    derived = fields.Boolean(
+        readonly=True,
+        help="The key is the hash of the payload, the client sent none"
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        required=True,
+        readonly=True,
+        ondelete='cascade'
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        required=True,
+        readonly=True,
+        ondelete='cascade'
+    )
+    # endregion
+
+    # region Constraints and SQL Constraints
+    _sql_constraints = [
+        ('key_uniq',
+         'unique(key, endpoint, user_id, company_id)',
+         'A request with this idempotency key was already processed!')
+    ]
+
+    def init(self):
+        create_index(
+            self.env.cr, 'fusion_idempotency_key_derived_index', self._table,
+            ['user_id', 'company_id'], where='derived')
+    # endregion
+
+    # region Helper Methods
+    @api.model
+    def _hash_payload(self, endpoint, payload):
+        """Compute the canonical hash of a request payload.
+
+        Args:
+            endpoint (str): API endpoint
+            payload (dict): Request parameters
+
+        Returns:
+            str: Hexadecimal SHA-256 digest
+        """
+        normalized = json.dumps([endpoint, payload], sort_keys=True,
+                                separators=(',', ':'), default=str)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    @api.model
+    def _get_result(self, endpoint, key, payload_hash):
+        """Get the stored result of a request with one indexed query.
+
+        Args:
+            endpoint (str): API endpoint
+            key (str): Idempotency key
+            payload_hash (str): Hash of the request payload
+
+        Returns:
+            dict: Stored result, None if the request was not processed
+                within the retention period
+
+        Raises:
+            ValidationError: If the key was used for another payload
+        """
+        self.env.cr.execute("""
+            SELECT id, payload_hash, result, create_date, derived
+              FROM fusion_idempotency_key
+             WHERE key = %s AND endpoint = %s
+               AND user_id = %s AND company_id = %s
+        """, [key, endpoint, self.env.uid, self.env.company.id])
+        row = self.env.cr.fetchone()
+        if not row:
+            return None
+        record_id, stored_hash, result, create_date, derived = row
+        if create_date < self._get_expiry_date(derived=derived):
+            self.sudo().browse(record_id).unlink()
+            return None
+        if stored_hash != payload_hash:
+            raise ValidationError(
+                _('Idempotency key %s was already used for another request.', key))
+        return json.loads(result)
+
+    @api.model
+    def _store_result(self, endpoint, key, payload_hash, result, derived=False):
+        """Store the result of a processed request.
+
+        Args:
+            endpoint (str): API endpoint
+            key (str): Idempotency key
+            payload_hash (str): Hash of the request payload
+            result (dict): Result returned for the request
+            derived (bool): Whether the key is the hash of the payload
+        """
+        self.sudo().create({
+            'key': key,
+            'endpoint': endpoint,
+            'payload_hash': payload_hash,
+            'result': json.dumps(result),
+            'derived': derived,
+            'user_id': self.env.uid,
+            'company_id': self.env.company.id,
+        })
+
+    @api.model
+    def _invalidate_derived_keys(self):
+        """Drop the results stored under derived keys for the user.
+
+        Called when a request is processed, as its changes may overwrite
+        the ones of the payloads stored before: sending one of them again
+        must process it again.
+        """
+        self.env.cr.execute("""
+            DELETE FROM fusion_idempotency_key
+             WHERE derived AND user_id = %s AND company_id = %s
+        """, [self.env.uid, self.env.company.id])
+
+    @api.model
+    def _get_expiry_date(self, derived=False):
+        """Get the date before which stored results are expired.
+
+        Args:
+            derived (bool): Whether the results are stored under derived keys
+
+        Returns:
+            datetime: Expiry date
+        """
+        settings = self.env['res.config.settings']._get_fusion_settings()
+        if derived:
+            return fields.Datetime.now() - timedelta(
+                seconds=settings.idempotency_retry_seconds)
+        return fields.Datetime.now() - timedelta(
+            hours=settings.idempotency_ttl_hours)
+
+    @api.autovacuum
+    def _gc_idempotency_keys(self):
+        """Delete stored results older than their retention period."""
+        self.search([
+            '|',
+            ('create_date', '<', self._get_expiry_date()),
+            '&',
+            ('derived', '=', True),
+            ('create_date', '<', self._get_expiry_date(derived=True)),
+        ]).unlink()
+    # endregion
@@ -1,16 +1,165 @@
 # Copyright 2024 jaco tech
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models
+from odoo import api, fields, models, tools
+
+from typing import NamedTuple
+
+
+class FusionSettings(NamedTuple):
+    """Snapshot of the Fusion 360 integration settings."""
+    default_location_id: int = 0
+    default_category_id: int = 0
+    job_batch_size: int = 20
+    job_timeout_minutes: int = 60
+    slow_sync_seconds: float = 10.0
+    log_retention_days: int = 90
+    stream_chunk_size: int = 500
+    feed_page_size: int = 500
+    tombstone_retention_days: int = 30
+    idempotency_ttl_hours: int = 24
+    idempotency_retry_seconds: int = 60
+    gc_batch_size: int = 1000
+    gc_grace_days: int = 30
+
+
+DEFAULT_SETTINGS = FusionSettings()
+
+# Settings snapshot attribute, configuration parameter and type
+FUSION_PARAMETERS = [
+    ('default_location_id', 'fusion_integration.default_folder_id', int),
+    ('default_category_id', 'fusion_integration.default_category_id', int),
+    ('job_batch_size', 'fusion_integration.job_batch_size', int),
+    ('job_timeout_minutes', 'fusion_integration.job_timeout_minutes', int),
+    ('slow_sync_seconds', 'fusion_integration.slow_sync_seconds', float),
+    ('log_retention_days', 'fusion_integration.log_retention_days', int),
+    ('stream_chunk_size', 'fusion_integration.stream_chunk_size', int),
+    ('feed_page_size', 'fusion_integration.feed_page_size', int),
+    ('tombstone_retention_days',
+     'fusion_integration.tombstone_retention_days', int),
+    ('idempotency_ttl_hours', 'fusion_integration.idempotency_ttl_hours', int),
+    ('idempotency_retry_seconds',
+     'fusion_integration.idempotency_retry_seconds', int),
+    ('gc_batch_size', 'fusion_integration.gc_batch_size', int),
+    ('gc_grace_days', 'fusion_integration.gc_grace_days', int),
+]
 
 
 class ResConfigSettings(models.TransientModel):
     """Settings configuration for Fusion 360 integration."""
     _inherit = 'res.config.settings'
 
+    fusion_default_folder_id = fields.Many2one(
+        'stock.location',
+        string='Default Location for Fusion Products',
+        config_parameter='fusion_integration.default_folder_id',
+        domain=[
+            ('usage', '=', 'internal'),
+            '|',
+            ('company_id', '=', False),
+            ('company_id', '=', 'company_id'),
+        ],
+        help='Default inventory location for newly created products from Fusion 360'
+    )
     fusion_default_category_id = fields.Many2one(
         'product.category',
         string='Default Category for Fusion Products',
         config_parameter='fusion_integration.default_category_id',
         help='Default category for newly created products from Fusion 360'
     )
+    fusion_job_batch_size = fields.Integer(
+        string='Sync Jobs per Run',
+        config_parameter='fusion_integration.job_batch_size',
+        default=DEFAULT_SETTINGS.job_batch_size,
+        help='Maximum number of queued sync jobs processed per cron run'
+    )
+    fusion_job_timeout_minutes = fields.Integer(
+        string='Sync Job Timeout (minutes)',
+        config_parameter='fusion_integration.job_timeout_minutes',
+        default=DEFAULT_SETTINGS.job_timeout_minutes,
+        help='Running sync jobs older than this are considered interrupted'
+    )
+    fusion_slow_sync_seconds = fields.Float(
+        string='Slow Sync Threshold (seconds)',
+        config_parameter='fusion_integration.slow_sync_seconds',
+        default=DEFAULT_SETTINGS.slow_sync_seconds,
+        help='Sync requests taking longer than this are flagged as slow'
+    )
+    fusion_log_retention_days = fields.Integer(
+        string='Sync Log Retention (days)',
+        config_parameter='fusion_integration.log_retention_days',
+        default=DEFAULT_SETTINGS.log_retention_days,
+        help='Sync logs older than this are deleted'
+    )
+    fusion_stream_chunk_size = fields.Integer(
+        string='Streaming Chunk Size',
+        config_parameter='fusion_integration.stream_chunk_size',
+        default=DEFAULT_SETTINGS.stream_chunk_size,
+        help='Number of records processed and committed together by the '
+             'streaming import endpoint'
+    )
+    fusion_feed_page_size = fields.Integer(
+        string='Change Feed Page Size',
+        config_parameter='fusion_integration.feed_page_size',
+        default=DEFAULT_SETTINGS.feed_page_size,
+        help='Maximum number of records of each kind returned per change '
+             'feed page'
+    )
+    fusion_tombstone_retention_days = fields.Integer(
+        string='Deleted Record Retention (days)',
+        config_parameter='fusion_integration.tombstone_retention_days',
+        default=DEFAULT_SETTINGS.tombstone_retention_days,
+        help='Deleted components and BOMs are reported by the change feed '
+             'for this long'
+    )
+    fusion_idempotency_ttl_hours = fields.Integer(
+        string='Replay Window (hours)',
+        config_parameter='fusion_integration.idempotency_ttl_hours',
+        default=DEFAULT_SETTINGS.idempotency_ttl_hours,
+        help='Retried sync requests sent with an idempotency key get the '
+             'stored result back for this long'
+    )
+    fusion_idempotency_retry_seconds = fields.Integer(
+        string='Retry Window (seconds)',
+        config_parameter='fusion_integration.idempotency_retry_seconds',
+        default=DEFAULT_SETTINGS.idempotency_retry_seconds,
+        help='Retried sync requests sent without idempotency key get the '
+             'stored result back for this long, unless another sync was '
+             'made since'
+    )
+    fusion_gc_batch_size = fields.Integer(
+        string='Cleanup Batch Size',
+        config_parameter='fusion_integration.gc_batch_size',
+        default=DEFAULT_SETTINGS.gc_batch_size,
+        help='Number of orphaned records removed per transaction by the '
+             'data cleanup'
+    )
+    fusion_gc_grace_days = fields.Integer(
+        string='Cleanup Grace Period (days)',
+        config_parameter='fusion_integration.gc_grace_days',
+        default=DEFAULT_SETTINGS.gc_grace_days,
+        help='Archived components and BOMs are deleted by the data cleanup '
+             'after this long'
+    )
+
+    @api.model
+    @tools.ormcache()
+    def _get_fusion_settings(self):
+        """Get the Fusion 360 integration settings.
+
+        The snapshot is cached per registry. Saving the settings writes the
+        configuration parameters, which clears the cache on every worker.
+
+        Returns:
+            FusionSettings: Settings snapshot
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        values = {}
+        for name, key, cast in FUSION_PARAMETERS:
+            value = ICP.get_param(key)
+            if value:
+                try:
+                    values[name] = cast(value)
+                except ValueError:
+                    pass
+        return FusionSettings(**values)
@@ -0,0 +1,285 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import _, api, fields, models
+from odoo.exceptions import ValidationError
+
+from .fusion_component import (
+    MAX_TRIES_ON_CONCURRENCY_FAILURE,
+    import_savepoint,
+    is_concurrency_error,
+)
+
+from datetime import timedelta
+import json
+import logging
+import threading
+import time
+import traceback
+
+_logger = logging.getLogger(__name__)
+
+
+class FusionSyncJob(models.Model):
+    """
+    Model representing a queued synchronization request from Fusion 360.
+    Payloads are stored by the API endpoints and processed by a cron worker.
+    """
+    _name = 'fusion.sync.job'
+    _description = 'Fusion 360 Synchronization Job'
+    _order = 'id desc'
+
+    # region Fields
+    endpoint = fields.Selection(
+        selection=[
+            ('component', 'Component'),
+            ('components', 'Components'),
+            ('assembly', 'Assembly'),
+            ('bom', 'Bill of Materials'),
+        ],
+        required=True,
+        readonly=True,
+        help="API endpoint the payload was sent to"
+    )
+    state = fields.Selection(
+        selection=[
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        required=True,
+        default='pending',
+        readonly=True,
+        index=True,
+        help="Processing status of the job"
+    )
+    payload = fields.Text(
+        required=True,
+        readonly=True,
+        help="JSON payload received from Fusion 360"
+    )
+    result = fields.Text(
+        readonly=True,
+        help="JSON result of the processing"
+    )
+    error = fields.Text(
+        readonly=True,
+        help="Error raised while processing the job"
+    )
+    date_started = fields.Datetime(
+        string='Started On',
+        readonly=True
+    )
+    date_done = fields.Datetime(
+        string='Done On',
+        readonly=True
+    )
+    duration = fields.Float(
+        readonly=True,
+        help="Processing time in seconds"
+    )
+    retry_count = fields.Integer(
+        string='Retries',
+        readonly=True,
+        help="Number of times the job was queued again after conflicting "
+             "with a concurrent sync"
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+        help="User the job is processed as"
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+        help="Company the job is processed in"
+    )
+    # endregion
+
+    # region Compute Methods
+    @api.depends('endpoint')
+    def _compute_display_name(self):
+        labels = dict(self._fields['endpoint']._description_selection(self.env))
+        for job in self:
+            job.display_name = f'{labels.get(job.endpoint, "")} #{job.id}'
+    # endregion
+
+    # region Action Methods
+    @api.model
+    def create_from_request(self, endpoint, payload):
+        """Queue an API payload for asynchronous processing.
+
+        Args:
+            endpoint (str): API endpoint the payload was sent to
+            payload (dict): API payload
+
+        Returns:
+            fusion.sync.job: Queued job
+        """
+        return self.create({
+            'endpoint': endpoint,
+            'payload': json.dumps(payload),
+        })
+
+    def action_retry(self):
+        """Queue failed jobs again."""
+        self.filtered(lambda j: j.state == 'failed').write({
+            'state': 'pending',
+            'error': False,
+            'result': False,
+            'retry_count': 0,
+        })
+
+    def get_status(self):
+        """Get the status of the job as returned by the API.
+
+        Returns:
+            dict: Job status, timings, result and error
+        """
+        self.ensure_one()
+        return {
+            'id': self.id,
+            'state': self.state,
+            'date_started': self.date_started and fields.Datetime.to_string(
+                self.date_started),
+            'date_done': self.date_done and fields.Datetime.to_string(
+                self.date_done),
+            'duration': self.duration,
+            'result': self.result and json.loads(self.result),
+            'error': self.error,
+        }
+    # endregion
+
+    # region Cron Methods
+    @api.model
+    def _cron_process_jobs(self, batch_size=None, timeout_minutes=None):
+        """Process pending jobs.
+
+        Jobs are claimed one at a time with FOR UPDATE SKIP LOCKED, so
+        several workers can run the cron at the same time without
+        processing a job twice. A job is only marked as running when its
+        processing starts, so jobs waiting for their turn are neither seen
+        as interrupted nor charged for the wait.
+
+        Args:
+            batch_size (int): Maximum number of jobs claimed per run,
+                defaults to the Fusion settings
+            timeout_minutes (int): Running jobs older than this are
+                considered interrupted and marked as failed, defaults to
+                the Fusion settings
+        """
+        settings = self.env['res.config.settings']._get_fusion_settings()
+        batch_size = batch_size or settings.job_batch_size
+        timeout_minutes = timeout_minutes or settings.job_timeout_minutes
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        self._fail_interrupted_jobs(timeout_minutes)
+
+        # Jobs queued again by this run wait for the next one
+        processed = []
+        for dummy in range(batch_size):
+            self.flush_model(['state'])
+            self.env.cr.execute("""
+                SELECT id FROM fusion_sync_job
+                 WHERE state = 'pending'
+                   AND NOT id = ANY(%s)
+                 ORDER BY id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """, [processed])
+            row = self.env.cr.fetchone()
+            if not row:
+                break
+            job = self.browse(row[0])
+            processed.append(job.id)
+            job.write({'state': 'running', 'date_started': fields.Datetime.now()})
+            if auto_commit:
+                self.env.cr.commit()
+            job._process()
+            if auto_commit:
+                self.env.cr.commit()
+
+    @api.model
+    def _fail_interrupted_jobs(self, timeout_minutes):
+        """Mark jobs stuck in the running state as failed.
+
+        Args:
+            timeout_minutes (int): Age after which a running job is stale
+        """
+        limit = fields.Datetime.now() - timedelta(minutes=timeout_minutes)
+        self.search([
+            ('state', '=', 'running'),
+            ('date_started', '<', limit),
+        ]).write({
+            'state': 'failed',
+            'error': _('Processing was interrupted'),
+        })
+    # endregion
+
+    # region Helper Methods
+    def _process(self):
+        """Process the job and store its outcome.
+
+        Jobs conflicting with a concurrent sync are queued again, as they
+        can only succeed in a new transaction.
+        """
+        self.ensure_one()
+        start = time.monotonic()
+        SyncLog = self.env['fusion.sync.log']
+        with SyncLog._profile(f'job/{self.endpoint}', job=self) as outcome:
+            try:
+                with import_savepoint(self.env):
+                    result = self.with_user(self.user_id).with_company(
+                        self.company_id)._execute()
+                vals = {'state': 'done', 'result': json.dumps(result)}
+                outcome.update(result)
+            except Exception as e:
+                self.env.registry.clear_cache()
+                outcome.update(success=False, error=str(e))
+                if is_concurrency_error(e) and \
+                        self.retry_count < MAX_TRIES_ON_CONCURRENCY_FAILURE:
+                    _logger.info(
+                        'Fusion sync job %s conflicted with a concurrent sync, '
+                        'queued again: %s', self.id, e)
+                    self.write({
+                        'state': 'pending',
+                        'retry_count': self.retry_count + 1,
+                    })
+                    return
+                _logger.warning(
+                    'Fusion sync job %s failed', self.id, exc_info=True)
+                vals = {'state': 'failed', 'error': traceback.format_exc()}
+        vals.update({
+            'date_done': fields.Datetime.now(),
+            'duration': time.monotonic() - start,
+        })
+        self.write(vals)
+
+    def _execute(self):
+        """Run the payload against the matching ingestion method.
+
+        Returns:
+            dict: Result as returned by the synchronous endpoint
+        """
+        self.ensure_one()
+        payload = json.loads(self.payload)
+        Component = self.env['fusion.component'].with_context(fusion_import=True)
+        if self.endpoint == 'component':
+            component = Component.create_from_fusion(payload)
+            return {'success': True, 'id': component.id}
+        if self.endpoint == 'components':
+            results = Component.create_from_fusion_batch(payload['components'])
+            return {'success': True, 'results': results}
+        if self.endpoint == 'assembly':
+            root = Component.create_from_fusion_tree(payload['assembly'])
+            return {'success': True, 'id': root.id}
+        if self.endpoint == 'bom':
+            bom, missing = Component.sync_bom_from_fusion_payload(payload)
+            return {'success': True, 'id': bom.id, 'missing': missing}
+        raise ValidationError(_('Unknown endpoint %s', self.endpoint))
+    # endregion
@@ -0,0 +1,303 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models, tools
+
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+import json
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+STATS_QUERY = """
+    SELECT endpoint,
+           count(*) AS call_count,
+           count(*) FILTER (WHERE NOT success) AS error_count,
+           percentile_cont(0.5) WITHIN GROUP (ORDER BY duration) AS p50_duration,
+           percentile_cont(0.95) WITHIN GROUP (ORDER BY duration) AS p95_duration,
+           max(duration) AS max_duration,
+           avg(query_count) AS avg_query_count,
+           sum(item_count) AS item_count
+      FROM fusion_sync_log
+     WHERE create_date >= {since}
+     GROUP BY endpoint
+"""
+
+
+class SyncProfile:
+    """Timings, query counts and outcome counts of one sync request."""
+
+    def __init__(self, cr):
+        self.cr = cr
+        self.phases = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'queries': 0})
+        self.counts = Counter()
+        self.active_phase = None
+
+
+@contextmanager
+def sync_phase(name):
+    """Measure a phase of the sync request being profiled, if any.
+
+    Nested phases are accounted to the outermost one only.
+
+    Args:
+        name (str): Phase name
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is None or profile.active_phase:
+        yield
+        return
+    profile.active_phase = name
+    queries = profile.cr.sql_log_count
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = profile.phases[name]
+        stats['calls'] += 1
+        stats['seconds'] += time.perf_counter() - start
+        stats['queries'] += profile.cr.sql_log_count - queries
+        profile.active_phase = None
+
+
+def sync_count(**counts):
+    """Add outcome counts to the sync request being profiled, if any."""
+    profile = getattr(_local, 'profile', None)
+    if profile is not None:
+        profile.counts.update(counts)
+
+
+class FusionSyncLog(models.Model):
+    """
+    Model logging the cost and outcome of Fusion 360 sync requests.
+    Used to find slow assemblies and endpoints in production.
+    """
+    _name = 'fusion.sync.log'
+    _description = 'Fusion 360 Synchronization Log'
+    _order = 'id desc'
+
+    # region Fields
+    endpoint = fields.Char(
+        required=True,
+        index=True,
+        readonly=True,
+        help="API endpoint or job type that was called"
+    )
+    success = fields.Boolean(
+        readonly=True
+    )
+    error = fields.Text(
+        readonly=True
+    )
+    duration = fields.Float(
+        readonly=True,
+        group_operator='avg',
+        help="Total time in seconds"
+    )
+    query_count = fields.Integer(
+        string='Queries',
+        readonly=True,
+        group_operator='avg',
+        help="Number of SQL queries run on the request cursor"
+    )
+    query_time = fields.Float(
+        string='SQL Time',
+        readonly=True,
+        group_operator='avg',
+        help="Time spent in SQL queries in seconds, when tracked by the server"
+    )
+    item_count = fields.Integer(
+        string='Items',
+        readonly=True,
+        help="Number of components or BOM lines received"
+    )
+    created_count = fields.Integer(
+        string='Created',
+        readonly=True
+    )
+    updated_count = fields.Integer(
+        string='Updated',
+        readonly=True
+    )
+    unchanged_count = fields.Integer(
+        string='Unchanged',
+        readonly=True
+    )
+    failed_count = fields.Integer(
+        string='Failed',
+        readonly=True
+    )
+    retry_count = fields.Integer(
+        string='Retries',
+        readonly=True,
+        help="Number of times the request was retried after conflicting "
+             "with a concurrent sync"
+    )
+    is_replay = fields.Boolean(
+        string='Replayed',
+        readonly=True,
+        help="The stored result of an identical earlier request was returned"
+    )
+    phase_stats = fields.Text(
+        string='Phases',
+        readonly=True,
+        help="JSON timings and query counts per ingestion phase"
+    )
+    is_slow = fields.Boolean(
+        string='Slow',
+        readonly=True,
+        index=True
+    )
+    job_id = fields.Many2one(
+        'fusion.sync.job',
+        string='Job',
+        readonly=True,
+        ondelete='set null'
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='User',
+        readonly=True,
+        default=lambda self: self.env.user
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        readonly=True,
+        default=lambda self: self.env.company
+    )
+    # endregion
+
+    # region Action Methods
+    @api.model
+    @contextmanager
+    def _profile(self, endpoint, job=None):
+        """Profile a sync request and log it when done.
+
+        Yields a dict in which the caller stores the request result, as
+        returned by the API, to log its outcome.
+
+        Args:
+            endpoint (str): API endpoint or job type
+            job (fusion.sync.job): Job being processed, if any
+        """
+        profile = SyncProfile(self.env.cr)
+        previous = getattr(_local, 'profile', None)
+        _local.profile = profile
+        thread = threading.current_thread()
+        queries = self.env.cr.sql_log_count
+        query_time = getattr(thread, 'query_time', 0.0)
+        start = time.perf_counter()
+        outcome = {}
+        try:
+            yield outcome
+        except Exception as e:
+            outcome.update(success=False, error=str(e))
+            raise
+        finally:
+            _local.profile = previous
+            duration = time.perf_counter() - start
+            try:
+                self._log_profile(profile, {
+                    'endpoint': endpoint,
+                    'success': outcome.get('success', False),
+                    'error': outcome.get('error'),
+                    'duration': duration,
+                    'query_count': self.env.cr.sql_log_count - queries,
+                    'query_time': getattr(thread, 'query_time', 0.0) - query_time,
+                    'job_id': job and job.id,
+                })
+            except Exception:
+                _logger.warning('Could not log Fusion sync on %s', endpoint,
+                                exc_info=True)
+
+    @api.model
+    def get_stats(self, days=7):
+        """Get latency and outcome statistics per endpoint.
+
+        Args:
+            days (int): Number of past days to include
+
+        Returns:
+            list: One dict per endpoint
+        """
+        self.check_access_rights('read')
+        self.flush_model()
+        self.env.cr.execute(
+            STATS_QUERY.format(since='%(since)s') + ' ORDER BY endpoint',
+            {'since': fields.Datetime.now() - timedelta(days=int(days))},
+        )
+        return self.env.cr.dictfetchall()
+    # endregion
+
+    # region Helper Methods
+    def _log_profile(self, profile, vals):
+        """Create the log of a profiled request.
+
+        Args:
+            profile (SyncProfile): Collected profile
+            vals (dict): Request level values
+        """
+        counts = profile.counts
+        settings = self.env['res.config.settings']._get_fusion_settings()
+        vals.update({
+            'item_count': counts['items'],
+            'created_count': counts['created'],
+            'updated_count': counts['updated'],
+            'unchanged_count': counts['unchanged'],
+            'failed_count': counts['failed'],
+            'retry_count': counts['retries'],
+            'is_replay': bool(counts['replayed']),
+            'phase_stats': json.dumps(profile.phases),
+            'is_slow': vals['duration'] >= settings.slow_sync_seconds,
+        })
+        if vals['is_slow']:
+            _logger.warning(
+                'Slow Fusion sync on %s: %.2fs, %d queries, phases %s',
+                vals['endpoint'], vals['duration'], vals['query_count'],
+                vals['phase_stats'])
+        self.sudo().create(vals)
+
+    @api.autovacuum
+    def _gc_sync_logs(self):
+        """Delete sync logs older than the retention period."""
+        settings = self.env['res.config.settings']._get_fusion_settings()
+        limit = fields.Datetime.now() - timedelta(
+            days=settings.log_retention_days)
+        self.search([('create_date', '<', limit)]).unlink()
+    # endregion
+
+
+class FusionSyncStat(models.Model):
+    """
+    Reporting model of sync latency percentiles per endpoint over the last
+    30 days.
+    """
+    _name = 'fusion.sync.stat'
+    _description = 'Fusion 360 Synchronization Statistics'
+    _auto = False
+    _order = 'p95_duration desc'
+
+    endpoint = fields.Char(readonly=True)
+    call_count = fields.Integer(string='Calls', readonly=True)
+    error_count = fields.Integer(string='Errors', readonly=True)
+    p50_duration = fields.Float(string='p50 (s)', readonly=True)
+    p95_duration = fields.Float(string='p95 (s)', readonly=True)
+    max_duration = fields.Float(string='Max (s)', readonly=True)
+    avg_query_count = fields.Float(string='Avg Queries', readonly=True)
+    item_count = fields.Integer(string='Items', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT row_number() OVER (ORDER BY endpoint) AS id, stats.*
+                  FROM ({STATS_QUERY.format(
+                      since="now() at time zone 'utc' - interval '30 days'")}) stats
+            )
+        """)
@@ -0,0 +1,78 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models
+from odoo.tools.sql import create_index
+
+from datetime import timedelta
+
+
+class FusionTombstone(models.Model):
+    """
+    Model recording deleted Fusion components and BOMs.
+    Read by the change feed so that consumers can drop their copies.
+    """
+    _name = 'fusion.tombstone'
+    _description = 'Fusion 360 Deleted Record'
+    _order = 'write_date, id'
+
+    # region Fields
+    res_model = fields.Selection(
+        selection=[
+            ('fusion.component', 'Component'),
+            ('mrp.bom', 'Bill of Materials'),
+        ],
+        string='Model',
+        required=True,
+        readonly=True
+    )
+    res_id = fields.Integer(
+        string='Record ID',
+        required=True,
+        readonly=True
+    )
+    fusion_id = fields.Char(
+        string='Fusion ID',
+        readonly=True
+    )
+    configuration_name = fields.Char(
+        readonly=True
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        readonly=True
+    )
+    # endregion
+
+    def init(self):
+        create_index(self.env.cr, 'fusion_tombstone_change_feed_index',
+                     self._table, ['company_id', 'write_date', 'id'])
+
+    # region Helper Methods
+    @api.model
+    def _add_tombstones(self, records):
+        """Record the deletion of components or BOMs.
+
+        Args:
+            records (fusion.component|mrp.bom): Records about to be deleted
+        """
+        if records._name == 'fusion.component':
+            components = [(record, record) for record in records]
+        else:
+            components = [(record, record.fusion_component_id) for record in records]
+        self.sudo().create([{
+            'res_model': records._name,
+            'res_id': record.id,
+            'fusion_id': component.fusion_id,
+            'configuration_name': component.configuration_name,
+            'company_id': record.company_id.id,
+        } for record, component in components])
+
+    @api.autovacuum
+    def _gc_tombstones(self):
+        """Delete tombstones older than the retention period."""
+        settings = self.env['res.config.settings']._get_fusion_settings()
+        limit = fields.Datetime.now() - timedelta(
+            days=settings.tombstone_retention_days)
+        self.search([('write_date', '<', limit)]).unlink()
+    # endregion
@@ -0,0 +1,65 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import api, fields, models
+from odoo.tools.sql import create_index
+
+from .fusion_component import create_unique_index
+
+
+class MrpBom(models.Model):
+    """Extend mrp.bom to track BOMs managed by Fusion 360."""
+    _inherit = 'mrp.bom'
+
+    fusion_component_id = fields.Many2one(
+        'fusion.component',
+        string='Fusion Component',
+        index='btree_not_null',
+        ondelete='set null',
+        copy=False,
+        help='Fusion 360 assembly this BOM is synchronized from'
+    )
+
+    def init(self):
+        super().init()
+        # Each assembly has a single active BOM managed by Fusion 360
+        create_unique_index(
+            self.env.cr, 'mrp_bom_fusion_component_uniq', self._table,
+            ['fusion_component_id'],
+            where='fusion_component_id IS NOT NULL AND active')
+        create_index(
+            self.env.cr, 'mrp_bom_fusion_change_feed_index', self._table,
+            ['company_id', 'write_date', 'id'],
+            where='fusion_component_id IS NOT NULL')
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override create to count the lines of Fusion BOMs and roll up
+        their quantities."""
+        boms = super().create(vals_list)
+        boms.fusion_component_id._update_bom_line_counts()
+        boms.fusion_component_id._mark_rollup_dirty()
+        return boms
+
+    def write(self, vals):
+        """Override write to recount the lines of Fusion BOMs and roll up
+        their quantities."""
+        components = self.fusion_component_id
+        result = super().write(vals)
+        if vals.keys() & {'active', 'bom_line_ids', 'fusion_component_id'}:
+            components |= self.fusion_component_id
+            components._update_bom_line_counts()
+            components._mark_rollup_dirty()
+        return result
+
+    def unlink(self):
+        """Override unlink to report deleted Fusion BOMs."""
+        fusion_boms = self.filtered('fusion_component_id')
+        components = fusion_boms.fusion_component_id
+        if fusion_boms:
+            self.env['fusion.tombstone']._add_tombstones(fusion_boms)
+        result = super().unlink()
+        components = components.exists()
+        components._update_bom_line_counts()
+        components._mark_rollup_dirty()
+        return result
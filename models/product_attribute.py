@@ -1,7 +1,16 @@
 # Copyright 2024 jaco tech
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from odoo import fields, models, api
+from odoo import fields, models, api, tools
+from odoo.tools import frozendict
+
+from .fusion_component import create_unique_index
+
+# Fields the cached fusion attribute and value lookups depend on
+FUSION_CACHE_FIELDS = {
+    'is_fusion_attribute', 'fusion_parameter_name', 'company_id', 'active',
+}
+FUSION_VALUE_CACHE_FIELDS = {'name', 'attribute_id', 'company_id', 'active'}
 
 
 class ProductAttribute(models.Model):
@@ -18,6 +27,14 @@ class ProductAttribute(models.Model):
         help='Original parameter name in Fusion 360'
     )
 
+    def init(self):
+        super().init()
+        # Concurrent workers must not create the same Fusion parameter twice
+        create_unique_index(
+            self.env.cr, 'product_attribute_fusion_parameter_uniq', self._table,
+            ['fusion_parameter_name', 'COALESCE(company_id, 0)'],
+            where='is_fusion_attribute')
+
     @api.onchange('fusion_parameter_name', 'is_fusion_attribute')
     def _onchange_fusion_parameter_name(self):
         """Update name when fusion parameter name changes."""
@@ -31,7 +48,10 @@ class ProductAttribute(models.Model):
         for vals in vals_list:
             if vals.get('is_fusion_attribute') and vals.get('fusion_parameter_name'):
                 vals['name'] = f'Fusion: {vals["fusion_parameter_name"]}'
-        return super().create(vals_list)
+        attributes = super().create(vals_list)
+        if attributes.filtered('is_fusion_attribute'):
+            self._clear_fusion_cache_on_commit()
+        return attributes
 
     def write(self, vals):
         """Override write to update name when fusion parameter changes."""
@@ -41,4 +61,109 @@ class ProductAttribute(models.Model):
             for record in self:
                 if record.fusion_parameter_name:
                     vals['name'] = f'Fusion: {record.fusion_parameter_name}'
+        if FUSION_CACHE_FIELDS.intersection(vals) and (
+                vals.get('is_fusion_attribute')
+                or self.filtered('is_fusion_attribute')):
+            self.env.registry.clear_cache()
         return super().write(vals)
+
+    def unlink(self):
+        """Override unlink to invalidate the fusion attribute cache."""
+        if self.filtered('is_fusion_attribute'):
+            self.env.registry.clear_cache()
+        return super().unlink()
+
+    @api.model
+    def _clear_fusion_cache_on_commit(self):
+        """Clear the fusion attribute cache once the transaction commits.
+
+        Used when fusion attributes or values are created: clearing the
+        cache right away would let it cache ids that may still be rolled
+        back. Until the commit, they are found by _get_or_create_attribute
+        and _get_or_create_attribute_value on a cache miss.
+        """
+        postcommit = self.env.cr.postcommit
+        if 'fusion.attribute.cache' not in postcommit.data:
+            postcommit.data['fusion.attribute.cache'] = True
+            postcommit.add(self.env.registry.clear_cache)
+
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_fusion_attribute_ids(self, company_id):
+        """Get fusion attributes available to a company.
+
+        The result is cached per registry, invalidated whenever a fusion
+        attribute is modified or deleted, and once the transaction commits
+        when one is created.
+
+        Args:
+            company_id (int): Company ID
+
+        Returns:
+            frozendict: Attribute IDs by fusion parameter name
+        """
+        attributes = self.sudo().search([
+            ('is_fusion_attribute', '=', True),
+            '|',
+            ('company_id', '=', False),
+            ('company_id', '=', company_id)
+        ])
+        result = {}
+        for attribute in attributes:
+            result.setdefault(attribute.fusion_parameter_name, attribute.id)
+        return frozendict(result)
+
+    @api.model
+    @tools.ormcache('attribute_id', 'company_id')
+    def _get_fusion_attribute_value_ids(self, attribute_id, company_id):
+        """Get the values of a fusion attribute available to a company.
+
+        The result is cached per registry, invalidated whenever a value of
+        the attribute is modified or deleted, and once the transaction
+        commits when one is created.
+
+        Args:
+            attribute_id (int): Attribute ID
+            company_id (int): Company ID
+
+        Returns:
+            frozendict: Attribute value IDs by name
+        """
+        values = self.env['product.attribute.value'].sudo().search([
+            ('attribute_id', '=', attribute_id),
+            '|',
+            ('company_id', '=', False),
+            ('company_id', '=', company_id)
+        ])
+        result = {}
+        for value in values:
+            result.setdefault(value.name, value.id)
+        return frozendict(result)
+
+
+class ProductAttributeValue(models.Model):
+    """Extend product.attribute.value to keep the fusion cache in sync."""
+    _inherit = 'product.attribute.value'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Override create to invalidate the fusion attribute value cache."""
+        values = super().create(vals_list)
+        if values.attribute_id.filtered('is_fusion_attribute'):
+            self.env['product.attribute']._clear_fusion_cache_on_commit()
+        return values
+
+    def write(self, vals):
+        """Override write to invalidate the fusion attribute value cache."""
+        if FUSION_VALUE_CACHE_FIELDS.intersection(vals):
+            attributes = self.attribute_id | self.env['product.attribute'].browse(
+                vals.get('attribute_id') or [])
+            if attributes.filtered('is_fusion_attribute'):
+                self.env.registry.clear_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        """Override unlink to invalidate the fusion attribute value cache."""
+        if self.attribute_id.filtered('is_fusion_attribute'):
+            self.env.registry.clear_cache()
+        return super().unlink()
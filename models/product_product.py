@@ -0,0 +1,16 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo import fields, models
+
+
+class ProductProduct(models.Model):
+    """Extend product.product to identify Fusion 360 configurations."""
+    _inherit = 'product.product'
+
+    fusion_configuration_hash = fields.Char(
+        string='Fusion Configuration Hash',
+        index='btree_not_null',
+        copy=False,
+        help='Hash of the Fusion 360 configuration values of this variant'
+    )
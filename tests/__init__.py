@@ -1,2 +1,7 @@
 from . import test_fusion_component
 from . import test_fusion_settings
+from . import test_fusion_sync_job
+from . import test_fusion_benchmark
+from . import test_fusion_sync_log
+from . import test_fusion_gc
+from . import test_fusion_controller
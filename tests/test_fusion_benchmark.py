@@ -0,0 +1,201 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+"""Benchmarks of the Fusion 360 ingestion paths.
+
+They only run on demand with ``--test-tags fusion_benchmark``. The size of
+the synthetic assemblies is set with environment variables:
+
+- FUSION_BENCH_PARTS: number of parts (default 200)
+- FUSION_BENCH_PARAMS: configuration parameters per template (default 3)
+- FUSION_BENCH_VARIANTS: configurations per template (default 5)
+- FUSION_BENCH_DEPTH: depth of the generated assembly tree (default 3)
+- FUSION_BENCH_REPORT: path of the JSON report, logged when not set
+"""
+
+from odoo.modules.module import get_manifest
+from odoo.tests.common import TransactionCase, tagged
+
+import json
+import logging
+import os
+import time
+
+_logger = logging.getLogger(__name__)
+
+BENCH_PARTS = int(os.environ.get('FUSION_BENCH_PARTS', 200))
+BENCH_PARAMS = int(os.environ.get('FUSION_BENCH_PARAMS', 3))
+BENCH_VARIANTS = int(os.environ.get('FUSION_BENCH_VARIANTS', 5))
+BENCH_DEPTH = int(os.environ.get('FUSION_BENCH_DEPTH', 3))
+BENCH_REPORT = os.environ.get('FUSION_BENCH_REPORT')
+
+
+@tagged('-standard', 'fusion_benchmark')
+class TestFusionBenchmark(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.report = {
+            'module_version': get_manifest('fusion_integration').get('version'),
+            'parameters': {
+                'parts': BENCH_PARTS,
+                'params': BENCH_PARAMS,
+                'variants': BENCH_VARIANTS,
+                'depth': BENCH_DEPTH,
+            },
+            'results': [],
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        report = json.dumps(cls.report, indent=2)
+        if BENCH_REPORT:
+            with open(BENCH_REPORT, 'w') as report_file:
+                report_file.write(report)
+        _logger.info('Fusion benchmark report:\n%s', report)
+        super().tearDownClass()
+
+    def _measure(self, name, items, func):
+        """Run func and add its timing and query count to the report."""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        result = func()
+        self.env.flush_all()
+        seconds = time.perf_counter() - start
+        self.report['results'].append({
+            'name': name,
+            'items': items,
+            'seconds': round(seconds, 4),
+            'items_per_second': round(items / seconds, 2) if seconds else None,
+            'queries': self.env.cr.sql_log_count - queries,
+        })
+        return result
+
+    def _part_vals(self, index, **vals):
+        return dict({
+            'name': f'Bench Part {index}',
+            'fusion_id': f'BENCH_PART_{index}',
+            'component_type': 'component',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        }, **vals)
+
+    def _configured_vals(self):
+        """Generate configurations of BENCH_VARIANTS parts per template."""
+        vals_list = []
+        for index in range(max(BENCH_PARTS // BENCH_VARIANTS, 1)):
+            for variant in range(BENCH_VARIANTS):
+                vals_list.append(self._part_vals(
+                    index,
+                    fusion_id=f'BENCH_CONFIG_{index}',
+                    configuration_name=f'Config {variant}',
+                    configuration_values=json.dumps({
+                        f'Param {param}': str(variant * 10 + param)
+                        for param in range(BENCH_PARAMS)
+                    }),
+                ))
+        return vals_list
+
+    def _tree(self, depth, prefix='BENCH'):
+        """Generate an assembly tree of about BENCH_PARTS leaves."""
+        breadth = max(round(BENCH_PARTS ** (1 / max(depth, 1))), 2)
+
+        def node(level, path):
+            vals = self._part_vals(0, name=f'Bench {path}', fusion_id=path)
+            if level < depth:
+                vals['component_type'] = 'assembly'
+                vals['children'] = [
+                    node(level + 1, f'{path}_{index}') for index in range(breadth)
+                ]
+            vals['quantity'] = 2
+            return vals
+        return node(0, prefix)
+
+    def test_01_bulk_parts(self):
+        """Benchmark bulk creation and unchanged re-sync of simple parts."""
+        Component = self.env['fusion.component']
+        vals_list = [self._part_vals(index) for index in range(BENCH_PARTS)]
+
+        self._measure('create_from_fusion_batch.create', BENCH_PARTS,
+                      lambda: Component.create_from_fusion_batch(vals_list))
+
+        with self.assertQueryCount(10):
+            results = self._measure(
+                'create_from_fusion_batch.unchanged', BENCH_PARTS,
+                lambda: Component.create_from_fusion_batch(vals_list))
+        self.assertTrue(all(r['status'] == 'unchanged' for r in results))
+
+    def test_02_single_parts(self):
+        """Benchmark one-by-one creation through create_from_fusion."""
+        Component = self.env['fusion.component']
+        count = min(BENCH_PARTS, 50)
+        self._measure('create_from_fusion.create', count, lambda: [
+            Component.create_from_fusion(self._part_vals(index))
+            for index in range(count)
+        ])
+
+    def test_03_configured_parts(self):
+        """Benchmark attribute, value and variant resolution."""
+        Component = self.env['fusion.component']
+        vals_list = self._configured_vals()
+
+        results = self._measure(
+            'create_from_fusion_batch.configured', len(vals_list),
+            lambda: Component.create_from_fusion_batch(vals_list))
+        self.assertTrue(all(r['success'] for r in results))
+
+        config_vals = json.loads(vals_list[0]['configuration_values'])
+        product_tmpl = Component.browse(results[0]['id']).product_tmpl_id
+        with self.assertQueryCount(8):
+            self._measure(
+                '_handle_configuration.resolved', 1,
+                lambda: Component._handle_configuration(
+                    dict(vals_list[0]), product_tmpl))
+        variant = product_tmpl.product_variant_ids[:1]
+        attr_values = variant.product_template_attribute_value_ids
+        with self.assertQueryCount(2):
+            self._measure(
+                '_get_or_create_variant.resolved', 1,
+                lambda: Component._get_or_create_variant(
+                    product_tmpl,
+                    attr_values.product_attribute_value_id,
+                    Component._hash_configuration(config_vals)))
+
+    def test_04_bom_sync(self):
+        """Benchmark BOM creation and unchanged re-sync."""
+        Component = self.env['fusion.component']
+        Component.create_from_fusion_batch(
+            [self._part_vals(index) for index in range(BENCH_PARTS)])
+        Component.create_from_fusion(self._part_vals(
+            'assembly', component_type='assembly'))
+        payload = {
+            'parent_id': 'BENCH_PART_assembly',
+            'components': [
+                {'fusion_id': f'BENCH_PART_{index}', 'quantity': index + 1}
+                for index in range(BENCH_PARTS)
+            ],
+        }
+
+        self._measure('sync_bom_from_fusion.create', BENCH_PARTS,
+                      lambda: Component.sync_bom_from_fusion_payload(payload))
+        with self.assertQueryCount(12):
+            self._measure(
+                'sync_bom_from_fusion.unchanged', BENCH_PARTS,
+                lambda: Component.sync_bom_from_fusion_payload(payload))
+
+    def test_05_assembly_tree(self):
+        """Benchmark whole-tree ingestion of a synthetic assembly."""
+        Component = self.env['fusion.component']
+        tree = self._tree(BENCH_DEPTH)
+
+        def count(node):
+            return 1 + sum(count(child) for child in node.get('children', []))
+
+        nodes = count(tree)
+        root = self._measure('create_from_fusion_tree.create', nodes,
+                             lambda: Component.create_from_fusion_tree(tree))
+        self._measure('create_from_fusion_tree.unchanged', nodes,
+                      lambda: Component.create_from_fusion_tree(tree))
+        self._measure('get_explosion', nodes, root.get_explosion)
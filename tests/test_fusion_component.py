@@ -2,7 +2,16 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 from odoo.tests.common import TransactionCase
-from odoo.exceptions import ValidationError
+from odoo.exceptions import AccessError, ValidationError
+from odoo.tools import mute_logger
+from odoo.addons.fusion_integration.models.fusion_component import (
+    _import_savepoints,
+    get_error_code,
+    import_savepoint,
+    is_concurrency_error,
+)
+from psycopg2 import IntegrityError
+from unittest.mock import patch
 import json
 
 
@@ -85,7 +94,8 @@ class TestFusionComponent(TransactionCase):
         
         updated_vals = dict(
             self.simple_component_vals,
-            name='Updated Component'
+            name='Updated Component',
+            version_identifier='V2',
         )
         updated_component = self.env['fusion.component'].create_from_fusion(
             updated_vals)
@@ -95,11 +105,16 @@ class TestFusionComponent(TransactionCase):
 
     def test_04_component_constraints(self):
         """Test unique constraints on components."""
-        self.env['fusion.component'].create_from_fusion(self.simple_component_vals)
-        
-        with self.assertRaises(ValidationError):
+        component = self.env['fusion.component'].create_from_fusion(
+            self.simple_component_vals)
+
+        # Syncing the same component again updates it
+        self.assertEqual(
             self.env['fusion.component'].create_from_fusion(
-                self.simple_component_vals)
+                dict(self.simple_component_vals, version_identifier='V2')),
+            component
+        )
+        self.assertEqual(component.version_identifier, 'V2')
 
     def test_05_create_assembly(self):
         """Test creation of an assembly with subcomponents."""
@@ -151,6 +166,27 @@ class TestFusionComponent(TransactionCase):
             2
         )
 
+        # Archived variants are found on their hash and restored
+        Component = self.env['fusion.component']
+        variant = component1.product_id
+        variant.active = False
+        attr_values = variant.product_template_attribute_value_ids
+        self.assertEqual(
+            Component._get_or_create_variant(
+                variant.product_tmpl_id,
+                attr_values.product_attribute_value_id,
+                component1.configuration_hash),
+            variant
+        )
+        self.assertTrue(variant.active)
+
+        # Incomplete combinations are rejected
+        with self.assertRaises(ValidationError):
+            Component._get_or_create_variant(
+                variant.product_tmpl_id,
+                attr_values[:1].product_attribute_value_id,
+                Component._hash_configuration({'Length': '300'}))
+
     def test_07_fusion_attributes(self):
         """Test fusion-specific attribute handling."""
         component = self.env['fusion.component'].create_from_fusion(
@@ -187,3 +223,681 @@ class TestFusionComponent(TransactionCase):
                 attr.fusion_parameter_name,
                 attr.name.replace('Fusion: ', '')
             )
+
+    def test_09_create_from_fusion_batch(self):
+        """Test bulk creation and update of components."""
+        existing = self.env['fusion.component'].create_from_fusion(
+            self.simple_component_vals)
+        config2_vals = dict(
+            self.config_component_vals,
+            configuration_name='Config2',
+            configuration_values=json.dumps({
+                'Length': '200',
+                'Width': '100',
+            })
+        )
+
+        results = self.env['fusion.component'].create_from_fusion_batch([
+            dict(self.simple_component_vals,
+                 name='Updated Component', version_identifier='V2'),
+            self.config_component_vals,
+            {'name': 'Missing Fusion ID'},
+            config2_vals,
+        ])
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(
+            results[0],
+            {'success': True, 'id': existing.id, 'status': 'updated'}
+        )
+        self.assertEqual(existing.name, 'Updated Component')
+        self.assertTrue(results[1]['success'])
+        self.assertEqual(results[1]['status'], 'created')
+        self.assertFalse(results[2]['success'])
+        self.assertTrue(results[3]['success'])
+
+        component1 = self.env['fusion.component'].browse(results[1]['id'])
+        component2 = self.env['fusion.component'].browse(results[3]['id'])
+        self.assertEqual(
+            component1.product_tmpl_id,
+            component2.product_tmpl_id
+        )
+        self.assertNotEqual(component1.product_id, component2.product_id)
+
+    def test_10_sync_bom_from_fusion(self):
+        """Test BOM synchronization only applies line differences."""
+        child = self.env['fusion.component'].create_from_fusion(
+            self.simple_component_vals)
+        other = self.env['fusion.component'].create_from_fusion(
+            dict(self.simple_component_vals, name='Other', fusion_id='FUSION_999'))
+        assembly = self.env['fusion.component'].create_from_fusion({
+            'name': 'Test Assembly',
+            'fusion_id': 'FUSION_789',
+            'component_type': 'assembly',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        })
+
+        bom, missing = assembly.sync_bom_from_fusion([
+            {'fusion_id': 'FUSION_123', 'quantity': 2},
+            {'fusion_id': 'FUSION_999', 'quantity': 1},
+            {'fusion_id': 'UNKNOWN', 'quantity': 1},
+        ])
+        self.assertEqual(missing, ['UNKNOWN'])
+        self.assertEqual(bom.fusion_component_id, assembly)
+        self.assertEqual(len(bom.bom_line_ids), 2)
+        line = bom.bom_line_ids.filtered(
+            lambda l: l.product_id == child.product_id)
+
+        bom2, missing = assembly.sync_bom_from_fusion([
+            {'fusion_id': 'FUSION_123', 'quantity': 3},
+        ])
+        self.assertEqual(bom, bom2)
+        self.assertEqual(bom.bom_line_ids, line)
+        self.assertEqual(line.product_qty, 3)
+        self.assertNotIn(other.product_id, bom.bom_line_ids.product_id)
+        self.assertEqual(
+            self.env['mrp.bom'].search_count(
+                [('fusion_component_id', '=', assembly.id)]),
+            1
+        )
+
+    def test_11_create_from_fusion_tree(self):
+        """Test ingestion of a nested assembly tree."""
+        part_vals = dict(self.simple_component_vals, quantity=4)
+        root = self.env['fusion.component'].create_from_fusion_tree({
+            'name': 'Top Assembly',
+            'fusion_id': 'FUSION_TOP',
+            'component_type': 'assembly',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+            'children': [
+                {
+                    'name': 'Sub Assembly',
+                    'fusion_id': 'FUSION_SUB',
+                    'component_type': 'assembly',
+                    'last_modified': '2024-01-01 00:00:00',
+                    'version_identifier': 'V1',
+                    'quantity': 2,
+                    'children': [part_vals],
+                },
+                dict(part_vals, quantity=1),
+            ],
+        })
+
+        self.assertEqual(root.fusion_id, 'FUSION_TOP')
+        sub = root.child_ids.filtered(lambda c: c.fusion_id == 'FUSION_SUB')
+        self.assertTrue(sub)
+        part = self.env['fusion.component'].search(
+            [('fusion_id', '=', 'FUSION_123')])
+        self.assertEqual(len(part), 1)
+
+        root_bom = self.env['mrp.bom'].search(
+            [('fusion_component_id', '=', root.id)])
+        sub_bom = self.env['mrp.bom'].search(
+            [('fusion_component_id', '=', sub.id)])
+        self.assertEqual(len(root_bom.bom_line_ids), 2)
+        self.assertEqual(sub_bom.bom_line_ids.product_id, part.product_id)
+        self.assertEqual(sub_bom.bom_line_ids.product_qty, 4)
+
+    def test_12_attribute_cache_invalidation(self):
+        """Test cached fusion attributes follow attribute changes."""
+        Component = self.env['fusion.component']
+        attribute = Component._get_or_create_attribute('Length')
+        self.assertEqual(Component._get_or_create_attribute('Length'), attribute)
+        value = Component._get_or_create_attribute_value(attribute, '100')
+        self.assertEqual(
+            Component._get_or_create_attribute_value(attribute, '100'), value)
+
+        value.unlink()
+        new_value = Component._get_or_create_attribute_value(attribute, '100')
+        self.assertTrue(new_value.exists())
+        self.assertNotEqual(new_value, value)
+
+        attribute.write({'fusion_parameter_name': 'Height'})
+        self.assertEqual(Component._get_or_create_attribute('Height'), attribute)
+        self.assertNotEqual(
+            Component._get_or_create_attribute('Length'), attribute)
+
+        # Creations clear the cache once committed, until then records
+        # created since it was filled are still found
+        value = Component._get_or_create_attribute_values({'Width': 10})
+        width = value.attribute_id
+        self.assertEqual(
+            Component._get_or_create_attribute_values({'Width': 10}), value)
+        self.assertIn('fusion.attribute.cache', self.env.cr.postcommit.data)
+        self.env.cr.postcommit.run()
+        Component._get_or_create_attribute_values({'Width': 10})
+        with self.assertQueryCount(0):
+            self.assertEqual(
+                Component._get_or_create_attribute_values({'Width': 10}), value)
+
+        # Archiving or moving a value invalidates the cache
+        value.active = False
+        self.assertNotEqual(
+            Component._get_or_create_attribute_value(width, '10'), value)
+        other = Component._get_or_create_attribute_value(attribute, '20')
+        other.attribute_id = width
+        self.assertEqual(
+            Component._get_or_create_attribute_value(width, '20'), other)
+
+    def test_13_configuration_hash(self):
+        """Test configuration hash is canonical and stored on variants."""
+        component = self.env['fusion.component'].create_from_fusion(
+            self.config_component_vals)
+
+        reordered = json.dumps({'Width': 50, 'Length': '100'})
+        self.assertEqual(
+            component.configuration_hash,
+            component._hash_configuration(json.loads(reordered))
+        )
+        self.assertEqual(
+            component.product_id.fusion_configuration_hash,
+            component.configuration_hash
+        )
+
+        found = self.env['fusion.component']._find_existing_component({
+            'fusion_id': 'FUSION_456',
+            'configuration_values': reordered,
+        })
+        self.assertEqual(found, component)
+
+        # The batch path matches unnamed configurations on the hash too
+        results = self.env['fusion.component'].create_from_fusion_batch([
+            dict(self.config_component_vals, configuration_name=False,
+                 configuration_values=reordered, version_identifier='V2'),
+        ])
+        self.assertEqual(results[0]['id'], component.id)
+        self.assertEqual(results[0]['status'], 'updated')
+
+    def test_14_delta_sync(self):
+        """Test unchanged versions are skipped and changes reported."""
+        component = self.env['fusion.component'].create_from_fusion(
+            self.simple_component_vals)
+
+        results = self.env['fusion.component'].create_from_fusion_batch([
+            dict(self.simple_component_vals, name='Ignored Name'),
+        ])
+        self.assertEqual(results[0]['status'], 'unchanged')
+        self.assertEqual(component.name, 'Test Component')
+
+        results = self.env['fusion.component'].create_from_fusion_batch([
+            dict(self.simple_component_vals, version_identifier='V2'),
+        ])
+        self.assertEqual(results[0]['status'], 'updated')
+        self.assertEqual(component.version_identifier, 'V2')
+        self.assertEqual(
+            component._get_changed_vals(
+                dict(self.simple_component_vals, version_identifier='V2')),
+            {}
+        )
+
+        # Keys that are not fields are dropped, x2many values compared
+        assembly = self.env['fusion.component'].create_from_fusion(dict(
+            self.simple_component_vals, fusion_id='FUSION_789',
+            component_type='assembly', child_ids=[(4, component.id)]))
+        self.assertEqual(assembly._get_changed_vals({
+            'child_ids': [(6, 0, component.ids)],
+            'children': [],
+            'quantity': 2,
+        }), {})
+        self.assertEqual(
+            assembly._get_changed_vals({'child_ids': [(5, 0, 0)]}),
+            {'child_ids': [(5, 0, 0)]}
+        )
+
+    def test_15_import_mode_summary(self):
+        """Test import mode posts one summary message per assembly."""
+        Component = self.env['fusion.component'].with_context(fusion_import=True)
+        root = Component.create_from_fusion_tree({
+            'name': 'Top Assembly',
+            'fusion_id': 'FUSION_TOP',
+            'component_type': 'assembly',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+            'children': [
+                dict(self.simple_component_vals, quantity=1),
+                dict(self.simple_component_vals,
+                     fusion_id='FUSION_124', name='Other', quantity=1),
+            ],
+        })
+        messages = root.message_ids
+        self.env.cr.flush()
+
+        summaries = root.message_ids - messages
+        self.assertEqual(len(summaries), 1)
+        self.assertIn('Test Component: created', summaries.body)
+        self.assertIn('Other: created', summaries.body)
+        self.assertFalse(root.child_ids.message_ids.tracking_value_ids)
+
+    def test_16_explosion_and_where_used(self):
+        """Test hierarchy queries on assemblies."""
+        root = self.env['fusion.component'].create_from_fusion_tree({
+            'name': 'Top Assembly',
+            'fusion_id': 'FUSION_TOP',
+            'component_type': 'assembly',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+            'children': [{
+                'name': 'Sub Assembly',
+                'fusion_id': 'FUSION_SUB',
+                'component_type': 'assembly',
+                'last_modified': '2024-01-01 00:00:00',
+                'version_identifier': 'V1',
+                'quantity': 2,
+                'children': [dict(self.simple_component_vals, quantity=3)],
+            }],
+        })
+        part = self.env['fusion.component'].search(
+            [('fusion_id', '=', 'FUSION_123')])
+
+        explosion = root.get_explosion()
+        self.assertEqual(
+            [(c['fusion_id'], c['depth'], c['quantity']) for c in explosion],
+            [('FUSION_SUB', 1, 2.0), ('FUSION_123', 2, 6.0)]
+        )
+
+        where_used = part.get_where_used()
+        self.assertEqual(
+            [(c['fusion_id'], c['depth'], c['quantity']) for c in where_used],
+            [('FUSION_SUB', 1, 3.0), ('FUSION_TOP', 2, 6.0)]
+        )
+
+        with self.assertRaises(ValidationError):
+            root.parent_id = part
+
+    def test_17_only_sent_combinations_materialized(self):
+        """Test configured batches only create the variants sent by Fusion."""
+        configurations = [('100', '50'), ('200', '50'), ('100', '100')]
+        results = self.env['fusion.component'].create_from_fusion_batch([
+            dict(
+                self.config_component_vals,
+                configuration_name=f'Config{index}',
+                configuration_values=json.dumps({
+                    'Length': length,
+                    'Width': width,
+                }),
+            )
+            for index, (length, width) in enumerate(configurations)
+        ])
+        components = self.env['fusion.component'].browse(
+            [result['id'] for result in results])
+
+        product_tmpl = components.product_tmpl_id
+        self.assertEqual(len(product_tmpl), 1)
+        self.assertEqual(len(product_tmpl.product_variant_ids), 3)
+        for component, (length, width) in zip(components, configurations):
+            values = component.product_id.product_template_attribute_value_ids
+            self.assertEqual(
+                sorted(values.mapped('name')),
+                sorted([length, width])
+            )
+
+    def test_18_create_from_fusion_records(self):
+        """Test mixed component and BOM records are processed in order."""
+        results = self.env['fusion.component'].create_from_fusion_records([
+            self.simple_component_vals,
+            dict(self.simple_component_vals, name='Test Assembly',
+                 fusion_id='FUSION_789', component_type='assembly'),
+            {'type': 'bom', 'parent_id': 'FUSION_789',
+             'components': [{'fusion_id': 'FUSION_123', 'quantity': 2}]},
+            {'type': 'bom', 'parent_id': 'UNKNOWN', 'components': []},
+            {'type': 'unknown'},
+        ])
+        self.assertEqual(
+            [result['success'] for result in results],
+            [True, True, True, False, False]
+        )
+        part = self.env['fusion.component'].browse(results[0]['id'])
+        bom = self.env['mrp.bom'].browse(results[2]['id'])
+        self.assertEqual(bom.fusion_component_id.id, results[1]['id'])
+        self.assertEqual(bom.bom_line_ids.product_id, part.product_id)
+        self.assertEqual(bom.bom_line_ids.product_qty, 2)
+
+    def test_19_duplicate_keys_are_conflicts(self):
+        """Test duplicate Fusion keys are rejected as retryable conflicts."""
+        component = self.env['fusion.component'].create_from_fusion(
+            self.simple_component_vals)
+        with self.assertRaises(IntegrityError) as error, \
+                mute_logger('odoo.sql_db'), self.env.cr.savepoint():
+            self.env['fusion.component'].create(dict(
+                self.simple_component_vals,
+                product_tmpl_id=component.product_tmpl_id.id,
+            ))
+        self.assertTrue(is_concurrency_error(error.exception))
+
+        attribute_vals = {
+            'name': 'Fusion: Length',
+            'fusion_parameter_name': 'Length',
+            'is_fusion_attribute': True,
+            'company_id': self.env.company.id,
+        }
+        self.env['product.attribute'].create(attribute_vals)
+        with self.assertRaises(IntegrityError) as error, \
+                mute_logger('odoo.sql_db'), self.env.cr.savepoint():
+            self.env['product.attribute'].create(attribute_vals)
+        self.assertTrue(is_concurrency_error(error.exception))
+
+    def test_20_resolve_from_fusion(self):
+        """Test components are resolved in input order, unknown ones as None."""
+        Component = self.env['fusion.component']
+        simple = Component.create_from_fusion(self.simple_component_vals)
+        configured = Component.create_from_fusion(self.config_component_vals)
+        simple.product_id.default_code = 'REF-123'
+        self.env.flush_all()
+
+        with self.assertQueryCount(1):
+            results = Component.resolve_from_fusion([
+                ['FUSION_456', 'Config1'],
+                {'fusion_id': 'FUSION_123'},
+                ['FUSION_456', 'Unknown'],
+                ['UNKNOWN'],
+            ])
+        self.assertEqual(results[0]['id'], configured.id)
+        self.assertEqual(results[0]['product_id'], configured.product_id.id)
+        self.assertEqual(results[1], {
+            'id': simple.id,
+            'product_tmpl_id': simple.product_tmpl_id.id,
+            'product_id': simple.product_id.id,
+            'internal_identifier': 'REF-123',
+            'version_identifier': 'V1',
+        })
+        self.assertEqual(results[2:], [None, None])
+
+        with self.assertRaises(ValidationError):
+            Component.resolve_from_fusion([{'configuration_name': 'Config1'}])
+
+        # The entity tag is computed with one aggregate query
+        keys = [['FUSION_456', 'Config1'], ['FUSION_123']]
+        with self.assertQueryCount(1):
+            etag = Component._get_resolve_etag(keys)
+        self.assertEqual(Component._get_resolve_etag(keys), etag)
+        self.assertNotEqual(Component._get_resolve_etag(keys[:1]), etag)
+        simple.active = False
+        self.assertNotEqual(Component._get_resolve_etag(keys), etag)
+
+    def test_21_change_feed(self):
+        """Test the change feed pages records and reports deleted ones."""
+        Component = self.env['fusion.component']
+        part = Component.create_from_fusion(self.simple_component_vals)
+        assembly = Component.create_from_fusion(dict(
+            self.simple_component_vals, name='Test Assembly',
+            fusion_id='FUSION_789', component_type='assembly'))
+        bom, missing = assembly.sync_bom_from_fusion(
+            [{'fusion_id': 'FUSION_123', 'quantity': 2}])
+
+        # Every change of the test transaction is before its own horizon
+        with patch.object(type(Component), '_get_change_horizon',
+                          lambda self: None):
+            page = Component.get_changes(limit=1)
+            self.assertEqual([c['id'] for c in page['components']], [part.id])
+            self.assertEqual([b['id'] for b in page['boms']], [bom.id])
+            self.assertEqual(page['boms'][0]['lines'][0]['quantity'], 2)
+            self.assertTrue(page['has_more'])
+
+            page = Component.get_changes(page['cursor'], limit=1)
+            self.assertEqual(
+                [c['id'] for c in page['components']], [assembly.id])
+            self.assertFalse(page['boms'])
+
+            page = Component.get_changes(page['cursor'], limit=1)
+            self.assertFalse(page['components'] or page['has_more'])
+
+            part.unlink()
+            page = Component.get_changes(page['cursor'], limit=1)
+            self.assertEqual(page['tombstones'], [{
+                'model': 'fusion.component',
+                'id': part.id,
+                'fusion_id': 'FUSION_123',
+                'configuration_name': None,
+                'reason': 'deleted',
+            }])
+
+        with self.assertRaises(ValidationError):
+            Component.get_changes('not a cursor')
+
+    def test_22_search_by_parameters(self):
+        """Test configuration parameters are stored and searchable."""
+        Component = self.env['fusion.component']
+        results = Component.create_from_fusion_batch([
+            dict(
+                self.config_component_vals,
+                configuration_name=f'Config{length}',
+                configuration_values=json.dumps({
+                    'Length': length,
+                    'Finish': finish,
+                }),
+            )
+            for length, finish in [(80, 'Raw'), (100, 'Painted'), (120, 'Raw')]
+        ])
+        short, medium, long = Component.browse([r['id'] for r in results])
+        self.assertEqual(
+            sorted(medium.parameter_ids.mapped('value')), ['100', 'Painted'])
+
+        self.assertEqual(Component.search_by_parameters([
+            ['Length', '>=', 90],
+            ['Length', '<=', 110],
+        ]), medium)
+        self.assertEqual(Component.search_by_parameters([
+            ['Finish', '=', 'Raw'],
+        ]), short | long)
+        self.assertEqual(Component.search_by_parameters([
+            ['Length', 'in', [80, '120']],
+            ['Finish', 'ilike', 'raw'],
+        ]), short | long)
+
+        medium.configuration_values = json.dumps({'Length': 95})
+        self.assertEqual(len(medium.parameter_ids), 1)
+        self.assertFalse(Component.search_by_parameters([['Finish', '=', 'Painted']]))
+
+        with self.assertRaises(ValidationError):
+            Component.search_by_parameters([['Length', 'like', 90]])
+
+    def test_23_prepare_bulk_import(self):
+        """Test shared attributes and components are created up front."""
+        Component = self.env['fusion.component']
+        part = dict(self.config_component_vals, quantity=2)
+        trees = [
+            dict(self.simple_component_vals, fusion_id=f'FUSION_TOP_{index}',
+                 name=f'Top {index}', component_type='assembly',
+                 children=[part])
+            for index in range(2)
+        ]
+        trees.append(dict(self.simple_component_vals, children=[
+            dict(part, configuration_name='Config2',
+                 configuration_values=json.dumps({'Length': '200'})),
+        ]))
+
+        counts = Component._prepare_bulk_import(trees)
+
+        self.assertEqual(counts, {'attribute_values': 3, 'shared_components': 1})
+        shared = Component.search([('fusion_id', '=', 'FUSION_456')])
+        self.assertEqual(shared.configuration_name, 'Config1')
+        self.assertFalse(Component.search([('fusion_id', 'like', 'FUSION_TOP')]))
+        attribute = self.env['product.attribute'].search([
+            ('is_fusion_attribute', '=', True),
+            ('fusion_parameter_name', '=', 'Length'),
+        ])
+        self.assertEqual(
+            sorted(attribute.value_ids.mapped('name')), ['100', '200'])
+
+    def test_24_tree_counters(self):
+        """Test assembly counters are maintained and the tree is paged."""
+        Component = self.env['fusion.component']
+        assembly = dict(self.simple_component_vals, component_type='assembly')
+        root = Component.create_from_fusion_tree(dict(
+            assembly, name='Top', fusion_id='FUSION_TOP', children=[
+                dict(assembly, name='Sub', fusion_id='FUSION_SUB', children=[
+                    dict(self.simple_component_vals, name=f'Part {index}',
+                         fusion_id=f'FUSION_PART_{index}', quantity=index + 1)
+                    for index in range(3)
+                ]),
+                dict(self.simple_component_vals, name='Loose',
+                     fusion_id='FUSION_LOOSE'),
+            ]))
+        sub = Component.search([('fusion_id', '=', 'FUSION_SUB')])
+
+        self.assertEqual((root.child_count, root.descendant_count), (2, 5))
+        self.assertEqual((sub.child_count, sub.descendant_count), (3, 3))
+        self.assertEqual((root.bom_line_count, sub.bom_line_count), (2, 3))
+
+        # Moving, archiving and deleting only update the counters of the
+        # assemblies involved
+        part = Component.search([('fusion_id', '=', 'FUSION_PART_0')])
+        part.parent_id = root
+        self.assertEqual((root.child_count, root.descendant_count), (3, 5))
+        self.assertEqual((sub.child_count, sub.descendant_count), (2, 2))
+        sub.active = False
+        self.assertEqual((root.child_count, root.descendant_count), (2, 4))
+        sub.active = True
+        sub.unlink()
+        self.assertEqual((root.child_count, root.descendant_count), (2, 2))
+        self.assertFalse(
+            Component.search([('fusion_id', '=', 'FUSION_PART_1')]).parent_id)
+
+        expected = (root.child_count, root.descendant_count)
+        Component._recompute_tree_counts()
+        self.assertEqual((root.child_count, root.descendant_count), expected)
+
+        page = Component.get_tree_children(root.id, limit=1)
+        self.assertEqual(page['total'], 2)
+        self.assertEqual([child['name'] for child in page['children']], ['Loose'])
+        page = Component.get_tree_children(root.id, offset=1, limit=1)
+        self.assertEqual([child['name'] for child in page['children']], ['Part 0'])
+        self.assertEqual(page['children'][0]['child_count'], 0)
+
+    def test_25_physical_property_rollup(self):
+        """Test totals are rolled up along the changed branch only."""
+        Component = self.env['fusion.component']
+        assembly = dict(self.simple_component_vals, component_type='assembly')
+        root = Component.create_from_fusion_tree(dict(
+            assembly, name='Top', fusion_id='FUSION_TOP', mass=1.0, children=[
+                dict(assembly, name='Sub', fusion_id='FUSION_SUB', quantity=2,
+                     mass=0.5, material_cost=1.0, children=[
+                         dict(self.simple_component_vals, name='Bolt',
+                              fusion_id='FUSION_BOLT', quantity=4,
+                              mass=0.25, material_cost=0.5),
+                     ]),
+                dict(self.simple_component_vals, name='Plate',
+                     fusion_id='FUSION_PLATE', mass=3.0, volume=10.0),
+            ]))
+        Component._rollup_physical_properties()
+        sub = Component.search([('fusion_id', '=', 'FUSION_SUB')])
+        bolt = Component.search([('fusion_id', '=', 'FUSION_BOLT')])
+        plate = Component.search([('fusion_id', '=', 'FUSION_PLATE')])
+
+        self.assertAlmostEqual(sub.total_mass, 0.5 + 4 * 0.25)
+        self.assertAlmostEqual(sub.total_material_cost, 1.0 + 4 * 0.5)
+        self.assertAlmostEqual(root.total_mass, 1.0 + 2 * 1.5 + 3.0)
+        self.assertAlmostEqual(root.total_volume, 10.0)
+        self.assertAlmostEqual(root.total_material_cost, 2 * 3.0)
+        self.assertFalse((root | sub | bolt | plate).filtered('rollup_dirty'))
+
+        # A leaf change only flags and recomputes its ancestors
+        bolt.mass = 0.5
+        self.assertTrue(bolt.rollup_dirty)
+        self.assertFalse(plate.rollup_dirty)
+        Component._rollup_physical_properties()
+        self.assertAlmostEqual(sub.total_mass, 0.5 + 4 * 0.5)
+        self.assertAlmostEqual(root.total_mass, 1.0 + 2 * 2.5 + 3.0)
+
+        # BOM quantities and archived sub-components are taken into account
+        root.sync_bom_from_fusion([
+            {'fusion_id': 'FUSION_SUB', 'quantity': 1},
+            {'fusion_id': 'FUSION_PLATE', 'quantity': 1},
+        ])
+        plate.active = False
+        Component._rollup_physical_properties()
+        self.assertAlmostEqual(root.total_mass, 1.0 + 2.5)
+
+    def test_26_error_codes(self):
+        """Test failed items report a status code with their error."""
+        results = self.env['fusion.component'].create_from_fusion_batch([
+            self.simple_component_vals,
+            {'name': 'Missing Fusion ID'},
+        ])
+
+        self.assertNotIn('code', results[0])
+        self.assertEqual(results[1]['code'], 422)
+        self.assertEqual(get_error_code(AccessError('denied')), 403)
+        self.assertEqual(get_error_code(KeyError('components')), 400)
+        self.assertEqual(get_error_code(RuntimeError('boom')), 500)
+
+    def test_27_required_values(self):
+        """Test incomplete components are rejected before reaching SQL."""
+        Component = self.env['fusion.component']
+        for key in ('last_modified', 'version_identifier', 'component_type'):
+            vals = dict(self.simple_component_vals)
+            del vals[key]
+            with self.assertRaises(ValidationError):
+                Component.create_from_fusion(vals)
+        with self.assertRaises(ValidationError):
+            Component.create_from_fusion(
+                dict(self.simple_component_vals, component_type='sketch'))
+        with self.assertRaises(ValidationError):
+            Component.create_from_fusion(
+                dict(self.simple_component_vals, last_modified='yesterday'))
+
+        results = Component.create_from_fusion_batch([
+            dict(self.simple_component_vals, last_modified=False),
+        ])
+        self.assertEqual(results[0]['code'], 422)
+
+    def test_28_tree_with_removed_children(self):
+        """Test an assembly sent without children is synced to empty."""
+        Component = self.env['fusion.component']
+        assembly = dict(self.simple_component_vals, name='Top',
+                        fusion_id='FUSION_TOP', component_type='assembly')
+        root = Component.create_from_fusion_tree(
+            dict(assembly, children=[self.simple_component_vals]))
+        bom = self.env['mrp.bom'].search([('fusion_component_id', '=', root.id)])
+        self.assertEqual(len(bom.bom_line_ids), 1)
+
+        Component.create_from_fusion_tree(
+            dict(assembly, version_identifier='V2', children=[]))
+
+        self.assertFalse(root.child_ids)
+        self.assertFalse(bom.bom_line_ids)
+        part = Component.search([('fusion_id', '=', 'FUSION_123')])
+        self.assertFalse(part.parent_id)
+
+        # Parts sent with an empty list do not get a BOM
+        Component.create_from_fusion_tree(
+            dict(self.simple_component_vals, version_identifier='V2', children=[]))
+        self.assertFalse(self.env['mrp.bom'].search(
+            [('fusion_component_id', '=', part.id)]))
+
+    def test_29_import_changes_rolled_back(self):
+        """Test changes of a rolled back savepoint are left out of the summary."""
+        Component = self.env['fusion.component'].with_context(fusion_import=True)
+        with self.assertRaises(ValidationError), import_savepoint(self.env):
+            Component.create_from_fusion_batch([self.simple_component_vals])
+            raise ValidationError('Rolled back')
+
+        results = Component.create_from_fusion_batch([self.config_component_vals])
+        changes = self.env.cr.precommit.data['fusion.import.changes']
+        self.assertEqual(list(changes), [results[0]['id']])
+
+        # Flushing nested savepoints run the precommit hooks, the changes
+        # of the enclosing savepoint are still dropped with it
+        self.env.cr.precommit.run()
+        with self.assertRaises(ValidationError), import_savepoint(self.env):
+            Component.create_from_fusion_batch([self.simple_component_vals])
+            with self.env.cr.savepoint():
+                Component.create_from_fusion_batch([
+                    dict(self.simple_component_vals, fusion_id='FUSION_789')])
+            raise ValidationError('Rolled back')
+        self.assertNotIn('fusion.import.changes', self.env.cr.precommit.data)
+
+        # Items retried one by one after a failed bulk upsert
+        with mute_logger('odoo.sql_db'):
+            results = Component.create_from_fusion_batch([
+                self.simple_component_vals,
+                dict(self.simple_component_vals, fusion_id='FUSION_789',
+                     parent_id=2 ** 31 - 1),
+            ])
+        self.assertEqual([r['success'] for r in results], [True, False])
+        changes = self.env.cr.precommit.data['fusion.import.changes']
+        self.assertEqual(list(changes), [results[0]['id']])
+        self.assertEqual(len(self.env.cr.precommit._funcs), 1)
+        self.assertFalse(_import_savepoints.get(self.env.cr))
@@ -0,0 +1,59 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo.tests.common import HttpCase, tagged
+import gzip
+import json
+
+
+@tagged('post_install', '-at_install')
+class TestFusionController(HttpCase):
+    def setUp(self):
+        super().setUp()
+        self.authenticate('admin', 'admin')
+        self.payload = json.dumps({'components': [{
+            'name': f'Test Component {index}',
+            'fusion_id': f'FUSION_{index}',
+            'component_type': 'component',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        } for index in range(50)]}).encode()
+
+    def _corrupt(self, body):
+        """Corrupt the deflate stream of a gzip body, keeping its header."""
+        return body[:10] + b'\xff' * 32 + body[42:]
+
+    def test_01_corrupt_gzip_body(self):
+        """Test a corrupt gzip body is rejected as a bad request."""
+        response = self.url_open(
+            '/fusion_api/v2/components',
+            data=self._corrupt(gzip.compress(self.payload)),
+            headers={
+                'Content-Type': 'application/json',
+                'Content-Encoding': 'gzip',
+            },
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['code'], 400)
+
+    def test_02_stream_encodings(self):
+        """Test the stream route rejects unknown encodings and reports corrupt
+        bodies in its last line."""
+        headers = {'Content-Type': 'application/x-ndjson'}
+        records = b''.join(
+            json.dumps(dict(component, type='component')).encode() + b'\n'
+            for component in json.loads(self.payload)['components'])
+
+        response = self.url_open(
+            '/fusion_api/stream', data=records,
+            headers=dict(headers, **{'Content-Encoding': 'br'}))
+        self.assertEqual(response.status_code, 415)
+
+        response = self.url_open(
+            '/fusion_api/stream', data=self._corrupt(gzip.compress(records)),
+            headers=dict(headers, **{'Content-Encoding': 'gzip'}))
+        self.assertEqual(response.status_code, 200)
+        last = json.loads(response.text.splitlines()[-1])
+        self.assertTrue(last['done'])
+        self.assertFalse(last['success'])
+        self.assertEqual(last['code'], 400)
@@ -0,0 +1,171 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo.tests.common import TransactionCase
+import json
+
+
+class TestFusionGc(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+
+    def setUp(self):
+        super().setUp()
+        Component = self.env['fusion.component']
+        self.part = Component.create_from_fusion({
+            'name': 'Live Part',
+            'fusion_id': 'FUSION_LIVE',
+            'component_type': 'component',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        })
+        self.assembly = Component.create_from_fusion({
+            'name': 'Live Assembly',
+            'fusion_id': 'FUSION_ASSEMBLY',
+            'component_type': 'assembly',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        })
+        self.bom, dummy = self.assembly.sync_bom_from_fusion([
+            {'fusion_id': 'FUSION_LIVE', 'quantity': 1},
+        ])
+        self.dead = Component.create_from_fusion({
+            'name': 'Dead Part',
+            'fusion_id': 'FUSION_DEAD',
+            'component_type': 'component',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+            'configuration_name': 'Config1',
+            'configuration_values': json.dumps({'Length': '100'}),
+        })
+        self.variant = self.dead.product_id
+        self.dead.active = False
+        self.attribute = self.env['product.attribute'].create({
+            'fusion_parameter_name': 'Unused',
+            'is_fusion_attribute': True,
+            'value_ids': [(0, 0, {'name': '1'})],
+        })
+        self._age(self.dead | self.assembly | self.part)
+
+    def _age(self, records, days=60):
+        """Move the last update of records back in time."""
+        self.env.flush_all()
+        self.env.cr.execute(f"""
+            UPDATE {records._table}
+               SET write_date = write_date - interval '{days} days'
+             WHERE id IN %s
+        """, [tuple(records.ids)])
+        records.invalidate_recordset(['write_date'])
+
+    def test_01_dry_run(self):
+        """Test a dry run reports orphans without removing them."""
+        report = self.env['fusion.gc']._collect_garbage(dry_run=True)
+
+        self.assertGreaterEqual(report['components'], 1)
+        self.assertGreaterEqual(report['attributes'], 1)
+        self.assertTrue(self.dead.exists())
+        self.assertTrue(self.attribute.exists())
+
+    def test_02_collect_garbage(self):
+        """Test orphans are removed in batches and live BOMs are kept."""
+        old_bom = self.bom.copy({
+            'active': False,
+            'fusion_component_id': self.assembly.id,
+        })
+        self._age(old_bom)
+
+        self.env['fusion.gc']._collect_garbage(batch_size=1)
+
+        self.assertFalse(self.dead.exists())
+        self.assertFalse(
+            self.variant.exists() and self.variant.active)
+        self.assertFalse(self.attribute.exists())
+        self.assertFalse(old_bom.exists())
+        self.assertTrue(self.bom.exists())
+        self.assertTrue(self.bom.active)
+        self.assertEqual(self.bom.bom_line_ids.product_id, self.part.product_id)
+        self.assertTrue(self.part.product_id.active)
+        self.assertTrue(self.env['fusion.tombstone'].search([
+            ('res_model', '=', 'fusion.component'),
+            ('res_id', '=', self.dead.id),
+        ]))
+
+    def test_03_grace_period(self):
+        """Test recently archived components are kept."""
+        recent = self.env['fusion.component'].create_from_fusion({
+            'name': 'Recent Part',
+            'fusion_id': 'FUSION_RECENT',
+            'component_type': 'component',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        })
+        recent.active = False
+
+        self.env['fusion.gc']._collect_garbage()
+
+        self.assertTrue(recent.exists())
+
+    def test_04_legacy_boms(self):
+        """Test BOMs superseded by the managed BOM of an assembly are removed."""
+        Bom = self.env['mrp.bom']
+        legacy = Bom.create({
+            'product_tmpl_id': self.assembly.product_tmpl_id.id,
+            'type': 'normal',
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.part.product_id.id,
+                'product_qty': 1,
+            })],
+        })
+        manual = Bom.create({
+            'product_tmpl_id': self.assembly.product_tmpl_id.id,
+            'type': 'normal',
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.env['product.product'].create(
+                    {'name': 'Screw'}).id,
+                'product_qty': 4,
+            })],
+        })
+        self._age(legacy | manual)
+
+        report = self.env['fusion.gc']._collect_garbage(dry_run=True)
+        self.assertEqual(report['legacy_boms'], 1)
+        self.env['fusion.gc']._collect_garbage()
+
+        self.assertFalse(legacy.exists())
+        self.assertTrue(manual.active)
+        self.assertTrue(self.bom.active)
+
+    def test_05_live_bom_on_variant_id(self):
+        """Test BOMs of a template with the id of a Fusion variant are kept."""
+        variant_id = self.assembly.product_id.id
+        if self.assembly.product_tmpl_id.id == variant_id:
+            self.skipTest('The assembly template has the id of its variant')
+        template = self.env['product.template'].browse(variant_id).exists()
+        if not template:
+            # Sequences are not transactional, restore it past both ids
+            self.env.cr.execute("SELECT last_value FROM product_template_id_seq")
+            last_value = self.env.cr.fetchone()[0]
+            self.env.cr.execute(
+                "SELECT setval('product_template_id_seq', %s, false)",
+                [variant_id])
+            template = self.env['product.template'].create({'name': 'Frame'})
+            self.env.cr.execute(
+                "SELECT setval('product_template_id_seq', %s)",
+                [max(last_value, variant_id)])
+        self.assertEqual(template.id, variant_id)
+        live = self.env['mrp.bom'].create({
+            'product_tmpl_id': template.id,
+            'type': 'normal',
+            'bom_line_ids': [(0, 0, {
+                'product_id': self.part.product_id.id,
+                'product_qty': 1,
+            })],
+        })
+        self._age(live)
+
+        self.env['fusion.gc']._collect_garbage()
+
+        self.assertTrue(live.exists())
+        self.assertTrue(live.active)
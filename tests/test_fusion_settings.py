@@ -56,3 +56,31 @@ class TestFusionSettings(TransactionCase):
         self.assertIn('|', domain)
         self.assertIn(('company_id', '=', False), domain)
         self.assertIn(('company_id', '=', 'company_id'), domain)
+
+    def test_03_settings_snapshot(self):
+        """Test the cached settings snapshot follows saved settings."""
+        category = self.env['product.category'].create({'name': 'Fusion Parts'})
+        settings = self.env['res.config.settings'].create({
+            'fusion_default_folder_id': self.test_location.id,
+            'fusion_default_category_id': category.id,
+            'fusion_job_batch_size': 5,
+        })
+        settings.execute()
+
+        snapshot = self.env['res.config.settings']._get_fusion_settings()
+        self.assertEqual(snapshot.default_location_id, self.test_location.id)
+        self.assertEqual(snapshot.default_category_id, category.id)
+        self.assertEqual(snapshot.job_batch_size, 5)
+
+        component = self.env['fusion.component'].create_from_fusion({
+            'name': 'Test Component',
+            'fusion_id': 'FUSION_123',
+            'component_type': 'component',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        })
+        self.assertEqual(component.product_tmpl_id.categ_id, category)
+        self.assertEqual(
+            component.product_tmpl_id.property_stock_inventory,
+            self.test_location
+        )
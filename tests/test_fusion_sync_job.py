@@ -0,0 +1,107 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo.tests.common import TransactionCase
+from odoo.tools import mute_logger
+from odoo.addons.fusion_integration.models.fusion_component import (
+    MAX_TRIES_ON_CONCURRENCY_FAILURE,
+)
+
+from unittest.mock import patch
+
+
+class TestFusionSyncJob(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+
+    def setUp(self):
+        super().setUp()
+        self.component_vals = {
+            'name': 'Test Component',
+            'fusion_id': 'FUSION_123',
+            'component_type': 'component',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        }
+
+    def test_01_process_pending_jobs(self):
+        """Test queued jobs are processed by the cron worker."""
+        Job = self.env['fusion.sync.job']
+        job = Job.create_from_request(
+            'components', {'components': [self.component_vals]})
+        self.assertEqual(job.state, 'pending')
+
+        Job._cron_process_jobs()
+
+        self.assertEqual(job.state, 'done')
+        self.assertTrue(job.date_done)
+        status = job.get_status()
+        self.assertEqual(status['result']['results'][0]['status'], 'created')
+        component = self.env['fusion.component'].search(
+            [('fusion_id', '=', 'FUSION_123')])
+        self.assertEqual(status['result']['results'][0]['id'], component.id)
+
+    def test_02_failed_job(self):
+        """Test errors are captured on the job without stopping others."""
+        Job = self.env['fusion.sync.job']
+        failing = Job.create_from_request('bom', {
+            'parent_id': 'UNKNOWN',
+            'components': [],
+        })
+        job = Job.create_from_request('component', self.component_vals)
+
+        Job._cron_process_jobs()
+
+        self.assertEqual(failing.state, 'failed')
+        self.assertIn('Parent component not found', failing.error)
+        self.assertEqual(job.state, 'done')
+
+        failing.action_retry()
+        self.assertEqual(failing.state, 'pending')
+        self.assertFalse(failing.error)
+
+    def test_03_conflicting_job_queued_again(self):
+        """Test jobs conflicting with a concurrent sync are queued again."""
+        Job = self.env['fusion.sync.job']
+        job = Job.create_from_request('component', self.component_vals)
+
+        def execute(job):
+            # Same attribute value committed by another worker meanwhile
+            attribute = job.env['product.attribute'].create({'name': 'Conflict'})
+            job.env['product.attribute.value'].create([
+                {'attribute_id': attribute.id, 'name': 'A'},
+                {'attribute_id': attribute.id, 'name': 'A'},
+            ])
+
+        with patch.object(type(Job), '_execute', execute), \
+                mute_logger('odoo.sql_db'):
+            Job._cron_process_jobs()
+            self.assertEqual(job.state, 'pending')
+            self.assertEqual(job.retry_count, 1)
+            self.assertFalse(job.date_done)
+
+            job.retry_count = MAX_TRIES_ON_CONCURRENCY_FAILURE
+            Job._cron_process_jobs()
+            self.assertEqual(job.state, 'failed')
+
+    def test_04_jobs_started_one_at_a_time(self):
+        """Test jobs of a batch are only marked running when processed."""
+        Job = self.env['fusion.sync.job']
+        first = Job.create_from_request('component', self.component_vals)
+        second = Job.create_from_request(
+            'component', dict(self.component_vals, fusion_id='FUSION_456'))
+        execute = type(Job)._execute
+        waiting = []
+
+        def record_waiting(job):
+            waiting.append((job.id, second.state, second.date_started))
+            return execute(job)
+
+        with patch.object(type(Job), '_execute', record_waiting):
+            Job._cron_process_jobs(batch_size=2)
+
+        self.assertEqual(waiting[0], (first.id, 'pending', False))
+        self.assertEqual((first.state, second.state), ('done', 'done'))
+        self.assertTrue(second.date_started)
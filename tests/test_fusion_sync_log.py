@@ -0,0 +1,154 @@
+# Copyright 2024 jaco tech
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from odoo.exceptions import ValidationError
+from odoo.tests.common import TransactionCase
+from datetime import timedelta
+import json
+
+
+class TestFusionSyncLog(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+
+    def setUp(self):
+        super().setUp()
+        self.component_vals = {
+            'name': 'Test Component',
+            'fusion_id': 'FUSION_123',
+            'component_type': 'component',
+            'last_modified': '2024-01-01 00:00:00',
+            'version_identifier': 'V1',
+        }
+
+    def _sync(self, vals_list):
+        SyncLog = self.env['fusion.sync.log']
+        with SyncLog._profile('components') as outcome:
+            results = self.env['fusion.component'].create_from_fusion_batch(
+                vals_list)
+            outcome.update(success=True)
+        return results, SyncLog.search([], limit=1)
+
+    def _sync_bom(self, payload):
+        """Sync a BOM as the API does for calls without idempotency key.
+
+        Returns:
+            tuple: (result, whether it was replayed)
+        """
+        Idempotency = self.env['fusion.idempotency.key']
+        payload_hash = Idempotency._hash_payload('bom', payload)
+        stored = Idempotency._get_result('bom', payload_hash, payload_hash)
+        if stored is not None:
+            return stored, True
+        bom, dummy = self.env['fusion.component'].sync_bom_from_fusion_payload(
+            payload)
+        result = {'success': True, 'id': bom.id}
+        Idempotency._invalidate_derived_keys()
+        Idempotency._store_result(
+            'bom', payload_hash, payload_hash, result, derived=True)
+        return result, False
+
+    def test_01_profile_sync(self):
+        """Test a profiled sync logs its phases and outcome counts."""
+        results, log = self._sync([
+            self.component_vals,
+            {'name': 'Missing Fusion ID'},
+        ])
+
+        self.assertEqual(log.endpoint, 'components')
+        self.assertTrue(log.success)
+        self.assertEqual(log.item_count, 2)
+        self.assertEqual(log.created_count, 1)
+        self.assertEqual(log.failed_count, 1)
+        self.assertGreater(log.query_count, 0)
+        phases = json.loads(log.phase_stats)
+        self.assertIn('lookup', phases)
+        self.assertIn('template_create', phases)
+
+        results, log = self._sync([self.component_vals])
+        self.assertEqual(log.unchanged_count, 1)
+        self.assertNotIn('template_create', json.loads(log.phase_stats))
+
+    def test_02_stats(self):
+        """Test latency statistics per endpoint."""
+        self._sync([self.component_vals])
+        self._sync([self.component_vals])
+
+        stats = self.env['fusion.sync.log'].get_stats()
+        components = [s for s in stats if s['endpoint'] == 'components']
+        self.assertEqual(len(components), 1)
+        self.assertEqual(components[0]['call_count'], 2)
+        self.assertLessEqual(
+            components[0]['p50_duration'], components[0]['p95_duration'])
+
+    def test_03_idempotency_keys(self):
+        """Test stored results are replayed only for the same payload."""
+        Idempotency = self.env['fusion.idempotency.key']
+        payload = {'components': [self.component_vals]}
+        payload_hash = Idempotency._hash_payload('components', payload)
+        self.assertEqual(payload_hash, Idempotency._hash_payload(
+            'components', json.loads(json.dumps(payload))))
+        self.assertNotEqual(
+            payload_hash, Idempotency._hash_payload('bom', payload))
+
+        self.assertIsNone(
+            Idempotency._get_result('components', 'KEY', payload_hash))
+        result = {'success': True, 'results': [{'id': 1}]}
+        Idempotency._store_result('components', 'KEY', payload_hash, result)
+        with self.assertQueryCount(1):
+            self.assertEqual(
+                Idempotency._get_result('components', 'KEY', payload_hash),
+                result)
+        with self.assertRaises(ValidationError):
+            Idempotency._get_result('components', 'KEY', 'other hash')
+
+        # Expired results are dropped so that the key can be used again
+        stored = Idempotency.search([('key', '=', 'KEY')])
+        self.env.cr.execute(
+            "UPDATE fusion_idempotency_key SET create_date = %s WHERE id = %s",
+            [stored.create_date - timedelta(days=30), stored.id])
+        self.assertIsNone(
+            Idempotency._get_result('components', 'KEY', 'other hash'))
+        self.assertFalse(stored.exists())
+
+    def test_04_derived_keys(self):
+        """Test payloads sent without key are replayed until another sync."""
+        self.env['ir.config_parameter'].sudo().set_param(
+            'fusion_integration.idempotency_retry_seconds', 3600)
+        results = self.env['fusion.component'].create_from_fusion_batch([
+            self.component_vals,
+            dict(self.component_vals, fusion_id='FUSION_456'),
+            dict(self.component_vals, fusion_id='FUSION_789',
+                 component_type='assembly'),
+        ])
+        part_a, part_b = self.env['fusion.component'].browse(
+            [result['id'] for result in results[:2]])
+        bom_a = {
+            'parent_id': 'FUSION_789',
+            'components': [{'fusion_id': 'FUSION_123', 'quantity': 1}],
+        }
+        bom_b = {
+            'parent_id': 'FUSION_789',
+            'components': [{'fusion_id': 'FUSION_456', 'quantity': 2}],
+        }
+
+        result, replayed = self._sync_bom(bom_a)
+        self.assertFalse(replayed)
+        self.assertEqual(self._sync_bom(bom_a), (result, True))
+        bom = self.env['mrp.bom'].browse(result['id'])
+
+        # A -> B -> A: the second A is applied again
+        self.assertFalse(self._sync_bom(bom_b)[1])
+        self.assertEqual(bom.bom_line_ids.product_id, part_b.product_id)
+        self.assertFalse(self._sync_bom(bom_a)[1])
+        self.assertEqual(bom.bom_line_ids.product_id, part_a.product_id)
+
+        # Derived keys expire after the retry window
+        stored = self.env['fusion.idempotency.key'].search([('derived', '=', True)])
+        self.assertEqual(len(stored), 1)
+        self.env.cr.execute(
+            "UPDATE fusion_idempotency_key SET create_date = %s WHERE id = %s",
+            [stored.create_date - timedelta(hours=2), stored.id])
+        self.assertFalse(self._sync_bom(bom_a)[1])